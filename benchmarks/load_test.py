@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import numpy as np
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic
+
+
+# numpy-only stand-ins for the served models: real matrix work over weight buffers of a realistic
+# size, so the report shows whether the workers share those pages or each hold a copy
+class StubClassifier:
+    def __init__(self, weights_mb: int, num_classes: int = 10, input_size: int = 64, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        features = input_size * input_size * 3
+        hidden = max(num_classes, weights_mb * (1 << 20) // (4 * features))
+        self.input_size = input_size
+        self.num_classes = num_classes
+        self.hidden = rng.standard_normal((features, hidden), dtype = np.float32) / np.sqrt(features)
+        self.head = rng.standard_normal((hidden, num_classes), dtype = np.float32) / np.sqrt(hidden)
+
+    def predict_batch(self, images, batch_size = 32, **kwargs):
+        import cv2
+
+        inputs = np.stack([
+            cv2.resize(np.asarray(image, dtype = np.float32), (self.input_size, self.input_size)).ravel() / 255.0
+            for image in images
+        ])
+        logits = np.maximum(inputs @ self.hidden, 0.0) @ self.head
+        logits = np.exp(logits - logits.max(axis = 1, keepdims = True))
+        return logits / logits.sum(axis = 1, keepdims = True)
+
+
+class StubStyleModel:
+    def __init__(self, weights_mb: int, embedding_dim: int = 512, input_size: int = 32, seed: int = 1):
+        from utils.style_knowledge import load_style_knowledge
+
+        rng = np.random.default_rng(seed)
+        features = input_size * input_size * 3
+        self.input_size = input_size
+        self.design_styles = list(load_style_knowledge().styles)
+        self.projection = rng.standard_normal((features, embedding_dim), dtype = np.float32)
+        # the rest of the budget stands in for the text tower, which serving never touches
+        self.text_tower = rng.standard_normal(max(0, weights_mb * (1 << 18) - features * embedding_dim), dtype = np.float32)
+        style_embeddings = rng.standard_normal((len(self.design_styles), embedding_dim), dtype = np.float32)
+        self.style_text_embeddings = style_embeddings / np.linalg.norm(style_embeddings, axis = 1, keepdims = True)
+
+    def encode_images(self, images):
+        import cv2
+
+        inputs = np.stack([
+            cv2.resize(np.asarray(image, dtype = np.float32), (self.input_size, self.input_size)).ravel() / 255.0
+            for image in images
+        ])
+        embeddings = inputs @ self.projection
+        return embeddings / np.linalg.norm(embeddings, axis = 1, keepdims = True)
+
+    def recommend_styles_from_embeddings(self, image_embeddings, top_k = 3):
+        similarity = image_embeddings @ self.style_text_embeddings.T
+        return [[self.design_styles[idx] for idx in np.argsort(-row)[:top_k]] for row in similarity]
+
+
+def build_stub_app(weights_mb: int):
+    from main import InteriorDesignAI
+
+    ai = InteriorDesignAI()
+    ai._models['classification_model'] = StubClassifier(weights_mb // 2)
+    ai._models['style_recommendation_model'] = StubStyleModel(weights_mb - weights_mb // 2)
+    return ai
+
+
+def serve_stub(args) -> int:
+    from utils.inference_server import PreforkServer
+
+    server = PreforkServer(
+        lambda: build_stub_app(args.weights_mb),
+        host = '127.0.0.1',
+        port = args.port,
+        workers = args.workers,
+        preload = not args.no_preload,
+        worker_timeout = 10.0
+    )
+    server.serve_forever()
+    return 0
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get_json(port: int, path: str) -> Any:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout = 5)
+    try:
+        connection.request('GET', path)
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def _wait_ready(port: int, process: subprocess.Popen, workers: int, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server Exited With Status {process.returncode}")
+        try:
+            if sum(w['active'] for w in _get_json(port, '/workers')) >= workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"Server Not Ready After {timeout}s")
+
+
+def _memory_mb(pid: int) -> Dict[str, float]:
+    # Pss divides every shared page between the processes mapping it, so summed Pss is the real
+    # footprint, while summed Rss counts shared model weights once per worker
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty'):
+                    memory[key.lower()] = int(value.split()[0]) / 1024.0
+    except OSError:
+        pass
+    return memory
+
+
+def _client(port: int, paths: List[str], deadline: float, latencies: List[float], errors: List[str],
+            seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout = 30)
+    while time.time() < deadline:
+        body = json.dumps({'image_path' : paths[int(rng.integers(len(paths)))], 'use_cache' : False})
+        # a keep-alive connection closed by a draining worker is retried once on a fresh one
+        for attempt in range(2):
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/recommend', body, {'Content-Type' : 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors.append(f"HTTP {response.status}")
+                if response.getheader('Connection', '').lower() == 'close':
+                    connection.close()
+                break
+            except (http.client.HTTPException, ConnectionError) as e:
+                connection.close()
+                if attempt == 1:
+                    errors.append(type(e).__name__)
+    connection.close()
+
+
+def run_load(args) -> Dict[str, Any]:
+    paths = synthetic.write_room_images(os.path.join(args.work_dir, 'images'), args.images)
+    port = _free_port()
+    command = [
+        sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port),
+        '--workers', str(args.workers), '--weights-mb', str(args.weights_mb)
+    ] + (['--no-preload'] if args.no_preload else [])
+    process = subprocess.Popen(command)
+
+    try:
+        _wait_ready(port, process, args.workers, args.startup_timeout)
+        workers_before = [w for w in _get_json(port, '/workers') if w['active']]
+
+        latencies, errors = [], []
+        deadline = time.time() + args.duration
+        clients = [
+            threading.Thread(target = _client, args = (port, paths, deadline, latencies, errors, i))
+            for i in range(args.concurrency)
+        ]
+        if args.reload_after is not None:
+            reload_timer = threading.Timer(args.reload_after, os.kill, (process.pid, signal.SIGHUP))
+            reload_timer.start()
+
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        # memory is sampled mid-run, with every worker busy and holding its working set
+        time.sleep(min(args.duration / 2, args.duration - 0.5) if args.duration > 1 else 0)
+        memory = {pid : _memory_mb(pid) for pid in [process.pid] + [w['pid'] for w in _get_json(port, '/workers')]}
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+
+        # a reload reloads the models before forking, which can outlast the load under contention
+        reload_deadline = time.time() + (args.startup_timeout if args.reload_after is not None else 0)
+        while True:
+            workers_after = [w for w in _get_json(port, '/workers') if w['active']]
+            pids_before = {w['pid'] for w in workers_before}
+            if time.time() >= reload_deadline or pids_before.isdisjoint(w['pid'] for w in workers_after):
+                break
+            time.sleep(0.2)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout = 60)
+
+    worker_memory = [m for pid, m in memory.items() if pid != process.pid and m]
+    timings = np.asarray(latencies) * 1000.0
+    return {
+        'workers' : args.workers,
+        'concurrency' : args.concurrency,
+        'preload' : not args.no_preload,
+        'weights_mb' : args.weights_mb,
+        'requests' : len(latencies),
+        'errors' : len(errors),
+        'error_kinds' : sorted(set(errors)),
+        'throughput_per_s' : len(latencies) / elapsed,
+        'latency_ms' : {
+            'p50' : float(np.percentile(timings, 50)) if len(timings) else None,
+            'p95' : float(np.percentile(timings, 95)) if len(timings) else None,
+            'p99' : float(np.percentile(timings, 99)) if len(timings) else None
+        },
+        'memory_mb' : {
+            'parent' : memory.get(process.pid, {}),
+            'worker_rss_sum' : sum(m.get('rss', 0.0) for m in worker_memory),
+            'worker_pss_sum' : sum(m.get('pss', 0.0) for m in worker_memory),
+            'worker_shared_mean' : float(np.mean([
+                m.get('shared_clean', 0.0) + m.get('shared_dirty', 0.0) for m in worker_memory
+            ])) if worker_memory else 0.0,
+            'worker_private_mean' : float(np.mean([
+                m.get('private_clean', 0.0) + m.get('private_dirty', 0.0) for m in worker_memory
+            ])) if worker_memory else 0.0
+        },
+        'worker_pids_before' : [w['pid'] for w in workers_before],
+        'worker_pids_after' : [w['pid'] for w in workers_after],
+        'reloaded' : {w['pid'] for w in workers_before}.isdisjoint(w['pid'] for w in workers_after)
+    }
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = "Load test for the pre-forked inference server with stub models")
+    parser.add_argument('--workers', type = int, default = 4)
+    parser.add_argument('--concurrency', type = int, default = 8, help = "concurrent keep-alive clients")
+    parser.add_argument('--duration', type = float, default = 10.0, help = "seconds of load")
+    parser.add_argument('--weights-mb', type = int, default = 256, help = "size of the stub model weights")
+    parser.add_argument('--images', type = int, default = 32, help = "synthetic room images to generate")
+    parser.add_argument('--reload-after', type = float, help = "send SIGHUP to the server after this many seconds")
+    parser.add_argument('--no-preload', action = 'store_true', help = "load the models in every worker instead")
+    parser.add_argument('--startup-timeout', type = float, default = 120.0)
+    parser.add_argument('--work-dir', default = os.path.join(tempfile.gettempdir(), 'interior_design_bench'))
+    parser.add_argument('--output', help = "write the JSON report to this path")
+    parser.add_argument('--serve', action = 'store_true', help = argparse.SUPPRESS)
+    parser.add_argument('--port', type = int, default = 0, help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve_stub(args)
+
+    report = run_load(args)
+    output = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
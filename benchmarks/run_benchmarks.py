@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+import numpy as np
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic
+
+
+# each stage factory returns a function that processes one batch of image paths
+def _preprocess_image_stage(context: Dict[str, Any]) -> Callable[[List[str]], Any]:
+    from utils.data_preprocessor import DataPreprocessor
+
+    preprocessor = DataPreprocessor(dataset_path = context['work_dir'])
+
+    def run(paths):
+        if len(paths) == 1:
+            return preprocessor.preprocess_image(paths[0])
+        return preprocessor.preprocess_batch(paths, dtype = np.float32)
+    return run
+
+
+def _dominant_colors_stage(context: Dict[str, Any]) -> Callable[[List[str]], Any]:
+    from utils.data_preprocessor import DataPreprocessor
+
+    preprocessor = DataPreprocessor(dataset_path = context['work_dir'])
+    # decoding is benchmarked separately; only the color clustering is timed here
+    images = dict(zip(context['paths'], preprocessor.preprocess_batch(context['paths'], dtype = np.float32)))
+
+    def run(paths):
+        if len(paths) == 1:
+            return preprocessor._extract_dominant_colors(images[paths[0]])
+        return preprocessor.extract_dominant_colors_batch(np.stack([images[path] for path in paths]))
+    return run
+
+
+def _classification_stage(context: Dict[str, Any]) -> Callable[[List[str]], Any]:
+    classifier = synthetic.build_stub_classifier()
+
+    def run(paths):
+        return classifier.predict_batch(paths, batch_size = len(paths))
+    return run
+
+
+def _detect_objects_stage(context: Dict[str, Any]) -> Callable[[List[str]], Any]:
+    detector = synthetic.build_stub_detector()
+
+    def run(paths):
+        if len(paths) == 1:
+            return detector.detect_objects(paths[0])
+        return detector.detect_objects_batch(paths, batch_size = len(paths))
+    return run
+
+
+def _recommend_styles_stage(context: Dict[str, Any]) -> Callable[[List[str]], Any]:
+    style_model = synthetic.build_stub_style_model(os.path.join(context['work_dir'], 'clip_cache'))
+
+    def run(paths):
+        return style_model.recommend_styles(paths if len(paths) > 1 else paths[0], top_k = 3)
+    return run
+
+
+def _generate_design_layout_stage(context: Dict[str, Any]) -> Callable[[List[str]], Any]:
+    from models.design_generation_model import DesignGenerationModel
+
+    design_model = DesignGenerationModel()
+    detections = dict(zip(context['paths'], synthetic.stub_detections(context['paths'])))
+    styles = list(design_model.design_rule)
+
+    def run(paths):
+        return [
+            design_model.generate_design_layout(styles[i % len(styles)], detections[path])
+            for i, path in enumerate(paths)
+        ]
+    return run
+
+
+STAGES = {
+    'preprocess_image' : _preprocess_image_stage,
+    'extract_dominant_colors' : _dominant_colors_stage,
+    'classification_predict' : _classification_stage,
+    'detect_objects' : _detect_objects_stage,
+    'recommend_styles' : _recommend_styles_stage,
+    'generate_design_layout' : _generate_design_layout_stage
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def _measure_stage(stage: str, context: Dict[str, Any], batch_sizes: List[int], iterations: int) -> Dict[str, Any]:
+    try:
+        run = STAGES[stage](context)
+    except ImportError as e:
+        return {'skipped' : f"missing dependency: {e}"}
+
+    paths = context['paths']
+    results = {}
+    for batch_size in batch_sizes:
+        batches = [
+            [paths[(i * batch_size + j) % len(paths)] for j in range(batch_size)]
+            for i in range(iterations)
+        ]
+        run(batches[0])
+
+        latencies = []
+        start = time.perf_counter()
+        for batch in batches:
+            batch_start = time.perf_counter()
+            run(batch)
+            latencies.append(time.perf_counter() - batch_start)
+        elapsed = time.perf_counter() - start
+
+        latencies_ms = np.asarray(latencies) * 1000.0
+        results[str(batch_size)] = {
+            'throughput_per_s' : batch_size * len(batches) / elapsed,
+            'p50_ms' : float(np.percentile(latencies_ms, 50)),
+            'p99_ms' : float(np.percentile(latencies_ms, 99)),
+            'peak_rss_mb' : _peak_rss_mb()
+        }
+    return results
+
+
+def _stage_worker(stage, context, batch_sizes, iterations, connection):
+    try:
+        connection.send(_measure_stage(stage, context, batch_sizes, iterations))
+    except Exception as e:
+        connection.send({'error' : f"{type(e).__name__}: {e}"})
+    finally:
+        connection.close()
+
+
+def run_stage(stage: str, context: Dict[str, Any], batch_sizes: List[int], iterations: int) -> Dict[str, Any]:
+    # every stage runs in a fresh process so peak RSS is attributable to that stage alone
+    ctx = multiprocessing.get_context('spawn')
+    receiver, sender = ctx.Pipe(duplex = False)
+    process = ctx.Process(target = _stage_worker, args = (stage, context, batch_sizes, iterations, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {'error' : f"stage process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    # walks the baseline for the stages this run selected, so a stage or batch size that had numbers
+    # and now errors, is skipped or was not run counts as a regression instead of silently passing;
+    # stages left out with --stages are not compared at all
+    regressions = []
+    for stage, baseline_batches in baseline.get('stages', {}).items():
+        if stage not in current['stages']:
+            continue
+        batches = current['stages'][stage]
+        for batch_size, reference in baseline_batches.items():
+            if not isinstance(reference, dict) or 'throughput_per_s' not in reference:
+                continue
+
+            if 'error' in batches or 'skipped' in batches:
+                regressions.append(
+                    f"{stage}[batch={batch_size}] has no numbers : {batches.get('error') or batches.get('skipped')}"
+                )
+                continue
+            metrics = batches.get(batch_size)
+            if not isinstance(metrics, dict) or 'throughput_per_s' not in metrics:
+                regressions.append(f"{stage}[batch={batch_size}] missing from this run")
+                continue
+
+            if metrics['throughput_per_s'] < reference['throughput_per_s'] * (1.0 - tolerance):
+                regressions.append(
+                    f"{stage}[batch={batch_size}] throughput "
+                    f"{metrics['throughput_per_s']:.1f}/s < baseline {reference['throughput_per_s']:.1f}/s"
+                )
+            if metrics['p99_ms'] > reference['p99_ms'] * (1.0 + tolerance):
+                regressions.append(
+                    f"{stage}[batch={batch_size}] p99 {metrics['p99_ms']:.2f}ms > baseline {reference['p99_ms']:.2f}ms"
+                )
+    return regressions
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = "Offline benchmarks for the interior design pipeline stages")
+    parser.add_argument('--stages', default = ','.join(STAGES), help = "comma-separated stage names")
+    parser.add_argument('--batch-sizes', default = '1,8,32')
+    parser.add_argument('--iterations', type = int, default = 20, help = "timed batches per batch size")
+    parser.add_argument('--images', type = int, default = 64, help = "synthetic room images to generate")
+    parser.add_argument('--work-dir', default = os.path.join(tempfile.gettempdir(), 'interior_design_bench'))
+    parser.add_argument('--output', help = "write the JSON report to this path")
+    parser.add_argument('--baseline', help = "JSON report to compare against")
+    parser.add_argument('--tolerance', type = float, default = 0.15, help = "allowed relative regression")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    context = {
+        'work_dir' : args.work_dir,
+        'paths' : synthetic.write_room_images(os.path.join(args.work_dir, 'images'), args.images)
+    }
+
+    report = {
+        'created' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform' : platform.platform(),
+        'python' : platform.python_version(),
+        'cpu_count' : os.cpu_count(),
+        'iterations' : args.iterations,
+        'stages' : {}
+    }
+    for stage in stages:
+        report['stages'][stage] = run_stage(stage, context, batch_sizes, args.iterations)
+        print(f"{stage}: {json.dumps(report['stages'][stage])}", file = sys.stderr)
+
+    output = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file = sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
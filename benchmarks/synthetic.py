@@ -0,0 +1,177 @@
+import os
+import zlib
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+
+STUB_CLASS_NAMES = [
+    'sofa', 'chair', 'table', 'bed', 'tv', 'lamp', 'bookshelf', 'window', 'door', 'plant'
+]
+
+
+def room_image(seed: int, size: Tuple[int, int] = (640, 480)) -> np.ndarray:
+    # a floor, a wall and a handful of furniture-like blocks over a lighting gradient
+    rng = np.random.default_rng(seed)
+    width, height = size
+    palette = rng.integers(0, 256, size = (8, 3))
+
+    image = np.empty((height, width, 3), dtype = np.float32)
+    image[:] = palette[0]
+    image[height * 2 // 3:] = palette[1]
+    for color in palette[2:]:
+        x, y = rng.integers(0, width - width // 5), rng.integers(height // 4, height - height // 5)
+        w, h = rng.integers(width // 12, width // 4), rng.integers(height // 12, height // 4)
+        image[y:y + h, x:x + w] = color
+
+    image *= np.linspace(0.8, 1.0, height, dtype = np.float32)[:, np.newaxis, np.newaxis]
+    image += rng.normal(0.0, 6.0, size = image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def write_room_images(directory: str, count: int, size: Tuple[int, int] = (640, 480)) -> List[str]:
+    os.makedirs(directory, exist_ok = True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"room_{i:05d}.jpg")
+        if not os.path.exists(path):
+            cv2.imwrite(path, room_image(i, size))
+        paths.append(path)
+    return paths
+
+
+class _HostArray:
+    # mimics the .cpu().numpy() chain of a torch tensor without needing torch
+    def __init__(self, array: np.ndarray):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+
+class _StubBoxes:
+    def __init__(self, data: np.ndarray):
+        self.data = _HostArray(data)
+
+
+class _StubResult:
+    def __init__(self, data: np.ndarray, orig_shape: Tuple[int, int]):
+        self.boxes = _StubBoxes(data)
+        self.orig_shape = orig_shape
+
+
+class StubYOLO:
+    names = dict(enumerate(STUB_CLASS_NAMES))
+
+    def __init__(self, max_boxes: int = 12):
+        self.max_boxes = max_boxes
+
+    def __call__(self, source, verbose = False):
+        sources = source if isinstance(source, list) else [source]
+        results = []
+        for item in sources:
+            # deterministic boxes per input, so repeated runs measure the same work
+            seed = zlib.crc32(str(item).encode('utf-8'))
+            rng = np.random.default_rng(seed)
+            n = int(rng.integers(1, self.max_boxes + 1))
+            xy = rng.random((n, 2)) * np.array([540, 380])
+            wh = rng.random((n, 2)) * 100 + 10
+            data = np.concatenate([
+                xy, xy + wh, rng.random((n, 1)), rng.integers(0, len(self.names), (n, 1))
+            ], axis = 1).astype(np.float32)
+            results.append(_StubResult(data, (480, 640)))
+        return results
+
+
+def stub_detections(paths: List[str]) -> list:
+    # Detections straight from the stub detector, for stages that must not need ultralytics
+    from utils.detections import Detections
+
+    return [
+        Detections.from_array(
+            result.boxes.data.numpy(), STUB_CLASS_NAMES, image_size = result.orig_shape[::-1]
+        )
+        for result in StubYOLO()(list(paths))
+    ]
+
+
+def build_stub_classifier(input_shape = (224, 224, 3), num_classes = 10):
+    import tensorflow as tf
+    from models.classification_model import InteriorClassification
+
+    inputs = tf.keras.Input(shape = input_shape)
+    x = tf.keras.layers.Conv2D(8, 3, strides = 4, activation = 'relu')(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation = 'softmax')(x)
+
+    return InteriorClassification(
+        input_shape = input_shape,
+        num_classes = num_classes,
+        model = tf.keras.Model(inputs, outputs)
+    )
+
+
+def build_stub_detector():
+    from models.feature_extraction_model import InteriorFeatureExtractionModel
+
+    return InteriorFeatureExtractionModel(model = StubYOLO(), interior_classes = STUB_CLASS_NAMES)
+
+
+class _StubCLIPProcessor:
+    def __init__(self, image_size: int = 32, vocab_size: int = 1000, max_tokens: int = 16):
+        self.image_size = image_size
+        self.vocab_size = vocab_size
+        self.max_tokens = max_tokens
+
+    def __call__(self, text = None, images = None, return_tensors = 'pt', padding = False):
+        import torch
+
+        outputs = {}
+        if images is not None:
+            arrays = [
+                cv2.resize(np.asarray(image, dtype = np.uint8), (self.image_size, self.image_size))
+                for image in (images if isinstance(images, list) else [images])
+            ]
+            pixels = np.stack(arrays).astype(np.float32).transpose(0, 3, 1, 2) / 255.0
+            outputs['pixel_values'] = torch.from_numpy(pixels)
+        if text is not None:
+            ids = np.zeros((len(text), self.max_tokens), dtype = np.int64)
+            for i, sentence in enumerate(text):
+                tokens = [zlib.crc32(word.encode('utf-8')) % self.vocab_size for word in sentence.split()]
+                ids[i, :len(tokens[:self.max_tokens])] = tokens[:self.max_tokens]
+            outputs['input_ids'] = torch.from_numpy(ids)
+            outputs['attention_mask'] = torch.from_numpy((ids > 0).astype(np.int64))
+        return outputs
+
+
+class _StubCLIPModel:
+    def __init__(self, embedding_dim: int = 64, image_size: int = 32, vocab_size: int = 1000):
+        import torch
+
+        generator = torch.Generator().manual_seed(0)
+        self.image_projection = torch.randn(3 * image_size * image_size, embedding_dim, generator = generator)
+        self.token_embeddings = torch.randn(vocab_size, embedding_dim, generator = generator)
+
+    def eval(self):
+        return self
+
+    def get_image_features(self, pixel_values = None, **kwargs):
+        return pixel_values.flatten(1) @ self.image_projection
+
+    def get_text_features(self, input_ids = None, attention_mask = None, **kwargs):
+        mask = attention_mask.unsqueeze(-1).float()
+        return (self.token_embeddings[input_ids] * mask).sum(1) / mask.sum(1).clamp(min = 1.0)
+
+
+def build_stub_style_model(cache_dir: str):
+    from models.style_recommendation_model import StyleRecommendationModel
+
+    return StyleRecommendationModel(
+        model_name = 'stub-clip',
+        cache_dir = cache_dir,
+        model = _StubCLIPModel(),
+        processor = _StubCLIPProcessor()
+    )
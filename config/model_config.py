@@ -1,4 +1,7 @@
+import logging 
+import threading 
 from typing import Dict, Any 
+from config.performance_profile import PerformanceProfile, resolve_profile 
 
 class ModelConfiguration:
     CLASSIFICATION_MODEL_CONFIG: Dict[str, Any] = {
@@ -6,7 +9,10 @@ class ModelConfiguration:
         'num_classes' : 10,
         'learning_rate' : 0.001,
         'dropout_rate' : 0.5, 
-        'architecture' : 'ResNet50'
+        'architecture' : 'ResNet50',
+        'weights_path' : '/content/drive/MyDrive/system/ResNet50_weights_tf_dim_ordering_tf_kernels.h5',
+        'quantized_model_path' : None,
+        'quantized_num_threads' : None
     }
 
     FEATURE_EXTRACTION_CONFIG : Dict[str, Any] = {
@@ -16,18 +22,139 @@ class ModelConfiguration:
     }
 
     STYLE_RECOMMENDATION_CONFIG: Dict[str, Any] = {
-        'similarity_metric' : 'consine',
+        'model_name' : 'openai/clip-vit-base-patch32',
+        'similarity_metric' : 'cosine',
         'top_k_recommendations' : 5,
-        'embedding_threshold' : 0.7
+        'embedding_threshold' : 0.7,
+        'text_embedding_cache_dir' : './System/cache',
+        'catalog_index_path' : './System/data/catalog_index'
     }
 
     DESIGN_GENERATION_CONFIG: Dict[str, Any] = {
         'latent_dim' : 100,
         'generator_layers' : 4, 
         'discriminator_layers' : 3,
-        'noise_dim' : 50
+        'noise_dim' : 50,
+        'style_knowledge_path' : None,
+        'placement_zones' : 3,
+        'placement_slots' : 5,
+        'placement_grid_size' : 8
     }
 
+    RESULT_CACHE_CONFIG: Dict[str, Any] = {
+        'ttl_seconds' : 3600,
+        'disk_dir' : './System/cache/results',
+        'max_disk_entries' : 10000
+    }
+
+
+    PIPELINE_CONFIG: Dict[str, Any] = {
+        # stages of one framework allowed to run at the same time, across all requests
+        'framework_concurrency' : {'tensorflow' : 1, 'torch' : 1},
+        # concurrent recommend_designs calls (e.g. server handler threads) share batched forward
+        # passes through an InferenceService instead of each running the stage graph alone
+        'micro_batching' : False,
+        'max_batch_size' : 32,
+        'max_batch_wait_ms' : 5.0
+    }
+
+    METRICS_CONFIG: Dict[str, Any] = {
+        'enabled' : False,
+        'json_log' : False,
+        'prometheus_textfile' : None,
+        'prometheus_interval_seconds' : 10.0
+    }
+
+    SERVER_CONFIG: Dict[str, Any] = {
+        'host' : '127.0.0.1',
+        'port' : 8080,
+        # models are loaded once in the parent and shared copy-on-write by the forked workers
+        'preload' : True,
+        'preload_models' : ('classification_model', 'feature_extraction_model', 'style_recommendation_model'),
+        'worker_timeout_seconds' : 30.0,
+        # a worker with a request running longer than this is considered hung and killed
+        'request_timeout_seconds' : 120.0
+    }
+
+
+    # batch sizes, thread counts and worker counts; see config/performance_profile.py for the fields.
+    # balanced keeps the historical defaults. thread counts of None split the cores between the
+    # frameworks, and 'all' resolves to the number of cores
+    PERFORMANCE_PROFILES: Dict[str, Dict[str, Any]] = {
+        'balanced' : {
+            'batch_size' : 32,
+            'detection_batch_size' : 16,
+            'embedding_batch_size' : 64,
+            'prefetch_batches' : 2,
+            'tensorflow_intra_op_threads' : None,
+            'tensorflow_inter_op_threads' : 1,
+            'torch_threads' : None,
+            'opencv_threads' : None,
+            'pipeline_workers' : 4,
+            'preprocess_workers' : None,
+            'server_workers' : None,
+            'result_cache_entries' : 1024,
+            'reduced_decode' : True
+        },
+        # one request at a time gets every core; few server workers so they do not compete
+        'latency' : {
+            'batch_size' : 1,
+            'detection_batch_size' : 1,
+            'embedding_batch_size' : 16,
+            'prefetch_batches' : 1,
+            'tensorflow_intra_op_threads' : 'all',
+            'tensorflow_inter_op_threads' : 2,
+            'torch_threads' : 'all',
+            'opencv_threads' : 2,
+            'pipeline_workers' : 4,
+            'preprocess_workers' : None,
+            'server_workers' : 2,
+            'result_cache_entries' : 1024,
+            'reduced_decode' : True
+        },
+        # large batches and a deep prefetch queue; each worker process keeps to its share of cores
+        'throughput' : {
+            'batch_size' : 64,
+            'detection_batch_size' : 32,
+            'embedding_batch_size' : 128,
+            'prefetch_batches' : 4,
+            'tensorflow_intra_op_threads' : None,
+            'tensorflow_inter_op_threads' : 2,
+            'torch_threads' : None,
+            'opencv_threads' : None,
+            'pipeline_workers' : 8,
+            'preprocess_workers' : 'all',
+            'server_workers' : 'all',
+            'result_cache_entries' : 4096,
+            'reduced_decode' : True
+        },
+        # small buffers, one server worker, serial preprocessing and a small result cache
+        'low-memory' : {
+            'batch_size' : 8,
+            'detection_batch_size' : 4,
+            'embedding_batch_size' : 16,
+            'prefetch_batches' : 1,
+            'tensorflow_intra_op_threads' : 2,
+            'tensorflow_inter_op_threads' : 1,
+            'torch_threads' : 2,
+            'opencv_threads' : 1,
+            'pipeline_workers' : 2,
+            'preprocess_workers' : None,
+            'server_workers' : 1,
+            'result_cache_entries' : 128,
+            'reduced_decode' : True
+        }
+    }
+
+    PERFORMANCE_CONFIG: Dict[str, Any] = {
+        'profile' : 'balanced',
+        # INTERIOR_DESIGN_PROFILE selects a profile, INTERIOR_DESIGN_<SETTING> overrides one setting
+        'env_prefix' : 'INTERIOR_DESIGN_'
+    }
+
+    _performance_profile = None 
+    _performance_profile_lock = threading.Lock() 
+
 
     DATASET_CONFIG : Dict[str, Any] = {
         'base_path' : './System/data/Data_set',
@@ -35,9 +162,10 @@ class ModelConfiguration:
         'test_folder' : 'test',
         'val_folder' : 'val',
         'meta_data' : 'dataset_metadata.json',
-        'train_split' : '0.8',
-        'test_split' : '0.1',
-        'val_split' : '0.1'
+        'feature_cache' : './System/data/feature_cache.pkl',
+        'train_split' : 0.8,
+        'test_split' : 0.1,
+        'val_split' : 0.1
     }
 
 
@@ -57,6 +185,38 @@ class ModelConfiguration:
     def get_design_generation_config(cls) -> Dict[str, Any]:
         return cls.DESIGN_GENERATION_CONFIG
     
+    @classmethod 
+    def get_result_cache_config(cls) -> Dict[str, Any]:
+        return cls.RESULT_CACHE_CONFIG 
+    
+    @classmethod 
+    def get_pipeline_config(cls) -> Dict[str, Any]:
+        return cls.PIPELINE_CONFIG 
+    
+    @classmethod 
+    def get_metrics_config(cls) -> Dict[str, Any]:
+        return cls.METRICS_CONFIG 
+    
+    @classmethod 
+    def get_server_config(cls) -> Dict[str, Any]:
+        return cls.SERVER_CONFIG 
+    
+    @classmethod 
+    def get_performance_config(cls) -> Dict[str, Any]:
+        return cls.PERFORMANCE_CONFIG 
+    
+    @classmethod 
+    def get_performance_profile(cls, refresh: bool = False) -> PerformanceProfile:
+        # resolved once per process so every component sees the same settings
+        with cls._performance_profile_lock:
+            if cls._performance_profile is None or refresh:
+                config = cls.PERFORMANCE_CONFIG 
+                cls._performance_profile = resolve_profile(
+                    cls.PERFORMANCE_PROFILES, config['profile'], env_prefix = config['env_prefix']
+                )
+                logging.info(f"Performance Profile {cls._performance_profile.name} : {cls._performance_profile.to_dict()}")
+            return cls._performance_profile 
+    
     @classmethod 
     def get_dataset_config(cls) -> Dict[str, Any]:
         return cls.DATASET_CONFIG 
\ No newline at end of file
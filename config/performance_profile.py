@@ -0,0 +1,122 @@
+import os
+from typing import Any, Dict, Mapping, Optional
+
+
+# field -> (kind, minimum, allows None); a 'count' also accepts 'all', resolved to the number of cores
+PROFILE_FIELDS: Dict[str, tuple] = {
+    'batch_size' : ('int', 1, False),
+    'detection_batch_size' : ('int', 1, False),
+    'embedding_batch_size' : ('int', 1, False),
+    'prefetch_batches' : ('int', 1, False),
+    'tensorflow_intra_op_threads' : ('count', 1, True),
+    'tensorflow_inter_op_threads' : ('count', 1, True),
+    'torch_threads' : ('count', 1, True),
+    'opencv_threads' : ('count', 1, True),
+    'pipeline_workers' : ('count', 1, False),
+    'preprocess_workers' : ('count', 1, True),
+    'server_workers' : ('count', 1, True),
+    'result_cache_entries' : ('int', 0, False),
+    'reduced_decode' : ('bool', None, False)
+}
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off')
+
+
+def _parse_env(field: str, raw: str) -> Any:
+    # environment values are strings; they are converted here and then validated like any other value
+    kind = PROFILE_FIELDS[field][0]
+    value = raw.strip().lower()
+    if value in ('', 'none', 'auto'):
+        return None
+    if kind == 'bool':
+        if value in _TRUE:
+            return True
+        if value in _FALSE:
+            return False
+        return raw
+    if kind == 'count' and value == 'all':
+        return 'all'
+    try:
+        return int(value)
+    except ValueError:
+        return raw
+
+
+def _validate(field: str, value: Any) -> Any:
+    if field not in PROFILE_FIELDS:
+        raise ValueError(f"Unknown Performance Setting : {field}")
+
+    kind, minimum, allows_none = PROFILE_FIELDS[field]
+    if value is None:
+        if allows_none:
+            return None
+        raise ValueError(f"Performance Setting {field} Must Be Set")
+
+    if kind == 'bool':
+        if not isinstance(value, bool):
+            raise ValueError(f"Performance Setting {field} Must Be A Boolean, Got {value!r}")
+        return value
+
+    if kind == 'count' and value == 'all':
+        return os.cpu_count() or 1
+    # bool is an int subclass, and a True batch size is never what was meant
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"Performance Setting {field} Must Be An Integer, Got {value!r}")
+    if value < minimum:
+        raise ValueError(f"Performance Setting {field} Must Be At Least {minimum}, Got {value}")
+    return value
+
+
+class PerformanceProfile:
+    # one resolved, validated set of runtime settings; None thread counts mean "split the cores"
+    __slots__ = ('name',) + tuple(PROFILE_FIELDS)
+
+    def __init__(self, name: str, settings: Mapping[str, Any]):
+        missing = [field for field in PROFILE_FIELDS if field not in settings]
+        if missing:
+            raise ValueError(f"Performance Profile {name} Is Missing : {', '.join(missing)}")
+
+        object.__setattr__(self, 'name', name)
+        for field, value in settings.items():
+            object.__setattr__(self, field, _validate(field, value))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PerformanceProfile Is Immutable")
+
+    def __reduce__(self):
+        # slot state cannot be restored through the blocked __setattr__, so pickling rebuilds it
+        return (PerformanceProfile, (self.name, self.to_dict()))
+
+    def __repr__(self) -> str:
+        return f"PerformanceProfile({self.name!r}, {self.to_dict()})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in PROFILE_FIELDS}
+
+    def threads(self, framework: str) -> Optional[int]:
+        return {
+            'tensorflow' : self.tensorflow_intra_op_threads,
+            'torch' : self.torch_threads,
+            'opencv' : self.opencv_threads
+        }[framework]
+
+
+def resolve_profile(profiles: Mapping[str, Mapping[str, Any]], name: str,
+                    environ: Optional[Mapping[str, str]] = None,
+                    env_prefix: str = 'INTERIOR_DESIGN_') -> PerformanceProfile:
+    # <prefix>PROFILE picks the profile, <prefix><FIELD> overrides single settings of it
+    environ = os.environ if environ is None else environ
+    name = environ.get(f"{env_prefix}PROFILE", name)
+    if name not in profiles:
+        raise ValueError(f"Unknown Performance Profile {name!r}, Expected One Of : {', '.join(profiles)}")
+
+    settings = dict(profiles[name])
+    overridden = []
+    for field in PROFILE_FIELDS:
+        raw = environ.get(f"{env_prefix}{field.upper()}")
+        if raw is not None:
+            settings[field] = _parse_env(field, raw)
+            overridden.append(field)
+
+    return PerformanceProfile(f"{name}+env" if overridden else name, settings)
@@ -1,48 +1,182 @@
 import os 
+import sys 
+import time 
+import argparse 
 import logging 
+import threading 
+import numpy as np 
+from concurrent.futures import ThreadPoolExecutor 
 from config.model_config import ModelConfiguration 
 from utils.data_preprocessor import DataPreprocessor 
+from utils.feature_store import FeatureStore, load_feature_store, record_to_vector
+from utils.embedding_index import EmbeddingIndex
+from utils.result_cache import ResultCache
+from utils.image_io import decode_source, resize_image, to_unit_float
+from utils.stage_scheduler import StageGraph, applied_thread_limits, default_thread_limits
 from utils.model_utils import ModelUtilities 
-from models.classification_model import InteriorClassification
-from models.feature_extraction_model import InteriorFeatureExtractionModel
-from models.style_recommendation_model import StyleRecommendationModel 
-from models.design_generation_model import DesignGenerationModel 
+from utils.quantized_runtime import resolve_quantized_path
+from utils.inference_server import PreforkServer 
+from utils.micro_batching import InferenceService
+from utils import metrics as metrics_module 
 
 logging.basicConfig(level =logging.INFO) 
 
 
 class InteriorDesignAI:
+    MODEL_NAMES = (
+        'classification_model',
+        'feature_extraction_model',
+        'style_recommendation_model',
+        'design_generation_model'
+    )
+
     def __init__(self):
+        init_start = time.perf_counter() 
         self.dataset_config = ModelConfiguration.get_dataset_config() 
         self.classification_config = ModelConfiguration.get_classification_config() 
         self.feature_extraction_config = ModelConfiguration.get_feature_extraction_config() 
-
+        self.style_recommendation_config = ModelConfiguration.get_style_recommendation_config() 
+        # batch sizes, thread and worker counts; every model and the preprocessor apply the same profile
+        self.performance_profile = ModelConfiguration.get_performance_profile() 
 
         self.data_preprocessor = DataPreprocessor(
-            dataset_path = self.dataset_config['base_path']
+            dataset_path = self.dataset_config['base_path'],
+            cache_path = self.dataset_config.get('feature_cache')
+        )
+
+        # models (and the tensorflow / torch / ultralytics / transformers imports behind them)
+        # are only materialized on first use, see _get_model
+        self._models = {} 
+        self._model_lock = threading.Lock() 
+        self._catalog_index = None 
+
+        result_cache_config = ModelConfiguration.get_result_cache_config() 
+        self.result_cache = ResultCache(
+            max_entries = self.performance_profile.result_cache_entries,
+            ttl_seconds = result_cache_config['ttl_seconds'],
+            disk_dir = result_cache_config['disk_dir'],
+            max_disk_entries = result_cache_config['max_disk_entries']
         )
+        self._cached_model_versions = None 
+        # the configured weights are fingerprinted now, not when a model is first built: a result
+        # served from the disk tier after a restart never builds one, and must still be keyed on
+        # the weights on disk; models built later record the same entries again
+        for weights in self.configured_weights():
+            ModelUtilities.record_weights(weights) 
+
+        self.pipeline_config = ModelConfiguration.get_pipeline_config() 
+        self._pipeline = None 
+        self._pipeline_executor = None 
+        self._inference_service = None 
+
+        # instrumentation is off unless METRICS_CONFIG enables it; disabled timers are no-ops
+        self.metrics = metrics_module.configure(ModelConfiguration.get_metrics_config()) 
+        self.startup_timings = {'init' : time.perf_counter() - init_start} 
+
+    def _build_classification_model(self):
+        from models.classification_model import InteriorClassification
 
-        self.classification_model = InteriorClassification(
+        classifier = InteriorClassification(
             input_shape = self.classification_config['input_shape'],
-            num_classes = self.classification_config['num_classes']
+            num_classes = self.classification_config['num_classes'],
+            weights_path = self.classification_config['weights_path']
         )
+        quantized_path = self.classification_config.get('quantized_model_path') 
+        quantized_threads = (
+            self.classification_config.get('quantized_num_threads')
+            or self.performance_profile.threads('tensorflow')
+            or default_thread_limits()['tensorflow']
+        )
+        if quantized_path and not classifier.load_quantized(quantized_path, quantized_threads):
+            logging.warning(f"Quantized Classifier {quantized_path} Unavailable, Serving The Keras Model")
+        return classifier 
+
+    def _build_feature_extraction_model(self):
+        from models.feature_extraction_model import InteriorFeatureExtractionModel
 
-        self.feature_extraction_model = InteriorFeatureExtractionModel(
+        return InteriorFeatureExtractionModel(
             pretrained_weights = self.feature_extraction_config['pretrained_weights']
         )
 
-        self.style_recommendation_model = StyleRecommendationModel()
-        self.design_generation_model = DesignGenerationModel()
+    def _build_style_recommendation_model(self):
+        from models.style_recommendation_model import StyleRecommendationModel
+
+        return StyleRecommendationModel(model_name = self.style_recommendation_config['model_name'])
+
+    def _build_design_generation_model(self):
+        from models.design_generation_model import DesignGenerationModel
+
+        return DesignGenerationModel()
+
+    def _get_model(self, name):
+        model = self._models.get(name) 
+        if model is not None:
+            return model 
+
+        with self._model_lock:
+            if name not in self._models:
+                start = time.perf_counter() 
+                self._models[name] = getattr(self, f"_build_{name}")() 
+                self.startup_timings[name] = time.perf_counter() - start 
+                logging.info(f"Loaded {name} in {self.startup_timings[name]:.2f}s")
+            return self._models[name] 
+
+    @property
+    def classification_model(self):
+        return self._get_model('classification_model') 
+
+    @property
+    def feature_extraction_model(self):
+        return self._get_model('feature_extraction_model') 
+
+    @property
+    def style_recommendation_model(self):
+        return self._get_model('style_recommendation_model') 
+
+    @property
+    def design_generation_model(self):
+        return self._get_model('design_generation_model') 
+
+    def is_loaded(self, name):
+        return name in self._models 
+
+    def warmup(self, models = None):
+        for name in (models or self.MODEL_NAMES):
+            if name not in self.MODEL_NAMES:
+                raise ValueError(f"Unknown Model : {name}")
+            self._get_model(name) 
+        return dict(self.startup_timings) 
 
     
-    def preprocess_dataset(self):
+    def after_fork(self):
+        # threads do not survive fork and locks may be inherited held, so a forked worker rebuilds
+        # them; the models themselves stay shared with the parent
+        self._model_lock = threading.Lock() 
+        self._pipeline = None 
+        self._pipeline_executor = None 
+        self._inference_service = None 
+        self.result_cache.after_fork() 
+
+    def preprocess_dataset(self, workers = None):
         logging.info("Preprocessing dataset....")
-        processed_data = self.data_preprocessor.prepare_dataset()
+        processed_data = self.data_preprocessor.prepare_dataset(workers = workers)
+        for image_path, error in self.data_preprocessor.processing_errors:
+            logging.warning(f"Error Processing {image_path} : {error}")
+        if self.data_preprocessor.feature_cache is not None:
+            logging.info(f"Feature Cache : {self.data_preprocessor.feature_cache.stats()}")
         logging.info("Dataset Preprocessing Completed")
         return processed_data 
+
+    def iter_dataset(self, workers = None, batch_size = None):
+        # records are produced lazily, so train_models can consume them without holding the dataset
+        return self.data_preprocessor.iter_dataset(workers = workers, batch_size = batch_size)
     
 
     def train_models(self, processed_data):
+        # a feature store directory can be passed directly, skipping preprocessing entirely
+        if isinstance(processed_data, str):
+            processed_data = load_feature_store(processed_data)
+
         train_data, train_labels = self._prepare_training_data(processed_data)
 
         logging.info("Training Classification Model...")
@@ -56,22 +190,225 @@ class InteriorDesignAI:
 
     
     def _prepare_training_data(self, processed_data):
-        train_data = [entry['image_features'] for entry in processed_data]
-        train_labels = [entry['style_label'] for entry in processed_data]
+        if isinstance(processed_data, FeatureStore):
+            return processed_data.feature_matrix(), processed_data.labels()
+
+        train_data = []
+        train_labels = []
+
+        # single pass, so generators (and batches of records) from iter_dataset work as input
+        for item in processed_data:
+            for entry in (item if isinstance(item, list) else [item]):
+                if 'image_features' in entry:
+                    train_data.append(entry['image_features'])
+                else:
+                    train_data.append(record_to_vector(entry))
+                train_labels.append(entry.get('style_label', entry.get('category')))
 
 
 
         return train_data, train_labels
     
-    def recommend_designs(self, input_image_path):
-        logging.info(f"Generating Recommendations for {input_image_path}...")
-        input_features = self.data_preprocessor.extract_features(input_image_path) 
-        style_classification = self.classification_model.classify(input_features) 
-        recommendations = self.style_recommendation_model.recommend(
-            input_features, 
-            top_k = 5
+    @property
+    def catalog_index(self):
+        if self._catalog_index is None:
+            index_path = self.style_recommendation_config['catalog_index_path'] 
+            if os.path.exists(os.path.join(index_path, 'index.json')):
+                self._catalog_index = EmbeddingIndex.load(index_path) 
+        return self._catalog_index 
+
+    def add_to_catalog(self, image_paths, ids = None, batch_size = None):
+        batch_size = batch_size or self.performance_profile.embedding_batch_size 
+        added_ids = [] 
+        for start in range(0, len(image_paths), batch_size):
+            embeddings = self.style_recommendation_model.encode_images(image_paths[start:start + batch_size]) 
+            if self.catalog_index is None:
+                self._catalog_index = EmbeddingIndex(dim = embeddings.shape[1]) 
+
+            batch_ids = None if ids is None else ids[start:start + batch_size] 
+            added_ids.extend(self._catalog_index.add(embeddings, batch_ids).tolist()) 
+        return added_ids 
+
+    def save_catalog(self, train = False):
+        if self.catalog_index is None:
+            return 
+        if train or not self.catalog_index.is_trained:
+            self.catalog_index.train() 
+        self.catalog_index.save(self.style_recommendation_config['catalog_index_path']) 
+
+    def find_similar_rooms(self, input_image_path, top_k = None, n_probe = None):
+        if self.catalog_index is None:
+            return [] 
+
+        query = self.style_recommendation_model.encode_images([input_image_path]) 
+        return self._search_catalog(query, top_k = top_k, n_probe = n_probe) 
+
+    def _search_catalog(self, query, top_k = None, n_probe = None):
+        if self.catalog_index is None:
+            return [] 
+
+        scores, ids = self.catalog_index.search(query, top_k = top_k, n_probe = n_probe) 
+        return [
+            {'id' : int(room_id), 'similarity' : float(score)}
+            for room_id, score in zip(ids[0], scores[0]) if room_id >= 0
+        ]
+
+    def configured_weights(self):
+        weights = [
+            self.classification_config['weights_path'],
+            self.feature_extraction_config['pretrained_weights'],
+            self.style_recommendation_config['model_name']
+        ]
+        quantized_path = self.classification_config.get('quantized_model_path') 
+        if quantized_path:
+            # the same artifact load_quantized_model will record, when one exists
+            try:
+                weights.append(resolve_quantized_path(quantized_path)) 
+            except FileNotFoundError:
+                pass
+        return weights 
+
+    def model_versions(self):
+        # anything that changes recommend_designs output for the same image belongs in here
+        return repr((
+            self.classification_config,
+            self.feature_extraction_config['pretrained_weights'],
+            self.style_recommendation_config,
+            self.data_preprocessor.color_extractor.strategy,
+            ModelUtilities.weights_fingerprint()
+        ))
+
+    def recommend_designs(self, input_image_path, use_cache = True):
+        if not use_cache:
+            return self._recommend_designs(input_image_path) 
+
+        versions = self.model_versions() 
+        if versions != self._cached_model_versions:
+            # weights changed (e.g. via ModelUtilities.load_model): old in-memory results are stale,
+            # and disk entries under the old versions are simply never addressed again
+            self.result_cache.clear() 
+            self._cached_model_versions = versions 
+
+        key = ResultCache.key_for_file(input_image_path, versions) 
+        with self.metrics.timer('recommend_designs'):
+            return self.result_cache.get_or_compute(key, lambda: self._recommend_designs(input_image_path)) 
+
+    def _build_pipeline(self):
+        top_k = self.style_recommendation_config['top_k_recommendations'] 
+        feature_size = (224, 224) 
+        input_height, input_width = self.classification_config['input_shape'][:2] 
+        classifier_size = (input_width, input_height) 
+
+        # the image is decoded once; every model stage works from that buffer, and the two CLIP
+        # consumers (style scoring and catalog search) share one image embedding
+        graph = StageGraph(resource_limits = self.pipeline_config['framework_concurrency']) 
+        graph.add_input('image_path') 
+        graph.add(
+            'source',
+            lambda image_path: decode_source(image_path, feature_size, self.data_preprocessor.reduced_decode),
+            ['image_path'], resource = 'opencv'
+        )
+        graph.add('resized', lambda source: resize_image(source, feature_size), ['source'], resource = 'opencv')
+        graph.add(
+            'image_features',
+            lambda resized: self.data_preprocessor.features_from_image(to_unit_float(resized)),
+            ['resized']
+        )
+        graph.add(
+            'style_classification',
+            lambda source, resized: self.classification_model.predict_batch(
+                [resize_image(resized if classifier_size == feature_size else source, classifier_size)[..., ::-1]]
+            )[0],
+            ['source', 'resized'], resource = 'tensorflow'
+        )
+        graph.add(
+            'clip_embedding',
+            lambda source: self.style_recommendation_model.encode_images([np.ascontiguousarray(source[..., ::-1])]),
+            ['source'], resource = 'torch'
+        )
+        graph.add(
+            'recommended_styles',
+            lambda clip_embedding: self.style_recommendation_model.recommend_styles_from_embeddings(
+                clip_embedding, top_k = top_k
+            )[0],
+            ['clip_embedding']
         )
-        logging.info(f"Recommendations Generated : {recommendations}")
+        graph.add(
+            'similar_rooms',
+            lambda clip_embedding: self._search_catalog(clip_embedding, top_k = top_k),
+            ['clip_embedding']
+        )
+        return graph 
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            with self._model_lock:
+                if self._pipeline is None:
+                    self._pipeline_executor = ThreadPoolExecutor(
+                        max_workers = self.performance_profile.pipeline_workers,
+                        thread_name_prefix = 'pipeline'
+                    )
+                    self._pipeline = self._build_pipeline() 
+        return self._pipeline 
+
+    @property
+    def inference_service(self):
+        if self._inference_service is None:
+            with self._model_lock:
+                if self._inference_service is None:
+                    self._inference_service = InferenceService(
+                        self,
+                        max_batch_size = self.pipeline_config['max_batch_size'],
+                        max_wait_ms = self.pipeline_config['max_batch_wait_ms'],
+                        max_workers = self.performance_profile.pipeline_workers,
+                        top_k = self.style_recommendation_config['top_k_recommendations']
+                    )
+        return self._inference_service 
+
+    def close(self):
+        if self._inference_service is not None:
+            self._inference_service.close_threadsafe() 
+            self._inference_service = None 
+        if self._pipeline_executor is not None:
+            self._pipeline_executor.shutdown(wait = True) 
+            self._pipeline, self._pipeline_executor = None, None 
+
+    @metrics_module.timed('recommend_designs.compute')
+    def _recommend_designs(self, input_image_path):
+        logging.info(f"Generating Recommendations for {input_image_path}...")
+        if self.pipeline_config['micro_batching']:
+            recommendations = self.inference_service.recommend_designs_threadsafe(input_image_path) 
+        else:
+            recommendations = self.pipeline.run(
+                self._pipeline_executor,
+                outputs = ('image_features', 'style_classification', 'recommended_styles', 'similar_rooms'),
+                image_path = input_image_path
+            )
+        logging.info(f"Recommendations Generated : {recommendations['recommended_styles']}")
+        return recommendations 
+
+    
+    def effective_settings(self):
+        # what this process actually runs with: the resolved profile plus the thread limits that
+        # took effect (frameworks not installed or already started are missing from 'threads')
+        return {
+            'profile' : self.performance_profile.name,
+            'settings' : self.performance_profile.to_dict(),
+            'threads' : dict(applied_thread_limits),
+            'framework_concurrency' : dict(self.pipeline_config['framework_concurrency']),
+            'loaded_models' : [name for name in self.MODEL_NAMES if self.is_loaded(name)]
+        }
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot() 
+
+    def metrics_text(self, format = 'prometheus'):
+        if format == 'prometheus':
+            return self.metrics.to_prometheus() 
+        if format == 'json':
+            return self.metrics.to_json() 
+        raise ValueError(f"Unknown Metrics Format : {format}")
 
     
     def generate_design(self, style_descriptions):
@@ -79,13 +416,38 @@ class InteriorDesignAI:
         return self.design_generation_model.generate(style_descriptions) 
 
 
+def build_server_app(models = None):
+    interior_design_ai = InteriorDesignAI() 
+    interior_design_ai.warmup(models) 
+    return interior_design_ai 
+
+
+def serve(host = None, port = None, workers = None):
+    server_config = ModelConfiguration.get_server_config() 
+    preload_models = server_config['preload_models'] 
+    profile = ModelConfiguration.get_performance_profile() 
+    server = PreforkServer(
+        lambda: build_server_app(preload_models),
+        host = host or server_config['host'],
+        port = port or server_config['port'],
+        workers = workers or profile.server_workers,
+        preload = server_config['preload'],
+        worker_timeout = server_config['worker_timeout_seconds'],
+        request_timeout = server_config['request_timeout_seconds'],
+        profile = profile
+    )
+    server.serve_forever() 
+
+
 def main():
     try:
         interior_design_ai = InteriorDesignAI() 
         logging.info("Initialized Interior Design AI System.")
+        logging.info(f"Startup Timings : {interior_design_ai.startup_timings}")
+        logging.info(f"Effective Settings : {interior_design_ai.effective_settings()}")
 
         logging.info("Starting Dataset Preprocessing ...")
-        processed_data = interior_design_ai.preprocess_dataset() 
+        processed_data = interior_design_ai.iter_dataset() 
 
         logging.info("Training Models ...")
         interior_design_ai.train_models(processed_data) 
@@ -104,4 +466,13 @@ def main():
     
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        parser = argparse.ArgumentParser(description = "Serve recommend_designs from pre-forked workers")
+        parser.add_argument('command', choices = ['serve'])
+        parser.add_argument('--host', default = None)
+        parser.add_argument('--port', type = int, default = None)
+        parser.add_argument('--workers', type = int, default = None)
+        args = parser.parse_args() 
+        serve(args.host, args.port, args.workers) 
+    else:
+        main()
@@ -1,29 +1,69 @@
+import os 
+import hashlib 
 import tensorflow as tf 
 import numpy as np 
 from tensorflow.keras.applications.resnet50 import ResNet50, preprocess_input 
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Input
 from tensorflow.keras.models import Model 
+from itertools import islice
+from config.model_config import ModelConfiguration
+from utils.image_io import decode_image
+from utils.prefetch import prefetch
+from utils.metrics import timed, timer
+from utils.model_utils import ModelUtilities
+from utils.stage_scheduler import apply_profile_threads
+
+# rows hashed per update by _embeddings_key
+_KEY_BLOCK_ROWS = 64
+
 
 class InteriorClassification:
-    def __init__(self, input_shape = (224, 224, 3), num_classes = 5):
+    def __init__(self, input_shape = (224, 224, 3), num_classes = 5,
+                 weights_path = '/content/drive/MyDrive/system/ResNet50_weights_tf_dim_ordering_tf_kernels.h5',
+                 model = None):
         self.input_shape = input_shape 
         self.num_classes = num_classes 
-        self.model = self._build_model() 
+        self.weights_path = weights_path 
+        # TF only honours thread settings made before its runtime starts, i.e. before the model is built
+        self.profile = ModelConfiguration.get_performance_profile() 
+        apply_profile_threads(self.profile, 'tensorflow') 
+        # a prebuilt model (e.g. a small benchmark network) skips the ResNet50 build
+        if model is None:
+            self.model = self._build_model() 
+        else:
+            self.model = model 
+            self._bind_submodels(model) 
     
     def _build_model(self):
         base_model = ResNet50(
-            weights = '/content/drive/MyDrive/system/ResNet50_weights_tf_dim_ordering_tf_kernels.h5',
+            weights = self.weights_path,
             include_top = False,
             input_shape = self.input_shape
         )
+        ModelUtilities.record_weights(self.weights_path) 
 
         for layer in base_model.layers:
             layer.trainable = False 
 
         
-        x = base_model.output 
-        x = GlobalAveragePooling2D()(x) 
-        x = Dense(1024, activation = "relu")(x) 
+        pooled = GlobalAveragePooling2D(name = "Interior_Pooling")(base_model.output) 
+        head = self._build_head(int(pooled.shape[-1])) 
+
+        predictions = head(pooled) 
+        model = Model(inputs = base_model.input, outputs = predictions) 
+        self._bind_submodels(model) 
+
+        model.compile(
+            optimizer = tf.keras.optimizers.Adam(learning_rate =0.00001),
+            loss = 'categorical_crossentropy',
+            metrics = ['accuracy']
+        )
+
+        return model 
+
+    def _build_head(self, embedding_dim):
+        inputs = Input(shape = (embedding_dim,)) 
+        x = Dense(1024, activation = "relu")(inputs) 
         x = Dense(512, activation = "relu")(x) 
 
         predictions = Dense(
@@ -32,17 +72,124 @@ class InteriorClassification:
             name= "Interior_Classification"
         )(x) 
 
-        model = Model(inputs = base_model.input, outputs = predictions) 
+        return Model(inputs = inputs, outputs = predictions, name = "Interior_Head") 
 
-        model.compile(
-            optimizer = tf.keras.optimizers.Adam(learning_rate =0.00001),
+    def _bind_submodels(self, model):
+        # the frozen backbone and the trainable head are separate models sharing layers with
+        # self.model, so a head trained on cached embeddings is the head of the full model; they are
+        # rebound whenever self.model is replaced, and dropped when it is not a Keras model
+        self.backbone, self.head = None, None 
+        if not isinstance(model, tf.keras.Model):
+            return 
+
+        try:
+            self.head = model.get_layer("Interior_Head") 
+        except ValueError:
+            return 
+        pooling = [layer for layer in model.layers if isinstance(layer, GlobalAveragePooling2D)] 
+        if pooling:
+            self.backbone = Model(inputs = model.input, outputs = pooling[-1].output, name = "Interior_Backbone") 
+        else:
+            self.head = None 
+
+    def _require_submodels(self):
+        if self.backbone is None or self.head is None:
+            raise RuntimeError("Cached-Embedding Training Needs The Keras Model, Not A Quantized Or Foreign One")
+
+    def _embeddings_key(self, images):
+        # the cached embeddings are only valid for the same pixels through the same backbone weights;
+        # rows are hashed in fixed blocks, so the key does not depend on the embedding batch size
+        digest = hashlib.blake2b(digest_size = 20) 
+        for weights in self.backbone.get_weights():
+            digest.update(np.ascontiguousarray(weights)) 
+        digest.update(repr((len(images), tuple(self.input_shape))).encode('utf-8')) 
+        for start in range(0, len(images), _KEY_BLOCK_ROWS):
+            block = np.ascontiguousarray(np.asarray(images[start:start + _KEY_BLOCK_ROWS])) 
+            digest.update(f"{block.dtype}{block.shape[1:]}".encode('utf-8')) 
+            digest.update(block) 
+        return digest.hexdigest() 
+
+    @timed('classification.compute_embeddings', items_arg = 'images')
+    def compute_embeddings(self, images, cache_path, batch_size = None, reuse = True):
+        self._require_submodels() 
+        batch_size = batch_size or self.profile.embedding_batch_size 
+        num_images = len(images) 
+        embedding_dim = int(self.backbone.output.shape[-1]) 
+        key = self._embeddings_key(images) 
+        key_path = f"{cache_path}.key" 
+
+        if reuse and os.path.exists(cache_path) and os.path.exists(key_path):
+            with open(key_path) as f:
+                cached_key = f.read().strip() 
+            cached = np.load(cache_path, mmap_mode = 'r') 
+            if cached_key == key and cached.shape == (num_images, embedding_dim):
+                return cached 
+
+        # the key is dropped first, so an interrupted pass never leaves a valid-looking cache
+        if os.path.exists(key_path):
+            os.remove(key_path) 
+
+        # embeddings go straight into a memory-mapped .npy, so the backbone pass runs once
+        # and the image tensor is only ever held one batch at a time
+        embeddings = np.lib.format.open_memmap(
+            cache_path,
+            mode = 'w+',
+            dtype = np.float32,
+            shape = (num_images, embedding_dim)
+        )
+        for start in range(0, num_images, batch_size):
+            batch = np.asarray(images[start:start + batch_size], dtype = np.float32) 
+            embeddings[start:start + len(batch)] = self.backbone.predict_on_batch(preprocess_input(batch)) 
+        embeddings.flush() 
+        del embeddings 
+        with open(key_path, 'w') as f:
+            f.write(key) 
+
+        return np.load(cache_path, mmap_mode = 'r') 
+
+    @timed('classification.train_head')
+    def train_head(self, embeddings, train_labels, validation_data = None, epochs = 10,
+                   batch_size = 256, learning_rate = 0.001):
+        self._require_submodels() 
+        self.head.compile(
+            optimizer = tf.keras.optimizers.Adam(learning_rate = learning_rate),
             loss = 'categorical_crossentropy',
             metrics = ['accuracy']
         )
 
-        return model 
+        return self.head.fit(
+            embeddings,
+            train_labels,
+            validation_data = validation_data,
+            epochs = epochs,
+            batch_size = batch_size,
+            shuffle = True
+        )
+
+    def train_with_cached_embeddings(self, train_images, train_labels, cache_path, validation_data = None,
+                                     epochs = 10, batch_size = 256, embedding_batch_size = 64):
+        train_embeddings = self.compute_embeddings(train_images, cache_path, batch_size = embedding_batch_size) 
+
+        if validation_data is not None:
+            val_images, val_labels = validation_data 
+            root, ext = os.path.splitext(cache_path) 
+            val_embeddings = self.compute_embeddings(
+                val_images,
+                f"{root}_val{ext or '.npy'}",
+                batch_size = embedding_batch_size
+            )
+            validation_data = (val_embeddings, val_labels) 
+
+        return self.train_head(
+            train_embeddings,
+            train_labels,
+            validation_data = validation_data,
+            epochs = epochs,
+            batch_size = batch_size
+        )
     
 
+    @timed('classification.train')
     def train(self, train_data, validation_data, epochs = 10):
         return self.model.fit(
             train_data,
@@ -50,10 +197,78 @@ class InteriorClassification:
             epochs = epochs
         )
     
+    @timed('classification.predict')
     def predict(self, image):
-        preprocessed_image = preprocess_input(np.expand_dims(image, axis = 0))
+        preprocessed_image = preprocess_input(np.expand_dims(image, axis = 0).astype(np.float32))
+        return self.model.predict_on_batch(preprocessed_image)[0] 
+
+    def _load_input(self, item, out):
+        target_size = (self.input_shape[1], self.input_shape[0]) 
+        if isinstance(item, str):
+            # keep 0-255 pixels for preprocess_input; OpenCV decodes BGR, array inputs are RGB
+            out[...] = decode_image(item, target_size)[..., ::-1] 
+        else:
+            out[...] = item 
+
+    def _iter_input_batches(self, inputs, batch_size):
+        iterator = iter(inputs) 
+        while True:
+            items = list(islice(iterator, batch_size)) 
+            if not items:
+                return 
+
+            with timer('classification.decode', len(items)):
+                batch = np.empty((len(items),) + tuple(self.input_shape), dtype = np.float32) 
+                for i, item in enumerate(items):
+                    self._load_input(item, batch[i]) 
+                batch = preprocess_input(batch) 
+            yield batch 
+
+    def iter_predict_batches(self, inputs, batch_size = None, prefetch_batches = None):
+        batch_size = batch_size or self.profile.batch_size 
+        prefetch_batches = prefetch_batches or self.profile.prefetch_batches 
+        # decoding and preprocess_input for the next batches run on a background thread
+        # while the current batch is in the forward pass
+        for batch in prefetch(self._iter_input_batches(inputs, batch_size), depth = prefetch_batches):
+            with timer('classification.forward', len(batch)):
+                probabilities = self.model.predict_on_batch(batch) 
+            yield probabilities 
+
+    def predict_batch(self, paths_or_arrays, batch_size = None, prefetch_batches = None, stream = False):
+        batches = self.iter_predict_batches(paths_or_arrays, batch_size, prefetch_batches) 
+        if stream:
+            return batches 
+
+        probabilities = [np.asarray(batch) for batch in batches] 
+        if not probabilities:
+            return np.empty((0, self.num_classes), dtype = np.float32) 
+        return np.concatenate(probabilities, axis = 0) 
+
+    def export_quantized(self, export_path, calibration_inputs, mode = 'int8', export_format = 'tflite',
+                         num_calibration_samples = 200):
+        # calibration runs the same decode + preprocess_input path that serving uses
+        calibration_batches = self._iter_input_batches(calibration_inputs, batch_size = 16) 
+        return ModelUtilities.export_quantized(
+            self.model,
+            export_path,
+            mode = mode,
+            export_format = export_format,
+            calibration_data = calibration_batches,
+            num_calibration_samples = num_calibration_samples
+        )
+
+    def load_quantized(self, model_path, num_threads = None):
+        # a quantized runtime exposes predict_on_batch, so it drops in behind predict/predict_batch
+        quantized = ModelUtilities.load_quantized_model(model_path, num_threads = num_threads) 
+        if quantized is None:
+            return False 
+        self.model = quantized 
+        self._bind_submodels(quantized) 
+        return True 
 
     def save(self, filepath):
         self.model = tf.keras.models.load_model(filepath) 
+        self._bind_submodels(self.model) 
+        ModelUtilities.record_weights(filepath) 
     
 
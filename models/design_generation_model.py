@@ -1,197 +1,142 @@
 import numpy as np 
-import pandas as pd 
-import tensorflow as tf 
-from sklearn.preprocessing import StandardScaler 
-from sklearn.cluster import KMeans 
+from config.model_config import ModelConfiguration 
+from utils.detections import Detections 
+from utils import placement 
+from utils.metrics import timed 
+from utils.style_knowledge import load_style_knowledge 
 
 class DesignGenerationModel:
     def __init__(self):
-        self.design_rule =  {
-            "Modern Minimalist": {
-                "color_palette": ["white", "gray", "black"],
-                "furniture_guidelines": {
-                    "sofa": ["low-profile", "clean-lines"],
-                    "table": ["geometric", "minimal-decor"]
-                }
-            },
-            "Bohemian": {
-                "color_palette": ["terracotta", "mustard", "sage-green"],
-                "furniture_guidelines": {
-                    "sofa": ["textured", "plush"],
-                    "table": ["wooden", "organic-shapes"]
-                }
-            },
-            "Scandinavian": {
-                "color_palette": ["white", "light-wood", "soft-blue"],
-                "furniture_guidelines": {
-                    "sofa": ["simple", "light-fabric"],
-                    "table": ["natural-wood", "functional"]
-                }
-            },
-            "Industrial Loft": {
-                "color_palette": ["charcoal", "exposed-brick", "steel-gray"],
-                "furniture_guidelines": {
-                    "sofa": ["leather", "industrial"],
-                    "table": ["metal", "reclaimed-wood"]
-                }
-            },
-            "Mid-Century Modern": {
-                "color_palette": ["teal", "orange", "wood-brown"],
-                "furniture_guidelines": {
-                    "sofa": ["angular", "retro-fabric"],
-                    "table": ["round", "teak-wood"]
-                }
-            },
-            "Japandi": {
-                "color_palette": ["neutral-tones", "black", "wood"],
-                "furniture_guidelines": {
-                    "sofa": ["low-profile", "minimal"],
-                    "table": ["simple", "light-wood"]
-                }
-            },
-            "Coastal": {
-                "color_palette": ["white", "blue", "sand"],
-                "furniture_guidelines": {
-                    "sofa": ["light-fabric", "casual"],
-                    "table": ["weathered-wood", "nautical"]
-                }
-            },
-            "Art Deco": {
-                "color_palette": ["gold", "black", "rich-emerald"],
-                "furniture_guidelines": {
-                    "sofa": ["luxurious", "velvet"],
-                    "table": ["glossy", "metal"]
-                }
-            },
-            "Rustic": {
-                "color_palette": ["earthy-brown", "green", "beige"],
-                "furniture_guidelines": {
-                    "sofa": ["plush", "wooden-frame"],
-                    "table": ["rough-wood", "handcrafted"]
-                }
-            },
-            "Contemporary": {
-                "color_palette": ["neutral-tones", "black", "blue"],
-                "furniture_guidelines": {
-                    "sofa": ["bold-lines", "multi-color"],
-                    "table": ["glass-top", "sleek"]
-                }
-            },
-            "Traditional": {
-                "color_palette": ["cream", "dark-wood", "burgundy"],
-                "furniture_guidelines": {
-                    "sofa": ["classic", "structured"],
-                    "table": ["mahogany", "detailed-carvings"]
-                }
-            },
-            "Transitional": {
-                "color_palette": ["beige", "gray", "white"],
-                "furniture_guidelines": {
-                    "sofa": ["neutral", "blended-styles"],
-                    "table": ["simple", "multi-material"]
-                }
-            },
-            "Eclectic": {
-                "color_palette": ["varied-bright", "earth-tones"],
-                "furniture_guidelines": {
-                    "sofa": ["mix-and-match", "colorful"],
-                    "table": ["vintage", "quirky"]
-                }
-            },
-            "Mediterranean": {
-                "color_palette": ["blue", "white", "terracotta"],
-                "furniture_guidelines": {
-                    "sofa": ["woven", "comfortable"],
-                    "table": ["stone", "rustic"]
+        self.config = ModelConfiguration.get_design_generation_config() 
+        # shared across instances; design_rule keeps the old style -> rules mapping as a read-only view
+        self.knowledge = load_style_knowledge(self.config.get('style_knowledge_path')) 
+        self.design_rule = self.knowledge.rules 
+    
+    def _build_layout(self, style, style_index, object_counts, room_placement = None):
+        if style_index < 0:
+            palette, guidelines, recommendations = (), {}, () 
+        else:
+            palette = self.knowledge.color_palettes[style_index] 
+            guidelines = self.knowledge.furniture_guidelines[style_index] 
+            recommendations = self.knowledge.recommendations[style_index] 
+
+        layout = {
+            "style" : style,
+            "color_palette" : list(palette),
+            "furniture_placement" : {
+                obj_type : {
+                    "count" : count,
+                    "recommended_style" : list(guidelines.get(obj_type, ()))
                 }
+                for obj_type, count in object_counts.items()
             },
-            "Farmhouse": {
-                "color_palette": ["white", "gray", "light-wood"],
-                "furniture_guidelines": {
-                    "sofa": ["simple", "comfortable"],
-                    "table": ["wooden", "distressed"]
-                }
-            }
+            "design_recommendations" : list(recommendations)
         }
+        if room_placement is not None:
+            layout["zones"], layout["placement_slots"] = room_placement 
+        return layout 
 
-        self.placement_model = KMeans(n_clusters = 3)
-    
-    def generate_design_layout(self, style, detected_objects):
-        style_rules = self.design_rule(style, {}) 
+    @staticmethod
+    def _as_detections(detections_batch):
+        if isinstance(detections_batch, Detections):
+            return detections_batch 
 
-        layout_suggestions = {
-            "style" : style,
-            "color_palette" : style_rules.get("color_palette", []),
-            "furniture_placement" : {},
-            "design_recommendations" : []
-        }
+        parts = [d if isinstance(d, Detections) else Detections.from_dict(d) for d in detections_batch] 
+        if not parts:
+            return None 
+        class_names = parts[0].class_names 
+        if any(part.class_names != class_names for part in parts):
+            # legacy dicts each carry only the classes they saw; put every room on one shared index
+            class_names = tuple(sorted({name for part in parts for name in part.class_names})) 
+            parts = [part.with_class_names(class_names) for part in parts] 
+        return Detections.concatenate(parts) 
 
+    @staticmethod
+    def _batch_object_counts(batch, detections_batch):
+        if not isinstance(detections_batch, Detections) and \
+                not all(isinstance(d, Detections) for d in detections_batch):
+            # legacy dicts keep their own counts, which may not be backed by boxes
+            return [d.get("count", {}) for d in detections_batch] 
 
-        for obj_type, count in detected_objects.get("count", {}).items():
-            guidelines = style_rules.get("furniture_guidelines", {}).get(obj_type, [])
+        # one bincount over (image, class) pairs gives the per-room object counts of the whole batch
+        num_classes = len(batch.class_names) 
+        counts = np.bincount(
+            batch.image_ids.astype(np.int64) * num_classes + batch.class_ids,
+            minlength = batch.num_images * num_classes
+        ).reshape(batch.num_images, num_classes) 
 
-            layout_suggestions['furniture_placement'][obj_type] = {
-                "count" : count, 
-                "recommended_style" : guidelines
-            }
-        
-        layout_suggestions['design_recommendations'] = self._generate_recommendations(
-            style, detected_objects
-        )
+        rows, cols = np.nonzero(counts) 
+        bounds = np.searchsorted(rows, np.arange(batch.num_images + 1)) 
+        names = batch.class_names 
+        values = counts[rows, cols].tolist() 
+        cols = cols.tolist() 
+        return [
+            {names[cols[j]] : values[j] for j in range(start, end)}
+            for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        ]
 
-        return layout_suggestions 
-    
-    def _generate_recommendations(self, style, detected_objects):
-        recommendations = [] 
-        if style == "Modern Minimalist":
-            recommendations.append("Consider adding a sleek, low-profile sofa to match the minimal decor.")
-            recommendations.append("Use geometric table designs to enhance the modern feel.")
-        elif style == "Bohemian":
-            recommendations.append("Layer textured fabrics and colorful throw pillows for a bohemian touch.")
-            recommendations.append("Include rustic, wooden tables and chairs for an organic look.")
-        elif style == "Scandinavian":
-            recommendations.append("Opt for functional and simple furniture with light-wood finishes.")
-            recommendations.append("Add soft, cozy blankets and light fabric sofa covers.")
-        elif style == "Industrial Loft":
-            recommendations.append("Incorporate metal elements and exposed brick features.")
-            recommendations.append("Use leather sofas and industrial-style light fixtures.")
-        elif style == "Mid-Century Modern":
-            recommendations.append("Choose angular sofas with retro patterns.")
-            recommendations.append("Add teak wood tables for a mid-century vibe.")
-        elif style == "Japandi":
-            recommendations.append("Select minimalistic furniture with light wood and neutral tones.")
-            recommendations.append("Keep decoration simple, using natural materials like bamboo or linen.")
-        elif style == "Coastal":
-            recommendations.append("Use light, airy fabrics and incorporate nautical elements.")
-            recommendations.append("Add weathered-wood furniture and whitewashed decor.")
-        elif style == "Art Deco":
-            recommendations.append("Incorporate bold geometric shapes and luxury materials.")
-            recommendations.append("Use gold accents and mirrored surfaces to add elegance.")
-        elif style == "Rustic":
-            recommendations.append("Add earthy tones and handcrafted wooden furniture.")
-            recommendations.append("Use textured fabric cushions and woven items for added warmth.")
-        elif style == "Contemporary":
-            recommendations.append("Include bold, clean lines and unique shapes.")
-            recommendations.append("Use a mix of materials like glass, metal, and wood for contrast.")
-        elif style == "Traditional":
-            recommendations.append("Use rich, deep colors and classic furniture.")
-            recommendations.append("Incorporate detailed woodwork and ornate patterns.")
-        elif style == "Transitional":
-            recommendations.append("Blend traditional and contemporary pieces for a balanced look.")
-            recommendations.append("Use neutral tones and simple designs for a versatile decor.")
-        elif style == "Eclectic":
-            recommendations.append("Mix vintage and modern furniture for an unexpected look.")
-            recommendations.append("Add unique, one-of-a-kind decorative pieces.")
-        elif style == "Mediterranean":
-            recommendations.append("Incorporate terra-cotta tiles and stone surfaces.")
-            recommendations.append("Use woven materials and rustic wooden furniture.")
-        elif style == "Farmhouse":
-            recommendations.append("Add cozy, simple furniture with a weathered finish.")
-            recommendations.append("Use whitewashed wood and soft, natural fabrics.")
-        
-        return recommendations
+    def _placements(self, batch):
+        plan = placement.plan(
+            batch,
+            n_zones = self.config['placement_zones'],
+            n_slots = self.config['placement_slots'],
+            grid_size = self.config['placement_grid_size']
+        ) 
+        dominant = plan['zone_dominant_class'] 
+        class_names = np.asarray(list(batch.class_names) + [None], dtype = object)[dominant] 
+        functions = placement.zone_functions(batch.class_names)[dominant] 
+
+        zone_valid = plan['zone_valid'].tolist() 
+        centers = plan['zone_centers'].tolist() 
+        boxes = plan['zone_boxes'].tolist() 
+        counts = plan['zone_counts'].tolist() 
+        slot_valid = plan['slot_valid'].tolist() 
+        positions = plan['slot_positions'].tolist() 
+        clearances = plan['slot_clearance'].tolist() 
 
+        placements = [] 
+        for m in range(batch.num_images):
+            zones = [
+                {
+                    "function" : functions[m, z],
+                    "anchor" : class_names[m, z],
+                    "center" : tuple(centers[m][z]),
+                    "bbox" : tuple(boxes[m][z]),
+                    "object_count" : counts[m][z]
+                }
+                for z in range(len(zone_valid[m])) if zone_valid[m][z]
+            ]
+            slots = [
+                {"position" : tuple(positions[m][s]), "clearance" : clearances[m][s]}
+                for s in range(len(slot_valid[m])) if slot_valid[m][s]
+            ]
+            placements.append((zones, slots)) 
+        return placements 
+
+    @timed('design.generate_layout')
+    def generate_design_layout(self, style, detected_objects):
+        return self.generate_design_layouts([style], [detected_objects])[0] 
 
-        
+    @timed('design.generate_layouts', items_arg = 'detections_batch')
+    def generate_design_layouts(self, styles, detections_batch):
+        batch = self._as_detections(detections_batch) 
+        if batch is None:
+            return [] 
 
+        object_counts = self._batch_object_counts(batch, detections_batch) 
+        if isinstance(styles, str):
+            styles = [styles] * len(object_counts) 
+        elif len(styles) != len(object_counts):
+            raise ValueError(f"Got {len(styles)} Styles For {len(object_counts)} Rooms")
 
+        # zones and free-space slots for every room come from one vectorized clustering pass
+        placements = self._placements(batch) 
+        style_indices = self.knowledge.indices_of(styles).tolist() 
+        return [
+            self._build_layout(style, style_index, counts, room_placement)
+            for style, style_index, counts, room_placement in zip(styles, style_indices, object_counts, placements)
+        ]
+    
+    def _generate_recommendations(self, style, detected_objects):
+        style_index = self.knowledge.index_of(style) 
+        return list(self.knowledge.recommendations[style_index]) if style_index >= 0 else []
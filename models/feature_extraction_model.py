@@ -1,14 +1,39 @@
-import torch 
-from ultralytics import YOLO 
 import cv2 
 import numpy as np 
+from utils.detections import Detections
+from utils import spatial_analysis
+from utils.metrics import timed
+from utils.model_utils import ModelUtilities
+from utils.stage_scheduler import apply_profile_threads
+from config.model_config import ModelConfiguration
 
 class InteriorFeatureExtractionModel:
-    def __init__(self, pretrained_weights="/content/drive/MyDrive/system/yolo8n.pt"):
+    def __init__(self, pretrained_weights="/content/drive/MyDrive/system/yolo8n.pt", model=None, interior_classes=None):
+        self.profile = ModelConfiguration.get_performance_profile()
+        apply_profile_threads(self.profile, 'torch')
+        if model is not None:
+            # a prebuilt detector (e.g. a benchmark stub) with the YOLO predict interface
+            self.model = model
+        else:
+            self.model = self._load_model(pretrained_weights)
+
+        # Define interior classes for object detection
+        self.interior_classes = list(interior_classes) if interior_classes is not None else [
+            'kitchen', 'dining', 'living', 'bedroom', 'bathroom',
+            'sofa', 'chair', 'table', 'bed', 'tv',
+            'lamp', 'bookshelf', 'window', 'door'
+        ]
+
+    def _load_model(self, pretrained_weights):
         try:
+            # ultralytics is imported here, so a detector given another model does not need it
+            from ultralytics import YOLO
+
             # Load the model with the specified weights
-            self.model = YOLO(pretrained_weights)
+            model = YOLO(pretrained_weights)
             print(f"Model loaded successfully with weights from {pretrained_weights}")
+            ModelUtilities.record_weights(pretrained_weights)
+            return model
         except FileNotFoundError:
             print(f"Error: The file {pretrained_weights} does not exist. Please check the path.")
             raise
@@ -16,13 +41,7 @@ class InteriorFeatureExtractionModel:
             print(f"An error occurred while loading the model: {e}")
             raise
 
-        # Define interior classes for object detection
-        self.interior_classes = [
-            'kitchen', 'dining', 'living', 'bedroom', 'bathroom',
-            'sofa', 'chair', 'table', 'bed', 'tv',
-            'lamp', 'bookshelf', 'window', 'door'
-        ]
-
+    @timed('detection.train')
     def train(self, dataset_path, epochs=50, imgsz=640):
         try:
             results = self.model.train(
@@ -35,53 +54,71 @@ class InteriorFeatureExtractionModel:
             print(f"An error occurred during training: {e}")
             raise
 
+    def _result_to_detections(self, result):
+        # one device-to-host transfer per image: boxes.data is (N, 6) = x1, y1, x2, y2, conf, cls
+        data = result.boxes.data.cpu().numpy() 
+        names = self.model.names 
+        class_names = [names[i] for i in range(len(names))] 
+
+        height, width = result.orig_shape[:2] 
+        return Detections.from_array(data, class_names, image_size = (width, height)) 
+
+    @timed('detection.detect_objects')
     def detect_objects(self, image_path):
         try:
             results = self.model(image_path)[0]
-            detected_objects = {
-                "objects": [],
-                "count": {}
-            }
-
-            for result in results.boxes:
-                cls = int(result.cls[0])
-                conf = float(result.conf[0])
-                class_name = self.model.names[cls]
-
-                x1, y1, x2, y2 = result.xyxy[0]
-                object_info = {
-                    'class': class_name,
-                    'confidence': conf,
-                    'bbox': {
-                        'x1': float(x1),
-                        'y1': float(y1),
-                        'x2': float(x2),
-                        'y2': float(y2)
-                    }
-                }
-
-                detected_objects['objects'].append(object_info)
-                detected_objects['count'][class_name] = detected_objects['count'].get(class_name, 0) + 1
-
-            return detected_objects
+            return self._result_to_detections(results)
         except Exception as e:
             print(f"An error occurred during object detection: {e}")
             raise
 
-    def detect_features(self, detected_objects):
+    @timed('detection.detect_objects_batch', items_arg='image_paths')
+    def detect_objects_batch(self, image_paths, batch_size=None):
+        batch_size = batch_size or self.profile.detection_batch_size
         try:
-            features = {
-                'object_composition': {},
-                "spatial_analysis": {}
-            }
+            detections = []
+            for start in range(0, len(image_paths), batch_size):
+                # one YOLO call per batch instead of one per image
+                results = self.model(list(image_paths[start:start + batch_size]), verbose=False)
+                detections.extend(self._result_to_detections(result) for result in results)
+            return detections
+        except Exception as e:
+            print(f"An error occurred during batch object detection: {e}")
+            raise
 
-            for obj in detected_objects['objects']:
-                cls = obj['class']
-                features['object_composition'][cls] = features['object_composition'].get(cls, 0) + 1
+    @timed('detection.spatial_analysis_batch')
+    def detect_features_batch(self, detections, grid_size=8):
+        # all boxes of all images are analysed in one vectorized pass
+        if not isinstance(detections, Detections):
+            detections = Detections.concatenate(list(detections))
+        return spatial_analysis.analyze(detections, grid_size=grid_size)
+
+    @timed('detection.spatial_analysis')
+    def detect_features(self, detected_objects, grid_size=8):
+        try:
+            if not isinstance(detected_objects, Detections):
+                detected_objects = Detections.from_dict(detected_objects)
 
-            features['spatial_analysis'] = {
-                'object_density': len(detected_objects['objects']) / (640 * 640),
-                'unique_object_types': len(set(obj['class'] for obj in detected_objects['objects']))
+            analysis = spatial_analysis.analyze(detected_objects, grid_size=grid_size)
+            class_names = detected_objects.class_names
+            coverage = analysis['class_area_coverage'][0]
+
+            features = {
+                'object_composition': detected_objects.count,
+                "spatial_analysis": {
+                    'object_density': float(analysis['object_density'][0]),
+                    'unique_object_types': int(analysis['unique_object_types'][0]),
+                    'occupancy_grid': analysis['occupancy_grid'][0],
+                    'occupied_fraction': float(analysis['occupied_fraction'][0]),
+                    'iou_matrix': analysis['iou_matrix'][0],
+                    'max_iou': float(analysis['max_iou'][0]),
+                    'overlapping_pairs': int(analysis['overlapping_pairs'][0]),
+                    'class_area_coverage': {
+                        class_names[cls]: float(coverage[cls]) for cls in np.flatnonzero(coverage)
+                    },
+                    'mean_centroid': tuple(analysis['mean_centroid'][0].tolist()),
+                    'centroid_spread': tuple(analysis['centroid_spread'][0].tolist())
+                }
             }
 
             return features
@@ -1,30 +1,36 @@
+import os 
+import json 
+import hashlib 
 import torch 
 from transformers import CLIPProcessor, CLIPModel 
+from PIL import Image 
 import numpy as np 
+from config.model_config import ModelConfiguration 
+from utils.detections import Detections 
+from utils.metrics import timed 
+from utils.model_utils import ModelUtilities 
+from utils.stage_scheduler import apply_profile_threads 
+from utils.style_knowledge import load_style_knowledge 
 
 
 class StyleRecommendationModel:
-    def __init__(self, model_name = "openai/clip-vit-base-patch32"):
-        self.model = CLIPModel.from_pretrained(model_name) 
-        self.processor = CLIPProcessor.from_pretrained(model_name)
-
-        self.design_styles = [
-            "Modern Minimalist",
-            "Scandinavian",
-            "Industrial Loft",
-            "Bohemian",
-            "Mid-Century Modern",
-            "Japandi",
-            "Coastal",
-            "Art Deco",
-            "Rustic",
-            "Contemporary",
-            "Traditional",
-            "Transitional",
-            "Eclectic",
-            "Mediterranean",
-            "Farmhouse"
-        ]
+    def __init__(self, model_name = "openai/clip-vit-base-patch32", cache_dir = None, model = None, processor = None):
+        self.model_name = model_name 
+        self.profile = ModelConfiguration.get_performance_profile() 
+        apply_profile_threads(self.profile, 'torch') 
+        # a prebuilt model or processor (e.g. a benchmark stub) is used as given
+        if model is None:
+            model = CLIPModel.from_pretrained(model_name) 
+            ModelUtilities.record_weights(model_name) 
+        self.model = model 
+        self.model.eval() 
+        self.processor = processor if processor is not None else CLIPProcessor.from_pretrained(model_name)
+        self.cache_dir = cache_dir or ModelConfiguration.get_style_recommendation_config()['text_embedding_cache_dir'] 
+        self._style_text_embeddings = None 
+
+        # the style list is the knowledge table's, so recommendations and layouts share one source
+        self.knowledge = load_style_knowledge(ModelConfiguration.get_design_generation_config()['style_knowledge_path']) 
+        self.design_styles = self.knowledge.styles 
 
     
     def _preprocess_image(self, image_path):
@@ -35,113 +41,92 @@ class StyleRecommendationModel:
         )['pixel_values'].squeeze()
 
         return image 
-    
-    def recommend_styles(self, detected_objects, top_k = 3):
-
-        object_description = ', '.join(
-            [f"{count} {obj}" for obj, count in detected_objects.get('count', {}).items()]
-        )
 
-        image_inputs = self.processor(
-            text = self.design_styles,
-            images = object_description,
-            return_tensors = 'pt',
-            padding = True
-        )
+    def _style_embeddings_path(self):
+        key = hashlib.sha1(json.dumps([self.model_name, self.design_styles]).encode('utf-8')).hexdigest()[:16] 
+        return os.path.join(self.cache_dir, f"clip_style_text_{key}.npy") 
 
+    @staticmethod
+    def _normalize(embeddings):
+        embeddings = np.asarray(embeddings, dtype = np.float32) 
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis = -1, keepdims = True), 1e-12) 
 
+    @timed('styles.encode_texts', items_arg = 'texts')
+    def _encode_texts(self, texts):
+        text_inputs = self.processor(text = texts, return_tensors = 'pt', padding = True) 
         with torch.no_grad():
-            image_embeddings = self.model.get_image_features(**image_inputs)
-            text_embeddings = self.model.get_text_features(**image_inputs)
+            return self._normalize(self.model.get_text_features(**text_inputs).cpu().numpy()) 
+
+    @property
+    def style_text_embeddings(self):
+        # the style list is fixed, so its normalized text embeddings are computed once per
+        # (model, style list) and persisted; requests only pay for the image encode
+        if self._style_text_embeddings is None:
+            path = self._style_embeddings_path() 
+            if os.path.exists(path):
+                self._style_text_embeddings = np.load(path) 
+            else:
+                self._style_text_embeddings = self._encode_texts(self.design_styles) 
+                os.makedirs(self.cache_dir, exist_ok = True) 
+                tmp_path = f"{path}.tmp.npy" 
+                np.save(tmp_path, self._style_text_embeddings) 
+                os.replace(tmp_path, path) 
+        return self._style_text_embeddings 
+
+    @staticmethod
+    def _load_image(image):
+        if isinstance(image, str):
+            with Image.open(image) as opened:
+                return opened.convert('RGB') 
+        return image 
 
-        
-        similarity = torch.nn.functional.cosine_similarity(
-            image_embeddings, 
-            text_embeddings
+    @timed('styles.encode_images', items_arg = 'images')
+    def encode_images(self, images, batch_size = None):
+        # chunked so a long image list never becomes one huge pixel tensor
+        batch_size = batch_size or self.profile.embedding_batch_size 
+        images = list(images) 
+        embeddings = [] 
+        for start in range(0, len(images), batch_size):
+            image_inputs = self.processor(
+                images = [self._load_image(image) for image in images[start:start + batch_size]],
+                return_tensors = 'pt'
+            )
+            with torch.no_grad():
+                embeddings.append(self._normalize(self.model.get_image_features(**image_inputs).cpu().numpy())) 
+        return np.concatenate(embeddings, axis = 0) 
+
+    def _top_k_styles(self, query_embeddings, top_k):
+        similarity = query_embeddings @ self.style_text_embeddings.T 
+        top_k = min(top_k, similarity.shape[1]) 
+
+        top_indices = np.argpartition(-similarity, top_k - 1, axis = 1)[:, :top_k] 
+        order = np.argsort(-np.take_along_axis(similarity, top_indices, axis = 1), axis = 1) 
+        top_indices = np.take_along_axis(top_indices, order, axis = 1) 
+        return [[self.design_styles[idx] for idx in row] for row in top_indices] 
+
+    def recommend_styles_from_embeddings(self, image_embeddings, top_k = 3):
+        # for callers that already hold normalized image embeddings from encode_images
+        return self._top_k_styles(image_embeddings, top_k) 
+
+    @timed('styles.recommend_styles', items_arg = 'images_or_detected_objects')
+    def recommend_styles(self, images_or_detected_objects, top_k = 3):
+        # detection results are described in text and scored against the cached style matrix
+        if isinstance(images_or_detected_objects, (dict, Detections)):
+            object_description = ', '.join(
+                [f"{count} {obj}" for obj, count in images_or_detected_objects.get('count', {}).items()]
+            )
+            return self._top_k_styles(self._encode_texts([object_description or 'room']), top_k)[0] 
+
+        single = isinstance(images_or_detected_objects, (str, Image.Image)) or (
+            isinstance(images_or_detected_objects, np.ndarray) and images_or_detected_objects.ndim == 3
         )
+        images = [images_or_detected_objects] if single else list(images_or_detected_objects) 
+        if not images:
+            return [] 
 
-
-        top_styles_indices = similarity.topk(top_k).indices
-        recommended_styles = [self.design_styles[idx] for idx in top_styles_indices]
-
-        return recommended_styles 
+        recommended_styles = self._top_k_styles(self.encode_images(images), top_k) 
+        return recommended_styles[0] if single else recommended_styles 
     
+    @timed('styles.explain')
     def explain_style_recommendation(self, recommended_styles, detected_objects):
-        style_explanations = {}
-
-        for style in recommended_styles:
-            explanation = f"Based ON the {style} style , we recommend:"
-
-
-            style_recommendations =  {
-                "Modern Minimalist": {
-                    "furniture": ["clean-lined sofa", "geometric coffee table"],
-                    "colors": ["neutral tones", "white", "gray"]
-                },
-                "Scandinavian": {
-                    "furniture": ["light wood dining table", "modern armchair"],
-                    "colors": ["white", "soft pastels", "natural wood"]
-                },
-                "Industrial Loft": {
-                    "furniture": ["metal coffee table", "exposed shelving"],
-                    "colors": ["gray", "black", "warm brown"]
-                },
-                "Bohemian": {
-                    "furniture": ["textured armchair", "wooden side tables"],
-                    "colors": ["warm earth tones", "rich patterns"]
-                },
-                "Mid-Century Modern": {
-                    "furniture": ["teak dining chairs", "low-profile sofa"],
-                    "colors": ["teal", "mustard yellow", "walnut brown"]
-                },
-                "Japandi": {
-                    "furniture": ["simple wooden table", "low bed frame"],
-                    "colors": ["white", "soft beige", "light wood"]
-                },
-                "Coastal": {
-                    "furniture": ["white wicker chairs", "light wood table"],
-                    "colors": ["blue", "white", "sand tones"]
-                },
-                "Art Deco": {
-                    "furniture": ["glossy side table", "geometric chair"],
-                    "colors": ["gold", "black", "emerald green"]
-                },
-                "Rustic": {
-                    "furniture": ["wooden bench", "cozy armchair"],
-                    "colors": ["earthy brown", "cream", "deep green"]
-                },
-                "Contemporary": {
-                    "furniture": ["sleek sofa", "modern dining set"],
-                    "colors": ["neutral shades", "black", "white"]
-                },
-                "Traditional": {
-                    "furniture": ["carved wooden cabinet", "classic armchair"],
-                    "colors": ["deep red", "navy blue", "gold"]
-                },
-                "Transitional": {
-                    "furniture": ["mix of modern and traditional pieces"],
-                    "colors": ["gray", "beige", "muted blues"]
-                },
-                "Eclectic": {
-                    "furniture": ["mismatched chairs", "bold-patterned sofa"],
-                    "colors": ["vibrant colors", "contrasting patterns"]
-                },
-                "Mediterranean": {
-                    "furniture": ["terracotta planter", "woven basket chair"],
-                    "colors": ["white", "blue", "sunset orange"]
-                },
-                "Farmhouse": {
-                    "furniture": ["wooden dining table", "simple armchair"],
-                    "colors": ["white", "gray", "light wood"]
-                }
-            }
-
-            if style in style_recommendations:
-                rec = style_recommendations[style]
-                explanation += f"{rec['furniture'][0]} with {rec['çolors'][0]} palette."
-
-            
-            style_explanations[style] =explanation 
-
-        
-        return style_explanations
+        return {style : self.knowledge.explanation(style) for style in recommended_styles} 
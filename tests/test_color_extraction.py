@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from utils.color_extraction import DominantColorExtractor
+
+
+@pytest.fixture
+def images():
+    rng = np.random.default_rng(0)
+    return (rng.random((6, 48, 64, 3)) * 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize('strategy', ['subsample', 'histogram'])
+def test_batch_matches_single_images(images, strategy):
+    # a small chunk budget forces several chunks per stack
+    extractor = DominantColorExtractor(strategy = strategy, chunk_pixels = 2 * 48 * 64)
+    batch = extractor.extract_batch_array(images)
+    single = np.stack([extractor.extract_batch_array(image[np.newaxis])[0] for image in images])
+    np.testing.assert_allclose(batch, single, rtol = 1e-5)
+
+
+def test_minibatch_does_not_depend_on_earlier_calls(images):
+    extractor = DominantColorExtractor(strategy = 'minibatch')
+    first = extractor.extract_batch_array(images)
+    extractor.extract_batch_array(images[::-1])
+    np.testing.assert_array_equal(extractor.extract_batch_array(images), first)
@@ -0,0 +1,31 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from utils.data_preprocessor import DataPreprocessor
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    for category in ('Bathroom', 'Kitchen'):
+        os.makedirs(tmp_path / 'train' / category)
+        for i in range(5):
+            image = (rng.random((40, 60, 3)) * 255).astype(np.uint8)
+            cv2.imwrite(str(tmp_path / 'train' / category / f"{i}.jpg"), image)
+    (tmp_path / 'train' / 'Kitchen' / 'broken.jpg').write_bytes(b'not an image')
+    return str(tmp_path)
+
+
+def test_pool_matches_serial(dataset):
+    serial_preprocessor = DataPreprocessor(dataset)
+    serial = serial_preprocessor.prepare_dataset(workers = 0)
+    pool_preprocessor = DataPreprocessor(dataset)
+    pooled = pool_preprocessor.prepare_dataset(workers = 2, chunksize = 2)
+
+    assert len(serial) == 10
+    assert [record['image_filename'] for record in pooled] == [record['image_filename'] for record in serial]
+    for a, b in zip(serial, pooled):
+        assert a['color_distribution'] == b['color_distribution']
+        np.testing.assert_allclose(a['dominant_colors'], b['dominant_colors'])
+    assert [path for path, _ in pool_preprocessor.processing_errors] == [os.path.join(dataset, 'train', 'Kitchen', 'broken.jpg')]
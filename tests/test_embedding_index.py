@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from utils.embedding_index import EmbeddingIndex
+
+
+def clustered_vectors(count, dim = 32, clusters = 40, seed = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.3 * rng.standard_normal((count, dim))
+    return vectors.astype(np.float32)
+
+
+def brute_force(vectors, ids, queries, top_k):
+    vectors = vectors / np.linalg.norm(vectors, axis = 1, keepdims = True)
+    queries = queries / np.linalg.norm(queries, axis = 1, keepdims = True)
+    return ids[np.argsort(-(queries @ vectors.T), axis = 1)[:, :top_k]]
+
+
+def recall(found, expected):
+    return np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)])
+
+
+def test_recall_against_brute_force():
+    # queries come from the same clusters as the catalog, as room photos do
+    vectors = clustered_vectors(3050)
+    vectors, queries = vectors[:3000], vectors[3000:]
+    index = EmbeddingIndex(32, n_lists = 16, n_probe = 4)
+    ids = index.add(vectors)
+    index.train()
+
+    expected = brute_force(vectors, ids, queries, 10)
+    _, found = index.search(queries, top_k = 10, threshold = -1.0)
+    assert recall(found, expected) >= 0.9
+
+    # probing every list is an exact search
+    _, found = index.search(queries, top_k = 10, n_probe = 16, threshold = -1.0)
+    assert recall(found, expected) == 1.0
+
+
+def test_untrained_index_is_exact():
+    vectors, queries = clustered_vectors(200), clustered_vectors(10, seed = 1)
+    index = EmbeddingIndex(32, n_lists = 8)
+    ids = index.add(vectors, ids = np.arange(1000, 1200))
+
+    _, found = index.search(queries, top_k = 5, threshold = -1.0)
+    np.testing.assert_array_equal(found, brute_force(vectors, ids, queries, 5))
+
+
+def test_threshold_empties_weak_matches():
+    index = EmbeddingIndex(2)
+    index.add(np.array([[1.0, 0.0], [0.0, 1.0]]))
+    scores, found = index.search(np.array([1.0, 0.1]), top_k = 2, threshold = 0.5)
+    assert found.tolist() == [[0, -1]]
+    assert scores[0, 1] == -np.inf
+
+
+def test_save_load_add_and_retrain(tmp_path):
+    vectors, queries = clustered_vectors(1000), clustered_vectors(20, seed = 1)
+    index = EmbeddingIndex(32, n_lists = 8, n_probe = 8)
+    ids = index.add(vectors)
+    index.train()
+    before = index.search(queries, top_k = 5, threshold = -1.0)
+
+    index.save(str(tmp_path))
+    loaded = EmbeddingIndex.load(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+    assert len(loaded) == 1000
+    after = loaded.search(queries, top_k = 5, threshold = -1.0)
+    np.testing.assert_array_equal(after[1], before[1])
+    np.testing.assert_allclose(after[0], before[0], rtol = 1e-5)
+
+    # rows added to a memory-mapped index are searchable before the next save, and get fresh ids
+    extra = clustered_vectors(100, seed = 2)
+    extra_ids = loaded.add(extra)
+    assert extra_ids.min() == ids.max() + 1
+    all_vectors, all_ids = np.concatenate([vectors, extra]), np.concatenate([ids, extra_ids])
+    _, found = loaded.search(extra[:5], top_k = 1, threshold = -1.0)
+    assert found[:, 0].tolist() == extra_ids[:5].tolist()
+
+    # saving over the directory the vectors are mapped from keeps every row
+    loaded.save(str(tmp_path))
+    reloaded = EmbeddingIndex.load(str(tmp_path))
+    assert len(reloaded) == 1100
+    assert sorted(reloaded.ids.tolist()) == sorted(all_ids.tolist())
+    _, found = reloaded.search(queries, top_k = 5, threshold = -1.0)
+    np.testing.assert_array_equal(found, brute_force(all_vectors, all_ids, queries, 5))
+
+    # retraining a loaded index re-places the centroids over stored and pending rows
+    reloaded.add(clustered_vectors(50, seed = 3), ids = np.arange(5000, 5050))
+    reloaded.train()
+    assert len(reloaded.assignments) + sum(len(a) for a in reloaded._pending_assignments) == 1150
+    _, found = reloaded.search(queries, top_k = 5, n_probe = reloaded.n_lists, threshold = -1.0)
+    everything = np.concatenate([all_vectors, clustered_vectors(50, seed = 3)])
+    everything_ids = np.concatenate([all_ids, np.arange(5000, 5050)])
+    np.testing.assert_array_equal(found, brute_force(everything, everything_ids, queries, 5))
+
+
+def test_add_rejects_wrong_dimension():
+    with pytest.raises(ValueError):
+        EmbeddingIndex(32).add(np.zeros((2, 16)))
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from utils.micro_batching import InferenceService, MicroBatcher
+
+
+class StubClassifier:
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, image_paths, batch_size = 32):
+        self.batches.append(list(image_paths))
+        if 'bad.jpg' in image_paths:
+            raise ValueError("Cannot Decode bad.jpg")
+        return np.stack([np.full(3, len(path), dtype = np.float32) for path in image_paths])
+
+
+class StubPreprocessor:
+    def extract_features(self, image_path):
+        if image_path == 'bad.jpg':
+            raise ValueError("Cannot Decode bad.jpg")
+        return {'dimensions' : (224, 224, 3)}
+
+
+class StubStyleModel:
+    def encode_images(self, image_paths):
+        if 'bad.jpg' in image_paths:
+            raise ValueError("Cannot Decode bad.jpg")
+        return np.stack([np.eye(4, dtype = np.float32)[len(path) % 4] for path in image_paths])
+
+    def recommend_styles_from_embeddings(self, embeddings, top_k = 3):
+        return [['Japandi', 'Coastal'][:top_k] for _ in embeddings]
+
+
+class StubAI:
+    def __init__(self):
+        self.classification_model = StubClassifier()
+        self.data_preprocessor = StubPreprocessor()
+        self.style_recommendation_model = StubStyleModel()
+
+    def _search_catalog(self, query, top_k = None):
+        return [{'id' : int(query.argmax()), 'similarity' : 1.0}]
+
+
+def test_concurrent_requests_share_a_batch():
+    ai = StubAI()
+
+    async def run():
+        service = InferenceService(ai, max_batch_size = 8, max_wait_ms = 50)
+        results = await asyncio.gather(*(service.classify(f"room_{i}.jpg") for i in range(5)))
+        await service.close()
+        return results, service.stats()['classification']
+
+    results, stats = asyncio.run(run())
+    assert ai.classification_model.batches == [[f"room_{i}.jpg" for i in range(5)]]
+    assert [float(result[0]) for result in results] == [10.0] * 5
+    assert stats['batch_size_histogram'] == {5 : 1}
+
+
+def test_bad_input_only_fails_its_caller():
+    async def run():
+        service = InferenceService(StubAI(), max_batch_size = 8, max_wait_ms = 50)
+        results = await asyncio.gather(
+            *(service.recommend_designs(path) for path in ['a.jpg', 'bad.jpg', 'ccc.jpg']),
+            return_exceptions = True
+        )
+        await service.close()
+        return results
+
+    good, bad, other = asyncio.run(run())
+    assert isinstance(bad, ValueError)
+    assert set(good) == {'image_features', 'style_classification', 'recommended_styles', 'similar_rooms'}
+    assert float(good['style_classification'][0]) == 5.0
+    assert other['similar_rooms'] == [{'id' : 3, 'similarity' : 1.0}]
+
+
+def test_stop_fails_in_flight_and_queued_requests():
+    release = threading.Event()
+
+    def slow_batch(items):
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = MicroBatcher(slow_batch, max_batch_size = 2, max_wait_ms = 1)
+        futures = [asyncio.ensure_future(batcher.submit(i)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        release.set()
+        await asyncio.wait(futures, timeout = 1)
+        return futures, batcher
+
+    futures, batcher = asyncio.run(run())
+    assert all(future.done() for future in futures)
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    assert batcher.queue_depth == 0
+
+
+def test_threadsafe_calls_from_plain_threads():
+    service = InferenceService(StubAI(), max_batch_size = 8, max_wait_ms = 20)
+    results = [None] * 4
+    threads = [
+        threading.Thread(target = lambda i = i: results.__setitem__(i, service.recommend_designs_threadsafe(f"r{i}.jpg")))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    service.close_threadsafe()
+
+    assert all(result['recommended_styles'] == ['Japandi', 'Coastal'] for result in results)
+    assert sum(size * count for size, count in service.stats()['classification']['batch_size_histogram'].items()) == 4
+
+
+def test_interior_design_ai_serves_through_the_batchers(monkeypatch):
+    from config.model_config import ModelConfiguration
+    from main import InteriorDesignAI
+
+    monkeypatch.setitem(ModelConfiguration.PIPELINE_CONFIG, 'micro_batching', True)
+    stub = StubAI()
+    ai = InteriorDesignAI()
+    ai.data_preprocessor = stub.data_preprocessor
+    ai._models['classification_model'] = stub.classification_model
+    ai._models['style_recommendation_model'] = stub.style_recommendation_model
+
+    result = ai.recommend_designs('room.jpg', use_cache = False)
+    ai.close()
+    assert stub.classification_model.batches == [['room.jpg']]
+    assert result['recommended_styles'] == ['Japandi', 'Coastal']
+    assert result['similar_rooms'] == []
@@ -0,0 +1,40 @@
+import numpy as np
+from models.design_generation_model import DesignGenerationModel
+from utils import placement
+from utils.detections import Detections
+
+
+def test_layout_without_boxes():
+    model = DesignGenerationModel()
+
+    empty = model.generate_design_layout("Japandi", {"objects" : [], "count" : {}})
+    assert empty['zones'] == []
+    assert empty['furniture_placement'] == {}
+
+    counts_only = model.generate_design_layout("Japandi", {"count" : {"sofa" : 2}})
+    assert counts_only['zones'] == []
+    assert counts_only['furniture_placement']['sofa']['count'] == 2
+
+
+def test_cluster_zones_without_classes():
+    detections = Detections.from_dict({"objects" : [], "count" : {}})
+    zones = placement.cluster_zones(detections, n_zones = 3)
+    assert zones['zone_dominant_class'].shape == (1, 3)
+    assert (zones['zone_dominant_class'] == -1).all()
+    assert not zones['zone_valid'].any()
+
+
+def test_cluster_zones_with_one_crowded_image():
+    rng = np.random.default_rng(0)
+    rooms = []
+    for n in [0, 2, 5, 300]:
+        xy = rng.random((n, 2)) * 500
+        data = np.concatenate([
+            xy, xy + 20, rng.random((n, 1)), rng.integers(0, 2, (n, 1))
+        ], axis = 1).astype(np.float32)
+        rooms.append(Detections.from_array(data, ('sofa', 'chair'), image_size = (640, 480)))
+
+    zones = placement.cluster_zones(Detections.concatenate(rooms), n_zones = 3)
+    assert zones['zone_counts'].sum(axis = 1).tolist() == [0, 2, 5, 300]
+    assert zones['zone_valid'].sum(axis = 1).tolist() == [0, 2, 3, 3]
+    assert len(zones['box_zone']) == 307
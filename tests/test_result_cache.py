@@ -0,0 +1,100 @@
+import threading
+import time
+import pytest
+from config.model_config import ModelConfiguration
+from main import InteriorDesignAI
+from utils.model_utils import ModelUtilities
+from utils.result_cache import ResultCache
+
+
+@pytest.fixture
+def app_factory(tmp_path, monkeypatch):
+    weights = tmp_path / 'classifier.h5'
+    weights.write_bytes(b'weights v1')
+    image = tmp_path / 'room.jpg'
+    image.write_bytes(b'not really a jpeg')
+
+    monkeypatch.setitem(ModelConfiguration.CLASSIFICATION_MODEL_CONFIG, 'weights_path', str(weights))
+    monkeypatch.setitem(ModelConfiguration.RESULT_CACHE_CONFIG, 'disk_dir', str(tmp_path / 'results'))
+    calls = []
+
+    def build():
+        # a fresh process: nothing recorded yet, and no model is ever built on a cache hit
+        monkeypatch.setattr(ModelUtilities, '_loaded_weights', {})
+        ai = InteriorDesignAI()
+        ai._recommend_designs = lambda image_path: calls.append(image_path) or {'styles' : ['Japandi']}
+        return ai
+
+    return build, weights, str(image), calls
+
+
+def test_repeated_request_is_a_hit(app_factory):
+    build, _, image, calls = app_factory
+    ai = build()
+    first = ai.recommend_designs(image)
+    first['styles'].append('mutated')
+
+    assert ai.recommend_designs(image) == {'styles' : ['Japandi']}
+    assert len(calls) == 1
+
+
+def test_disk_hit_after_restart(app_factory):
+    build, _, image, calls = app_factory
+    build().recommend_designs(image)
+    build().recommend_designs(image)
+    assert len(calls) == 1
+
+
+def test_miss_after_weights_change(app_factory):
+    build, weights, image, calls = app_factory
+    build().recommend_designs(image)
+
+    weights.write_bytes(b'retrained weights v2')
+    build().recommend_designs(image)
+    assert len(calls) == 2
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    cache = ResultCache(ttl_seconds = 10.0, disk_dir = str(tmp_path))
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute('key', compute) == 1
+    now[0] += 5.0
+    assert cache.get_or_compute('key', compute) == 1
+    now[0] += 10.0
+    assert cache.get_or_compute('key', compute) == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_single_flight(tmp_path):
+    cache = ResultCache(disk_dir = str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'value' : 1}
+
+    results = []
+    threads = [threading.Thread(target = lambda: results.append(cache.get_or_compute('key', compute))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()['coalesced'] < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'value' : 1}] * 8
+    assert len({id(result) for result in results}) == 8
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from utils import spatial_analysis
+from utils.detections import Detections
+
+CLASS_NAMES = ('sofa', 'chair', 'table', 'lamp')
+
+
+def reference_analyze(detections, grid_size = 8):
+    # the per-box loops the vectorized analysis replaced, one image and one box at a time
+    results = []
+    for image, (width, height) in enumerate(detections.image_sizes.tolist()):
+        if width <= 0 or height <= 0:
+            width, height = spatial_analysis.DEFAULT_IMAGE_SIZE
+        boxes = []
+        for box, cls, owner in zip(detections.boxes.tolist(), detections.class_ids.tolist(), detections.image_ids.tolist()):
+            if owner == image:
+                x1, y1, x2, y2 = [min(max(v / s, 0.0), 1.0) for v, s in zip(box, (width, height, width, height))]
+                boxes.append((x1, y1, x2, y2, cls))
+
+        grid = np.zeros((grid_size, grid_size))
+        cell = 1.0 / grid_size
+        coverage = np.zeros(len(detections.class_names))
+        centroids = []
+        for x1, y1, x2, y2, cls in boxes:
+            for row in range(grid_size):
+                for col in range(grid_size):
+                    dx = max(0.0, min(x2, (col + 1) * cell) - max(x1, col * cell))
+                    dy = max(0.0, min(y2, (row + 1) * cell) - max(y1, row * cell))
+                    grid[row, col] += dx * dy / (cell * cell)
+            coverage[cls] += (x2 - x1) * (y2 - y1)
+            centroids.append(((x1 + x2) / 2.0, (y1 + y2) / 2.0))
+        grid = np.minimum(grid, 1.0)
+
+        iou = np.zeros((len(boxes), len(boxes)))
+        for i, a in enumerate(boxes):
+            for j, b in enumerate(boxes):
+                if i == j:
+                    continue
+                inter = max(0.0, min(a[2], b[2]) - max(a[0], b[0])) * max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+                union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+                iou[i, j] = inter / union if union > 0 else 0.0
+
+        results.append({
+            'object_count' : len(boxes),
+            'object_density' : len(boxes) / (width * height),
+            'unique_object_types' : len({box[4] for box in boxes}),
+            'occupancy_grid' : grid,
+            'occupied_fraction' : grid.mean(),
+            'class_area_coverage' : np.minimum(coverage, 1.0),
+            'mean_centroid' : np.mean(centroids, axis = 0) if centroids else np.zeros(2),
+            'centroid_spread' : np.std(centroids, axis = 0) if centroids else np.zeros(2),
+            'iou_matrix' : iou,
+            'max_iou' : iou.max() if len(boxes) else 0.0,
+            'overlapping_pairs' : int((np.triu(iou, 1) > 0).sum())
+        })
+    return results
+
+
+def fixed_detections():
+    rng = np.random.default_rng(7)
+    crowded = rng.random((9, 2)) * 500
+    crowded = np.concatenate([crowded, crowded + rng.random((9, 2)) * 150 + 5], axis = 1)
+    boxes = np.concatenate([
+        # a room with overlapping furniture, one box running past the frame
+        [[10, 20, 200, 180], [150, 100, 300, 260], [600, 400, 700, 520]],
+        # a room without a recorded size, falling back to 640x640
+        [[0, 0, 320, 320]],
+        # two identical boxes
+        [[50, 50, 150, 150], [50, 50, 150, 150]],
+        # a busy room, in a wider padding bucket than the others
+        crowded
+    ]).astype(np.float32)
+    class_ids = [0, 1, 2, 3, 1, 1] + rng.integers(0, len(CLASS_NAMES), 9).tolist()
+    # image 1 has no boxes at all
+    image_ids = [0, 0, 0, 2, 3, 3] + [4] * 9
+    image_sizes = [[640, 480], [640, 480], [0, 0], [320, 240], [800, 600]]
+    return Detections(boxes, np.ones(len(boxes)), class_ids, CLASS_NAMES, image_ids = image_ids, image_sizes = image_sizes)
+
+
+def assert_matches_reference(detections):
+    analysis = spatial_analysis.analyze(detections)
+    reference = reference_analyze(detections)
+    assert len(reference) == detections.num_images
+
+    for image, expected in enumerate(reference):
+        for name, value in expected.items():
+            np.testing.assert_allclose(analysis[name][image], value, rtol = 1e-4, atol = 1e-6, err_msg = f"{name}[{image}]")
+
+
+def test_matches_per_box_reference():
+    detections = fixed_detections()
+    assert_matches_reference(detections)
+
+    analysis = spatial_analysis.analyze(detections)
+    assert analysis['iou_matrix'][1].shape == (0, 0)
+    assert analysis['max_iou'][3] == pytest.approx(1.0)
+
+
+def test_empty_detections():
+    detections = Detections.empty(CLASS_NAMES)
+    assert_matches_reference(detections)
+    assert spatial_analysis.analyze(detections)['object_count'].tolist() == [0]
+
+
+def test_single_box():
+    detections = Detections([[64, 64, 320, 320]], [0.9], [2], CLASS_NAMES, image_sizes = [[640, 640]])
+    assert_matches_reference(detections)
+
+
+def test_legacy_dict_fields_match_the_old_detect_features():
+    from models.feature_extraction_model import InteriorFeatureExtractionModel
+
+    detected_objects = {
+        'objects' : [
+            {'class' : 'sofa', 'confidence' : 0.9, 'bbox' : {'x1' : 10, 'y1' : 20, 'x2' : 200, 'y2' : 180}},
+            {'class' : 'chair', 'confidence' : 0.8, 'bbox' : {'x1' : 150, 'y1' : 100, 'x2' : 300, 'y2' : 260}},
+            {'class' : 'sofa', 'confidence' : 0.7, 'bbox' : {'x1' : 400, 'y1' : 300, 'x2' : 600, 'y2' : 500}}
+        ]
+    }
+    features = InteriorFeatureExtractionModel(model = object()).detect_features(detected_objects)
+
+    # what the per-object loop of the original detect_features reported
+    assert features['object_composition'] == {'sofa' : 2, 'chair' : 1}
+    assert features['spatial_analysis']['object_density'] == pytest.approx(3 / (640 * 640))
+    assert features['spatial_analysis']['unique_object_types'] == 2
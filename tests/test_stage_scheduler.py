@@ -0,0 +1,149 @@
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from utils.stage_scheduler import StageError, StageGraph
+
+
+def recording_stage(name, log, lock, delay = 0.01):
+    def run(**kwargs):
+        with lock:
+            log.append(('start', name))
+        time.sleep(delay)
+        with lock:
+            log.append(('end', name))
+        return name + '(' + ','.join(kwargs[key] for key in sorted(kwargs)) + ')'
+    return run
+
+
+def build_diamond(log, lock):
+    graph = StageGraph()
+    graph.add_input('x')
+    graph.add('a', recording_stage('a', log, lock), ['x'])
+    graph.add('b', recording_stage('b', log, lock), ['a'])
+    graph.add('c', recording_stage('c', log, lock), ['a'])
+    graph.add('d', recording_stage('d', log, lock), ['b', 'c'])
+    graph.add('unused', recording_stage('unused', log, lock), ['x'])
+    return graph
+
+
+def test_stages_start_after_their_dependencies():
+    log, lock = [], threading.Lock()
+    graph = build_diamond(log, lock)
+    with ThreadPoolExecutor(max_workers = 4) as executor:
+        results = graph.run(executor, x = 'x')
+
+    assert results['d'] == 'd(b(a(x)),c(a(x)))'
+    position = {event: i for i, event in enumerate(log)}
+    for name, stage in graph.stages.items():
+        for dep in stage.deps:
+            if dep in graph.stages:
+                assert position[('end', dep)] < position[('start', name)]
+
+
+def test_only_requested_outputs_are_run():
+    log, lock = [], threading.Lock()
+    graph = build_diamond(log, lock)
+    with ThreadPoolExecutor(max_workers = 4) as executor:
+        results = graph.run(executor, outputs = ['b'], x = 'x')
+
+    assert results == {'b' : 'b(a(x))'}
+    assert {name for _, name in log} == {'a', 'b'}
+
+
+def test_undefined_dependency_is_rejected():
+    graph = StageGraph().add_input('x')
+    with pytest.raises(ValueError):
+        graph.add('a', lambda y: y, ['y'])
+
+
+def test_failing_stage_propagates_and_stops_dependents():
+    ran = []
+    graph = StageGraph().add_input('x')
+    graph.add('ok', lambda x: ran.append('ok') or x, ['x'])
+    graph.add('broken', lambda ok: 1 / 0, ['ok'])
+    graph.add('after', lambda broken: ran.append('after'), ['broken'])
+
+    with ThreadPoolExecutor(max_workers = 2) as executor:
+        with pytest.raises(StageError) as raised:
+            graph.run(executor, x = 1)
+
+    assert raised.value.stage == 'broken'
+    assert isinstance(raised.value.error, ZeroDivisionError)
+    assert ran == ['ok']
+
+
+def test_resource_limit_serializes_tagged_stages():
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def forward(x):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return x
+
+    graph = StageGraph(resource_limits = {'tensorflow' : 1}).add_input('x')
+    for i in range(4):
+        graph.add(f"forward_{i}", forward, ['x'], resource = 'tensorflow')
+    with ThreadPoolExecutor(max_workers = 4) as executor:
+        graph.run(executor, x = 0)
+
+    assert peak[0] == 1
+
+
+class StubClassifier:
+    def predict_batch(self, inputs):
+        # paths are decoded the way InteriorClassification._load_input does: BGR -> RGB at 224x224
+        images = [cv2.resize(cv2.imread(item), (224, 224))[..., ::-1] if isinstance(item, str) else item for item in inputs]
+        return np.stack([image.reshape(-1, 3).mean(axis = 0) for image in images])
+
+
+class StubStyleModel:
+    def encode_images(self, images):
+        images = [np.asarray(Image.open(image).convert('RGB')) if isinstance(image, str) else image for image in images]
+        return np.stack([image.reshape(-1, 3).mean(axis = 0) for image in images])
+
+    def recommend_styles_from_embeddings(self, embeddings, top_k = 3):
+        return [[['Red', 'Green', 'Blue'][i] for i in np.argsort(-row)[:top_k]] for row in embeddings]
+
+
+def test_pipeline_matches_the_sequential_path(tmp_path):
+    from main import InteriorDesignAI
+
+    rng = np.random.default_rng(0)
+    image_path = str(tmp_path / 'room.png')
+    cv2.imwrite(image_path, rng.integers(0, 256, (240, 320, 3), dtype = np.uint8))
+
+    ai = InteriorDesignAI()
+    ai._models['classification_model'] = StubClassifier()
+    ai._models['style_recommendation_model'] = StubStyleModel()
+    top_k = ai.style_recommendation_config['top_k_recommendations']
+    outputs = ('image_features', 'style_classification', 'recommended_styles', 'similar_rooms')
+    try:
+        pipelined = ai.pipeline.run(ai._pipeline_executor, outputs = outputs, image_path = image_path)
+    finally:
+        ai.close()
+
+    embedding = ai.style_recommendation_model.encode_images([image_path])
+    sequential = {
+        'image_features' : ai.data_preprocessor.extract_features(image_path),
+        'style_classification' : ai.classification_model.predict_batch([image_path])[0],
+        'recommended_styles' : ai.style_recommendation_model.recommend_styles_from_embeddings(embedding, top_k = top_k)[0],
+        'similar_rooms' : ai._search_catalog(embedding, top_k = top_k)
+    }
+
+    assert set(pipelined) == set(sequential)
+    assert pipelined['image_features']['dimensions'] == sequential['image_features']['dimensions']
+    assert pipelined['image_features']['color_distribution'] == pytest.approx(sequential['image_features']['color_distribution'])
+    np.testing.assert_allclose(
+        pipelined['image_features']['dominant_colors'], sequential['image_features']['dominant_colors'], atol = 1e-5
+    )
+    np.testing.assert_allclose(pipelined['style_classification'], sequential['style_classification'])
+    assert pipelined['recommended_styles'] == sequential['recommended_styles']
+    assert pipelined['similar_rooms'] == sequential['similar_rooms']
@@ -0,0 +1,231 @@
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class DominantColorExtractor:
+    STRATEGIES = ('kmeans', 'subsample', 'histogram', 'minibatch')
+
+    def __init__(self, num_colors: int = 5, strategy: str = 'subsample',
+                 sample_size: int = 2048, histogram_bins: int = 8,
+                 n_iter: int = 10, batch_size: int = 512, random_state: int = 42, chunk_pixels: int = 1 << 16):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown Dominant Color Strategy : {strategy}")
+
+        self.num_colors = num_colors
+        self.strategy = strategy
+        self.sample_size = sample_size
+        self.histogram_bins = histogram_bins
+        self.n_iter = n_iter
+        self.batch_size = batch_size
+        self.random_state = random_state
+        # a stack is processed a few images at a time, so the per-pixel temporaries stay cache sized
+        self.chunk_pixels = chunk_pixels
+
+    def extract(self, image: np.ndarray) -> List[tuple]:
+        return self.extract_batch(image[np.newaxis])[0]
+
+    def extract_batch(self, images: np.ndarray) -> List[List[tuple]]:
+        palettes = self.extract_batch_array(images)
+        return [[tuple(color) for color in palette] for palette in palettes]
+
+    def extract_batch_array(self, images: np.ndarray) -> np.ndarray:
+        images = np.asarray(images)
+        if images.ndim != 4 or images.shape[-1] != 3:
+            raise ValueError(f"Expected A Stack Of Shape (N, H, W, 3), Got {images.shape}")
+
+        # pixels keep the input dtype; strategies convert only what they sample, chunk by chunk
+        pixels = images.reshape(images.shape[0], -1, 3)
+        palettes = np.empty((images.shape[0], self.num_colors, 3), dtype = np.float32)
+        per_chunk = max(1, self.chunk_pixels // max(1, pixels.shape[1]))
+
+        # the minibatch warm start only carries over between the images of this call, so a shared
+        # extractor gives the same palettes whatever other threads run through it
+        previous_centers = None
+        for start in range(0, len(pixels), per_chunk):
+            chunk = pixels[start:start + per_chunk]
+            if self.strategy == 'kmeans':
+                palettes[start:start + len(chunk)] = self._kmeans(chunk)
+            elif self.strategy == 'histogram':
+                palettes[start:start + len(chunk)] = self._histogram(chunk, images.dtype)
+            elif self.strategy == 'minibatch':
+                palettes[start:start + len(chunk)] = self._minibatch(chunk, previous_centers)
+                previous_centers = palettes[start + len(chunk) - 1]
+            else:
+                palettes[start:start + len(chunk)] = self._subsample(chunk)
+        return palettes
+
+    def _kmeans(self, pixels: np.ndarray) -> np.ndarray:
+        # sklearn is only needed by the reference strategy, so it is not imported at module load
+        from sklearn.cluster import KMeans
+
+        palettes = np.empty((pixels.shape[0], self.num_colors, 3), dtype = np.float32)
+        for i, image_pixels in enumerate(pixels):
+            kmeans = KMeans(n_clusters = self.num_colors, random_state = self.random_state)
+            labels = kmeans.fit_predict(image_pixels.astype(np.float32))
+            counts = np.bincount(labels, minlength = self.num_colors)
+            palettes[i] = kmeans.cluster_centers_[np.argsort(-counts, kind = 'stable')]
+        return palettes
+
+    def _sample(self, pixels: np.ndarray, size: int, offset: int = 0) -> np.ndarray:
+        num_pixels = pixels.shape[1]
+        if num_pixels <= size:
+            return pixels
+        # a fixed stride with a random phase covers the whole frame without per-pixel RNG calls
+        stride = num_pixels // size
+        rng = np.random.default_rng(self.random_state + offset)
+        start = int(rng.integers(0, stride))
+        return pixels[:, start:start + stride * size:stride]
+
+    def _float_sample(self, pixels: np.ndarray, size: int, offset: int = 0) -> np.ndarray:
+        return self._sample(pixels, size, offset).astype(np.float32)
+
+    def _initial_centers(self, samples: np.ndarray) -> np.ndarray:
+        # deterministic farthest-point seeding, run for the whole stack at once
+        num_images = samples.shape[0]
+        rows = np.arange(num_images)
+        luminance = samples.sum(axis = 2)
+        first = np.argsort(luminance, axis = 1)[:, samples.shape[1] // 2]
+
+        centers = np.empty((num_images, self.num_colors, 3), dtype = np.float32)
+        centers[:, 0] = samples[rows, first]
+        min_distances = ((samples - centers[:, :1]) ** 2).sum(axis = 2)
+        for k in range(1, self.num_colors):
+            farthest = min_distances.argmax(axis = 1)
+            centers[:, k] = samples[rows, farthest]
+            min_distances = np.minimum(min_distances, ((samples - centers[:, k:k + 1]) ** 2).sum(axis = 2))
+        return centers
+
+    def _assign(self, samples: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        # squared distances for the whole stack at once: (N, S, K)
+        distances = (
+            np.einsum('nsc,nsc->ns', samples, samples)[:, :, np.newaxis]
+            - 2.0 * np.einsum('nsc,nkc->nsk', samples, centers)
+            + np.einsum('nkc,nkc->nk', centers, centers)[:, np.newaxis, :]
+        )
+        return distances.argmin(axis = 2)
+
+    def _cluster_sums(self, samples: np.ndarray, labels: np.ndarray):
+        num_images = samples.shape[0]
+        flat_labels = (labels + np.arange(num_images)[:, np.newaxis] * self.num_colors).ravel()
+        size = num_images * self.num_colors
+        counts = np.bincount(flat_labels, minlength = size).reshape(num_images, self.num_colors)
+        sums = np.stack([
+            np.bincount(flat_labels, weights = samples[:, :, c].ravel(), minlength = size)
+            for c in range(3)
+        ], axis = 1).reshape(num_images, self.num_colors, 3)
+        return sums, counts
+
+    def _lloyd(self, samples: np.ndarray, centers: np.ndarray, n_iter: int):
+        counts = np.zeros(centers.shape[:2], dtype = np.int64)
+        for _ in range(n_iter):
+            labels = self._assign(samples, centers)
+            sums, counts = self._cluster_sums(samples, labels)
+            occupied = counts > 0
+            # empty clusters keep their previous center instead of collapsing to zero
+            centers = np.where(
+                occupied[..., np.newaxis],
+                sums / np.maximum(counts, 1)[..., np.newaxis],
+                centers
+            ).astype(np.float32)
+        return centers, counts
+
+    def _order_by_weight(self, centers: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        order = np.argsort(-counts, axis = 1, kind = 'stable')
+        return np.take_along_axis(centers, order[..., np.newaxis], axis = 1)
+
+    def _subsample(self, pixels: np.ndarray) -> np.ndarray:
+        samples = self._float_sample(pixels, self.sample_size)
+        centers, counts = self._lloyd(samples, self._initial_centers(samples), self.n_iter)
+        return self._order_by_weight(centers, counts)
+
+    def _histogram(self, pixels: np.ndarray, dtype: np.dtype) -> np.ndarray:
+        num_images, num_pixels, _ = pixels.shape
+        bins = self.histogram_bins
+        scale = 255.0 if np.issubdtype(dtype, np.integer) else 1.0
+
+        if pixels.dtype == np.uint8:
+            # a 256-entry table gives the same bins as the float formula without per-pixel float math
+            table = np.clip((np.arange(256) * (bins / (scale + 1e-6))).astype(np.intp), 0, bins - 1)
+            quantized = table[pixels]
+        else:
+            quantized = np.clip((pixels.astype(np.float32) * (bins / (scale + 1e-6))).astype(np.intp), 0, bins - 1)
+        bin_index = (quantized[:, :, 0] * bins + quantized[:, :, 1]) * bins + quantized[:, :, 2]
+        flat_index = (bin_index + np.arange(num_images)[:, np.newaxis] * bins ** 3).ravel()
+
+        size = num_images * bins ** 3
+        counts = np.bincount(flat_index, minlength = size).reshape(num_images, bins ** 3)
+        sums = np.stack([
+            np.bincount(flat_index, weights = pixels[:, :, c].ravel(), minlength = size)
+            for c in range(3)
+        ], axis = 1).reshape(num_images, bins ** 3, 3)
+
+        top_bins = np.argsort(-counts, axis = 1, kind = 'stable')[:, :self.num_colors]
+        top_counts = np.take_along_axis(counts, top_bins, axis = 1)
+        top_sums = np.take_along_axis(sums, top_bins[..., np.newaxis], axis = 1)
+        return (top_sums / np.maximum(top_counts, 1)[..., np.newaxis]).astype(np.float32)
+
+    def _minibatch(self, pixels: np.ndarray, previous_centers: Optional[np.ndarray] = None) -> np.ndarray:
+        # warm-started from the last palette of the previous chunk, or seeded from the first image
+        num_images = pixels.shape[0]
+        if previous_centers is None:
+            previous_centers = self._initial_centers(self._float_sample(pixels[:1], self.sample_size))[0]
+
+        centers = np.broadcast_to(previous_centers, (num_images, self.num_colors, 3)).astype(np.float32)
+        totals = np.zeros((num_images, self.num_colors), dtype = np.float64)
+
+        for step in range(self.n_iter):
+            batch = self._float_sample(pixels, self.batch_size, offset = step)
+            labels = self._assign(batch, centers)
+            sums, counts = self._cluster_sums(batch, labels)
+            totals += counts
+            # per-center learning rate 1/total_count, as in mini-batch k-means
+            rate = np.where(totals > 0, counts / np.maximum(totals, 1), 0.0)[..., np.newaxis]
+            batch_means = sums / np.maximum(counts, 1)[..., np.newaxis]
+            centers = (centers + rate * (batch_means - centers)).astype(np.float32)
+
+        return self._order_by_weight(centers, totals)
+
+
+def palette_error(reference: np.ndarray, candidate: np.ndarray) -> float:
+    # symmetric chamfer distance between two palettes, independent of color order
+    reference = np.asarray(reference, dtype = np.float32)
+    candidate = np.asarray(candidate, dtype = np.float32)
+    distances = np.linalg.norm(reference[:, np.newaxis] - candidate[np.newaxis], axis = 2)
+    return float((distances.min(axis = 1).mean() + distances.min(axis = 0).mean()) / 2.0)
+
+
+def compare_strategies(images: np.ndarray, strategies: Sequence[str] = DominantColorExtractor.STRATEGIES,
+                       num_colors: int = 5) -> Dict[str, Dict[str, Any]]:
+    images = np.asarray(images)
+
+    start = time.perf_counter()
+    reference = DominantColorExtractor(num_colors = num_colors, strategy = 'kmeans').extract_batch_array(images)
+    reference_seconds = (time.perf_counter() - start) / len(images)
+
+    report = {}
+    for strategy in strategies:
+        extractor = DominantColorExtractor(num_colors = num_colors, strategy = strategy)
+        if strategy == 'kmeans':
+            palettes, seconds = reference, reference_seconds
+        else:
+            start = time.perf_counter()
+            palettes = extractor.extract_batch_array(images)
+            seconds = (time.perf_counter() - start) / len(images)
+
+        # the batch path is only worth having if it beats calling extract image by image
+        start = time.perf_counter()
+        for image in images[:len(images) if strategy != 'kmeans' else 1]:
+            extractor.extract(image)
+        single_seconds = (time.perf_counter() - start) / (len(images) if strategy != 'kmeans' else 1)
+
+        errors = [palette_error(ref, pal) for ref, pal in zip(reference, palettes)]
+        report[strategy] = {
+            'seconds_per_image' : seconds,
+            'single_seconds_per_image' : single_seconds,
+            'speedup' : reference_seconds / seconds if seconds > 0 else float('inf'),
+            'mean_palette_error' : float(np.mean(errors)),
+            'max_palette_error' : float(np.max(errors))
+        }
+
+    return report
@@ -1,33 +1,75 @@
 import os 
-import cv2 
 import numpy as np 
 import pandas as pd 
-from typing import Dict, List, Any 
-from sklearn.cluster import KMeans 
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+from config.model_config import ModelConfiguration
+from utils.color_extraction import DominantColorExtractor
+from utils.feature_cache import FeatureCache
+from utils.feature_store import FeatureStore, save_feature_store
+from utils.image_io import decode_image
+from utils.metrics import metrics, timed
+from utils.stage_scheduler import apply_profile_threads
 
 
+# the preprocessor of a pool process, built once by _init_worker so tasks only carry an image path
+_worker_preprocessor: Optional['DataPreprocessor'] = None
+
+
+def _init_worker(dataset_path: str, color_strategy: str, reduced_decode: bool):
+    global _worker_preprocessor
+    _worker_preprocessor = DataPreprocessor(dataset_path, color_strategy = color_strategy, reduced_decode = reduced_decode)
+
+
+def _worker_extract_features(image_path: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    return _worker_preprocessor._safe_extract_features(image_path)
+
   
 class DataPreprocessor:
-    def __init__(self, dataset_path: str):
+    def __init__(self, dataset_path: str, color_strategy: str = 'subsample', cache_path: Optional[str] = None,
+                 reduced_decode: Optional[bool] = None):
         self.dataset_path = dataset_path
+        self.profile = ModelConfiguration.get_performance_profile()
+        apply_profile_threads(self.profile, 'opencv')
+        self.reduced_decode = self.profile.reduced_decode if reduced_decode is None else reduced_decode
+        self.color_extractor = DominantColorExtractor(num_colors = 5, strategy = color_strategy)
+        self.processing_errors: List[Tuple[str, str]] = []
 
-    
-    def preprocess_image(self, image_path: str, target_size: tuple = (224, 224)) -> np.ndarray:
-
-        image = cv2.imread(image_path) 
-        if image is None: 
-            raise FileNotFoundError(f"Image Not Found At Path : {image_path}")
-        
-        image = cv2.resize(image, target_size) 
-        image = image.astype("float32")  / 255.0 
+        self.feature_cache = None
+        if cache_path is not None:
+            self.feature_cache = FeatureCache(cache_path, settings_key = f"colors={color_strategy};reduced_decode={self.reduced_decode}")
 
-        return image 
+    
+    @timed('preprocess.decode')
+    def preprocess_image(self, image_path: str, target_size: tuple = (224, 224), dtype: Any = "float32",
+                         out: Optional[np.ndarray] = None) -> np.ndarray:
+        # dtype=uint8 keeps the decoded pixels as-is; float32 scales to [0, 1] as before
+        if out is None:
+            out = np.empty((target_size[1], target_size[0], 3), dtype = dtype)
+
+        return decode_image(image_path, target_size, reduced = self.reduced_decode, out = out)
+
+    @timed('preprocess.decode_batch', items_arg = 'image_paths')
+    def preprocess_batch(self, image_paths: List[str], target_size: tuple = (224, 224), dtype: Any = np.uint8,
+                         out: Optional[np.ndarray] = None) -> np.ndarray:
+        if out is None:
+            out = np.empty((len(image_paths), target_size[1], target_size[0], 3), dtype = dtype)
+        elif out.shape[0] < len(image_paths):
+            raise ValueError(f"Batch Buffer Holds {out.shape[0]} Images, Got {len(image_paths)} Paths")
+
+        for i, image_path in enumerate(image_paths):
+            self.preprocess_image(image_path, target_size, out = out[i])
+
+        return out[:len(image_paths)]
     
 
+    @timed('preprocess.extract_features')
     def extract_features(self, image_path: str) -> Dict[str, Any]:
-        processed_image = self.preprocess_image(image_path) 
-
+        return self.features_from_image(self.preprocess_image(image_path))
 
+    def features_from_image(self, processed_image: np.ndarray) -> Dict[str, Any]:
+        # processed_image is what preprocess_image returns: (H, W, 3) float32 in [0, 1]
         features = {
             "dimensions" : processed_image.shape,
             "color_distribution" : self._get_color_distribution(processed_image),
@@ -36,6 +78,7 @@ class DataPreprocessor:
 
         return features 
     
+    @timed('preprocess.color_distribution')
     def _get_color_distribution(self, image: np.ndarray) -> Dict[str, float]:
         r_channel = image[:, :, 0]
         g_channel = image[:, :, 1]
@@ -48,52 +91,161 @@ class DataPreprocessor:
 
         }    
     
+    @timed('preprocess.dominant_colors')
     def _extract_dominant_colors(self, image : np.ndarray, num_colors : int = 5) -> List[tuple]:
-        pixels = image.reshape(-1, 3)
-        kmeans = KMeans(n_clusters = num_colors, random_state = 42) 
-        kmeans.fit(pixels) 
-
-        dominant_colors = kmeans.cluster_centers_ 
-        return [tuple(color) for color in dominant_colors]
+        if num_colors != self.color_extractor.num_colors:
+            return DominantColorExtractor(
+                num_colors = num_colors,
+                strategy = self.color_extractor.strategy
+            ).extract(image)
+        return self.color_extractor.extract(image)
+
+    @timed('preprocess.dominant_colors_batch', items_arg = 'images')
+    def extract_dominant_colors_batch(self, images : np.ndarray) -> List[List[tuple]]:
+        return self.color_extractor.extract_batch(images)
     
-    def prepare_dataset(self) -> List[Dict[str, Any]]:
-        processed_data = [] 
+    def _iter_image_entries(self) -> Iterator[Tuple[str, str, str, str]]:
         for split in ['train', 'test', 'val']:
-            split_path = os.path.join(self.dataset_dir, split) 
-            for category in os.listdir(split_path):
+            split_path = os.path.join(self.dataset_path, split) 
+            if not os.path.isdir(split_path):
+                continue
+
+            for category in sorted(os.listdir(split_path)):
                 category_path = os.path.join(split_path, category) 
 
                 if not os.path.isdir(category_path):
                     continue 
 
-
-                for image_name in os.listdir(category_path):
-                    image_path = os.path.join(category_path, image_name) 
+                for image_name in sorted(os.listdir(category_path)):
                     if not image_name.lower().endswith(("png", "jpg", "jpeg")):
                         continue 
 
-                    try:
-                        image_features = self.extract_features(image_path) 
-                        processed_data.append({
-                            "split" : split,
-                            "category" : category, 
-                            "image_filename" : image_name,
-                            **image_features
-                        })
-                    
-                    except Exception as e:
-                        print(f"Error Processing {image_path} : {e}")
-        return processed_data 
+                    image_path = os.path.join(category_path, image_name) 
+                    yield split, category, image_name, image_path
+
+    def _safe_extract_features(self, image_path: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        try:
+            return self.extract_features(image_path), None
+        except Exception as e:
+            return None, str(e)
+
+    def _compute_features(self, image_paths: List[str], executor: Optional[ProcessPoolExecutor], chunksize: int):
+        if executor is not None and len(image_paths) > 1:
+            # executor.map yields results in submission order, so output order is deterministic;
+            # a module-level function keeps this preprocessor (and its cache manifest) out of the pickles
+            return list(executor.map(
+                _worker_extract_features,
+                image_paths,
+                chunksize = max(1, chunksize)
+            ))
+        return [self._safe_extract_features(image_path) for image_path in image_paths]
+
+    def _process_window(self, image_paths: List[str], executor: Optional[ProcessPoolExecutor], chunksize: int):
+        if self.feature_cache is None:
+            return self._compute_features(image_paths, executor, chunksize)
+
+        results = [(self.feature_cache.get(image_path), None) for image_path in image_paths]
+        missing = [i for i, (image_features, _) in enumerate(results) if image_features is None]
+
+        computed = self._compute_features([image_paths[i] for i in missing], executor, chunksize)
+        for i, (image_features, error) in zip(missing, computed):
+            results[i] = (image_features, error)
+            if error is None:
+                self.feature_cache.put(image_paths[i], image_features)
+        return results
+
+    def _iter_records(self, workers: Optional[int], chunksize: int) -> Iterator[Dict[str, Any]]:
+        self.processing_errors = []
+        if self.feature_cache is not None:
+            self.feature_cache.reset_stats()
+
+        # workers=None falls back to the profile; 0/1 keeps the serial path, which avoids pool
+        # start-up cost on small runs
+        workers = self.profile.preprocess_workers if workers is None else workers
+        use_pool = workers is not None and workers > 1
+        executor = ProcessPoolExecutor(
+            max_workers = workers,
+            initializer = _init_worker,
+            initargs = (self.dataset_path, self.color_extractor.strategy, self.reduced_decode)
+        ) if use_pool else None
+        # only one window of images is in flight at a time, which keeps memory bounded
+        window_size = workers * max(1, chunksize) * 4 if use_pool else 1
+        seen_paths = []
+
+        try:
+            entries = self._iter_image_entries()
+            while True:
+                window = list(islice(entries, window_size))
+                if not window:
+                    break
+
+                image_paths = [entry[3] for entry in window]
+                seen_paths.extend(image_paths)
+                results = self._process_window(image_paths, executor, chunksize)
+
+                for (split, category, image_name, image_path), (image_features, error) in zip(window, results):
+                    if error is not None:
+                        self.processing_errors.append((image_path, error))
+                        metrics.increment('stage_errors_total', 1, stage = 'dataset')
+                        continue
+
+                    # pool workers record into their own copy of the registry, so dataset
+                    # throughput is counted here in the parent
+                    metrics.increment('images_processed_total', 1, stage = 'dataset')
+
+                    yield {
+                        "split" : split,
+                        "category" : category, 
+                        "image_filename" : image_name,
+                        **image_features
+                    }
+
+            if self.feature_cache is not None:
+                self.feature_cache.prune(seen_paths)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures = True)
+            if self.feature_cache is not None:
+                self.feature_cache.save()
+
+    def iter_dataset(self, workers: Optional[int] = None, chunksize: int = 16,
+                     batch_size: Optional[int] = None) -> Iterator[Any]:
+        records = self._iter_records(workers, chunksize)
+        if batch_size is None:
+            yield from records
+            return
+
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def prepare_dataset(self, workers: Optional[int] = None, chunksize: int = 16) -> List[Dict[str, Any]]:
+        return list(self.iter_dataset(workers = workers, chunksize = chunksize))
     
 
-    def save_processed_data(self, output_path: str):
-        processed_data = self.prepare_dataset() 
-        df = pd.DataFrame(processed_data) 
-        df.to_csv(output_path, index= False) 
+    def save_processed_data(self, output_path: str, workers: Optional[int] = None, batch_size: int = 1024):
+        write_header = True
+        for batch in self.iter_dataset(workers = workers, batch_size = batch_size):
+            df = pd.DataFrame(batch) 
+            df.to_csv(output_path, index= False, mode = 'w' if write_header else 'a', header = write_header) 
+            write_header = False
+
+    def save_feature_store(self, output_dir: str, workers: Optional[int] = None) -> FeatureStore:
+        records = self.iter_dataset(workers = workers)
+        save_feature_store(records, output_dir, num_colors = self.color_extractor.num_colors)
+        return FeatureStore(output_dir)
+
+
 
+def run_processor(dataset_dir: str, output_csv: str, workers: Optional[int] = None, cache_path: Optional[str] = None):
+    preprocessor = DataPreprocessor(dataset_path = dataset_dir, cache_path = cache_path)
+    preprocessor.save_processed_data(output_csv, workers = workers) 
 
+    for image_path, error in preprocessor.processing_errors:
+        print(f"Error Processing {image_path} : {error}")
 
-def run_processor(dataset_dir: str, output_csv: str):
-    preprocessor = DataPreprocessor(dataset_dir = dataset_dir)
-    preprocessor.save_preprocessed_data(output_csv) 
+    if preprocessor.feature_cache is not None:
+        print(f"Feature Cache : {preprocessor.feature_cache.stats()}")
                 
@@ -0,0 +1,176 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class Detections:
+    __slots__ = ('boxes', 'confidences', 'class_ids', 'image_ids', 'image_sizes', 'class_names', '_dict_view')
+
+    def __init__(self, boxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                 class_names: Sequence[str], image_ids: Optional[np.ndarray] = None,
+                 image_sizes: Optional[np.ndarray] = None):
+        self.boxes = np.asarray(boxes, dtype = np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype = np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype = np.int16).reshape(-1)
+        self.class_names = tuple(class_names)
+
+        # boxes of several images share one set of arrays; image_ids says which image owns each box
+        if image_ids is None:
+            image_ids = np.zeros(len(self.boxes), dtype = np.int32)
+        self.image_ids = np.asarray(image_ids, dtype = np.int32).reshape(-1)
+
+        # (num_images, 2) as (width, height); zeros when the source size is unknown
+        if image_sizes is None:
+            num_images = int(self.image_ids.max()) + 1 if len(self.image_ids) else 1
+            image_sizes = np.zeros((num_images, 2), dtype = np.int32)
+        self.image_sizes = np.asarray(image_sizes, dtype = np.int32).reshape(-1, 2)
+        self._dict_view: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_array(cls, data: np.ndarray, class_names: Sequence[str],
+                   image_size: Optional[Sequence[int]] = None) -> 'Detections':
+        # data is YOLO's (N, 6) boxes.data layout: x1, y1, x2, y2, conf, cls
+        data = np.asarray(data, dtype = np.float32).reshape(-1, 6)
+        image_sizes = None if image_size is None else np.asarray([image_size], dtype = np.int32)
+        return cls(data[:, :4], data[:, 4], data[:, 5], class_names, image_sizes = image_sizes)
+
+    @classmethod
+    def from_dict(cls, detected_objects: Dict[str, Any], image_size: Optional[Sequence[int]] = None) -> 'Detections':
+        # accepts the legacy {'objects': [...], 'count': {...}} layout
+        objects = detected_objects.get('objects', [])
+        class_names = sorted({obj['class'] for obj in objects})
+        class_index = {name: i for i, name in enumerate(class_names)}
+        boxes = [[obj['bbox'][key] for key in ('x1', 'y1', 'x2', 'y2')] for obj in objects]
+        image_sizes = None if image_size is None else np.asarray([image_size], dtype = np.int32)
+        return cls(
+            np.asarray(boxes, dtype = np.float32).reshape(-1, 4),
+            [obj['confidence'] for obj in objects],
+            [class_index[obj['class']] for obj in objects],
+            class_names,
+            image_sizes = image_sizes
+        )
+
+    @classmethod
+    def empty(cls, class_names: Sequence[str]) -> 'Detections':
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), class_names)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def num_images(self) -> int:
+        return len(self.image_sizes)
+
+    def class_counts(self) -> np.ndarray:
+        return np.bincount(self.class_ids, minlength = len(self.class_names))
+
+    @property
+    def count(self) -> Dict[str, int]:
+        counts = self.class_counts()
+        return {self.class_names[cls]: int(counts[cls]) for cls in np.flatnonzero(counts)}
+
+    @classmethod
+    def concatenate(cls, detections: Sequence['Detections']) -> 'Detections':
+        if not detections:
+            raise ValueError("Cannot Concatenate An Empty Sequence Of Detections")
+
+        class_names = detections[0].class_names
+        if any(d.class_names != class_names for d in detections):
+            raise ValueError("Cannot Concatenate Detections With Different Class Names")
+
+        # shift each part's image ids past the images that precede it
+        offsets = np.cumsum([0] + [d.num_images for d in detections[:-1]])
+        return cls(
+            np.concatenate([d.boxes for d in detections]),
+            np.concatenate([d.confidences for d in detections]),
+            np.concatenate([d.class_ids for d in detections]),
+            class_names,
+            image_ids = np.concatenate([d.image_ids + offset for d, offset in zip(detections, offsets)]),
+            image_sizes = np.concatenate([d.image_sizes for d in detections])
+        )
+
+    def with_class_names(self, class_names: Sequence[str]) -> 'Detections':
+        # re-indexes class ids against a superset of this result's class names
+        index = {name: i for i, name in enumerate(class_names)}
+        lookup = np.asarray([index[name] for name in self.class_names], dtype = np.int16)
+        return Detections(
+            self.boxes,
+            self.confidences,
+            lookup[self.class_ids] if len(lookup) else self.class_ids,
+            class_names,
+            image_ids = self.image_ids,
+            image_sizes = self.image_sizes
+        )
+
+    def split(self) -> List['Detections']:
+        order = np.argsort(self.image_ids, kind = 'stable')
+        bounds = np.searchsorted(self.image_ids[order], np.arange(self.num_images + 1))
+        return [
+            Detections(
+                self.boxes[order[start:end]],
+                self.confidences[order[start:end]],
+                self.class_ids[order[start:end]],
+                self.class_names,
+                image_sizes = self.image_sizes[i:i + 1]
+            )
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+        ]
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            boxes = self.boxes,
+            confidences = self.confidences,
+            class_ids = self.class_ids,
+            image_ids = self.image_ids,
+            image_sizes = self.image_sizes,
+            class_names = np.asarray(self.class_names, dtype = str)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'Detections':
+        with np.load(path, allow_pickle = False) as data:
+            return cls(
+                data['boxes'],
+                data['confidences'],
+                data['class_ids'],
+                data['class_names'].tolist(),
+                image_ids = data['image_ids'],
+                image_sizes = data['image_sizes']
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        # the original list-of-dicts format, built lazily and only once
+        if self._dict_view is None:
+            names = self.class_names
+            self._dict_view = {
+                "objects": [
+                    {
+                        'class': names[cls],
+                        'confidence': conf,
+                        'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+                    }
+                    for (x1, y1, x2, y2), conf, cls in zip(
+                        self.boxes.tolist(), self.confidences.tolist(), self.class_ids.tolist()
+                    )
+                ],
+                "count": self.count
+            }
+        return self._dict_view
+
+    def __getitem__(self, key: str) -> Any:
+        # counts come straight from the arrays, without materializing the per-box dicts
+        if key == 'count':
+            return self.count
+        return self.to_dict()[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in ('objects', 'count')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __repr__(self) -> str:
+        return f"Detections(boxes={len(self)}, images={self.num_images})"
@@ -0,0 +1,291 @@
+import os
+import json
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from config.model_config import ModelConfiguration
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype = np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis]
+    return vectors / np.maximum(np.linalg.norm(vectors, axis = 1, keepdims = True), 1e-12)
+
+
+def _save_atomic(path: str, array: np.ndarray):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+class EmbeddingIndex:
+    FORMAT_VERSION = 1
+
+    def __init__(self, dim: int, n_lists: int = 256, n_probe: int = 8, random_state: int = 42):
+        config = ModelConfiguration.get_style_recommendation_config()
+
+        self.dim = dim
+        self.n_lists = n_lists
+        # number of inverted lists scanned per query: the recall-vs-latency knob
+        self.n_probe = n_probe
+        self.top_k = config['top_k_recommendations']
+        self.threshold = config['embedding_threshold']
+        self.random_state = random_state
+
+        self.centroids: Optional[np.ndarray] = None
+        self.vectors = np.empty((0, dim), dtype = np.float32)
+        self.ids = np.empty((0,), dtype = np.int64)
+        self.assignments = np.empty((0,), dtype = np.int32)
+
+        # vectors are kept grouped by inverted list; inserts only mark the grouping stale
+        self._list_offsets: Optional[np.ndarray] = None
+        # added vectors wait here instead of being concatenated onto a (possibly memory-mapped)
+        # catalog; in-memory indexes fold them in on the next search, memmapped ones on save
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_ids: List[np.ndarray] = []
+        self._pending_assignments: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.ids) + sum(len(ids) for ids in self._pending_ids)
+
+    def _pending(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self._pending_ids:
+            return np.empty((0, self.dim), dtype = np.float32), np.empty((0,), dtype = np.int64), np.empty((0,), dtype = np.int32)
+        if len(self._pending_ids) > 1:
+            self._pending_vectors = [np.concatenate(self._pending_vectors)]
+            self._pending_ids = [np.concatenate(self._pending_ids)]
+            self._pending_assignments = [np.concatenate(self._pending_assignments)] if self._pending_assignments else []
+        assignments = self._pending_assignments[0] if self._pending_assignments else np.empty((0,), dtype = np.int32)
+        return self._pending_vectors[0], self._pending_ids[0], assignments
+
+    def _clear_pending(self):
+        self._pending_vectors, self._pending_ids, self._pending_assignments = [], [], []
+
+    def _merge_pending(self):
+        if not self._pending_ids:
+            return
+        vectors, ids, assignments = self._pending()
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.ids = np.concatenate([self.ids, ids])
+        if self.is_trained:
+            self.assignments = np.concatenate([self.assignments, assignments])
+        self._clear_pending()
+        self._list_offsets = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, sample: Optional[np.ndarray] = None, n_iter: int = 10, max_sample: Optional[int] = None):
+        # a few dozen points per list is enough to place the centroids
+        max_sample = max_sample or 64 * self.n_lists
+        rng = np.random.default_rng(self.random_state)
+        pending_vectors = self._pending()[0]
+
+        if sample is not None:
+            sample = _normalize(sample)
+            if len(sample) > max_sample:
+                sample = sample[rng.choice(len(sample), max_sample, replace = False)]
+        else:
+            # rows are picked across the stored and the pending vectors without concatenating them
+            total = len(self)
+            picks = np.arange(total) if total <= max_sample else np.sort(rng.choice(total, max_sample, replace = False))
+            stored = len(self.vectors)
+            sample = np.concatenate([
+                np.asarray(self.vectors[picks[picks < stored]], dtype = np.float32),
+                pending_vectors[picks[picks >= stored] - stored]
+            ])
+        if len(sample) == 0:
+            raise ValueError("Cannot Train An Embedding Index Without Vectors")
+
+        n_lists = min(self.n_lists, len(sample))
+        centroids = sample[rng.choice(len(sample), n_lists, replace = False)].copy()
+
+        # spherical k-means: assign by maximum cosine, then re-normalize the cluster means
+        for _ in range(n_iter):
+            labels = (sample @ centroids.T).argmax(axis = 1)
+            counts = np.bincount(labels, minlength = n_lists)
+            occupied = np.flatnonzero(counts)
+            # sorting by label turns the per-cluster sums into one contiguous reduceat
+            order = np.argsort(labels, kind = 'stable')
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[occupied]
+            centroids[occupied] = _normalize(np.add.reduceat(sample[order], starts, axis = 0))
+
+        self.centroids = centroids
+        self.n_lists = n_lists
+        self.assignments = self._assign(self.vectors) if len(self.vectors) else np.empty((0,), dtype = np.int32)
+        if len(pending_vectors):
+            self._pending_assignments = [self._assign(pending_vectors)]
+        self._list_offsets = None
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype = np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size])
+            assignments[start:start + chunk_size] = (chunk @ self.centroids.T).argmax(axis = 1)
+        return assignments
+
+    def add(self, vectors: np.ndarray, ids: Optional[np.ndarray] = None):
+        vectors = _normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected Embeddings Of Dimension {self.dim}, Got {vectors.shape[1]}")
+
+        if ids is None:
+            start = max([int(self.ids.max()) + 1 if len(self.ids) else 0] + [int(p.max()) + 1 for p in self._pending_ids if len(p)])
+            ids = np.arange(start, start + len(vectors), dtype = np.int64)
+        ids = np.asarray(ids, dtype = np.int64)
+
+        self._pending_vectors.append(vectors)
+        self._pending_ids.append(ids)
+        if self.is_trained:
+            self._pending_assignments.append(self._assign(vectors))
+        return ids
+
+    def _group_by_list(self):
+        if not isinstance(self.vectors, np.memmap):
+            self._merge_pending()
+        if self._list_offsets is not None or not self.is_trained:
+            return
+
+        order = np.argsort(self.assignments, kind = 'stable')
+        self.vectors = np.ascontiguousarray(self.vectors[order])
+        self.ids = self.ids[order]
+        self.assignments = self.assignments[order]
+        self._list_offsets = np.searchsorted(self.assignments, np.arange(self.n_lists + 1)).astype(np.int64)
+
+    def search(self, queries: np.ndarray, top_k: Optional[int] = None, n_probe: Optional[int] = None,
+               threshold: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = _normalize(queries)
+        top_k = top_k or self.top_k
+        threshold = self.threshold if threshold is None else threshold
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+
+        scores = np.full((len(queries), top_k), -np.inf, dtype = np.float32)
+        result_ids = np.full((len(queries), top_k), -1, dtype = np.int64)
+        if len(self) == 0:
+            return scores, result_ids
+
+        probe = None
+        if not self.is_trained:
+            # exact search until the index has been trained
+            ranges = np.array([[[0, len(self.vectors)]]] * len(queries), dtype = np.int64)
+        else:
+            self._group_by_list()
+            probe = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis = 1)[:, :n_probe]
+            ranges = np.stack([self._list_offsets[probe], self._list_offsets[probe + 1]], axis = 2)
+        pending_vectors, pending_ids, pending_assignments = self._pending()
+
+        for q, (query, query_ranges) in enumerate(zip(queries, ranges)):
+            # lists are contiguous slices, so memory-mapped vectors are read without fancy-index copies
+            query_ranges = [(s, e) for s, e in query_ranges if e > s]
+            score_blocks = [self.vectors[s:e] @ query for s, e in query_ranges]
+            id_blocks = [self.ids[s:e] for s, e in query_ranges]
+            if len(pending_ids):
+                # vectors added since the last save are few, and scanned directly
+                selected = slice(None) if probe is None else np.isin(pending_assignments, probe[q])
+                score_blocks.append(pending_vectors[selected] @ query)
+                id_blocks.append(pending_ids[selected])
+            if not score_blocks:
+                continue
+
+            candidate_scores = np.concatenate(score_blocks)
+            candidate_ids = np.concatenate(id_blocks)
+            if len(candidate_scores) == 0:
+                continue
+            k = min(top_k, len(candidate_scores))
+            best = np.argpartition(-candidate_scores, k - 1)[:k]
+            best = best[np.argsort(-candidate_scores[best])]
+            scores[q, :k] = candidate_scores[best]
+            result_ids[q, :k] = candidate_ids[best]
+
+        # matches below the configured similarity threshold are reported as empty slots
+        below = scores < threshold
+        scores[below] = -np.inf
+        result_ids[below] = -1
+        return scores, result_ids
+
+    def _segments(self) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray, int, int]]:
+        # (vectors, ids, assignments, start, end) blocks in saved order: stored rows of each list
+        # followed by the pending rows of that list, so the saved file stays grouped by list
+        pending_vectors, pending_ids, pending_assignments = self._pending()
+        stored = (self.vectors, self.ids, self.assignments)
+        if not self.is_trained:
+            return [stored + (0, len(self.ids)), (pending_vectors, pending_ids, pending_assignments, 0, len(pending_ids))]
+
+        order = np.argsort(pending_assignments, kind = 'stable')
+        pending = (pending_vectors[order], pending_ids[order], pending_assignments[order])
+        pending_offsets = np.searchsorted(pending[2], np.arange(self.n_lists + 1))
+        segments = []
+        for i in range(self.n_lists):
+            segments.append(stored + (self._list_offsets[i], self._list_offsets[i + 1]))
+            segments.append(pending + (pending_offsets[i], pending_offsets[i + 1]))
+        return segments
+
+    def save(self, directory: str, chunk_size: int = 65536):
+        self._group_by_list()
+        os.makedirs(directory, exist_ok = True)
+
+        # every file is written beside its target and swapped in with os.replace: the vectors being
+        # saved may be memory-mapped from this very directory, and must not be truncated under the map
+        vectors_path = os.path.join(directory, 'vectors.npy')
+        tmp_path = f"{vectors_path}.{os.getpid()}.tmp.npy"
+        vectors = np.lib.format.open_memmap(tmp_path, mode = 'w+', dtype = np.float32, shape = (len(self), self.dim))
+        ids, assignments, position = [], [], 0
+        for source_vectors, source_ids, source_assignments, start, end in self._segments():
+            # streamed in chunks, so a memory-mapped catalog is never read into RAM as a whole
+            for chunk_start in range(start, end, chunk_size):
+                chunk_end = min(chunk_start + chunk_size, end)
+                vectors[position:position + chunk_end - chunk_start] = source_vectors[chunk_start:chunk_end]
+                position += chunk_end - chunk_start
+            ids.append(source_ids[start:end])
+            if self.is_trained:
+                assignments.append(source_assignments[start:end])
+        vectors.flush()
+        del vectors
+
+        ids = np.concatenate(ids)
+        assignments = np.concatenate(assignments) if self.is_trained else np.empty((0,), dtype = np.int32)
+        os.replace(tmp_path, vectors_path)
+        _save_atomic(os.path.join(directory, 'ids.npy'), ids)
+        _save_atomic(os.path.join(directory, 'assignments.npy'), assignments)
+        if self.is_trained:
+            _save_atomic(os.path.join(directory, 'centroids.npy'), self.centroids)
+
+        if self._pending_ids:
+            # a memmapped index switches over to the file it just wrote, which now holds the pending rows
+            self.vectors = np.load(vectors_path, mmap_mode = 'r')
+            self.ids = ids
+            self.assignments = assignments
+            self._clear_pending()
+            if self.is_trained:
+                self._list_offsets = np.searchsorted(assignments, np.arange(self.n_lists + 1)).astype(np.int64)
+
+        meta_path = os.path.join(directory, 'index.json')
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({
+                'version' : self.FORMAT_VERSION,
+                'dim' : self.dim,
+                'n_lists' : self.n_lists,
+                'n_probe' : self.n_probe,
+                'trained' : self.is_trained,
+                'count' : len(self)
+            }, f, indent = 2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'EmbeddingIndex':
+        with open(os.path.join(directory, 'index.json')) as f:
+            meta: Dict[str, Any] = json.load(f)
+
+        index = cls(meta['dim'], n_lists = meta['n_lists'], n_probe = meta['n_probe'])
+        mmap_mode = 'r' if mmap else None
+        # vectors are memory-mapped, so a catalog larger than RAM only pages in the probed lists
+        index.vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode = mmap_mode)
+        index.ids = np.load(os.path.join(directory, 'ids.npy'))
+        index.assignments = np.load(os.path.join(directory, 'assignments.npy'))
+        if meta['trained']:
+            index.centroids = np.load(os.path.join(directory, 'centroids.npy'))
+            index._list_offsets = np.searchsorted(
+                index.assignments, np.arange(index.n_lists + 1)
+            ).astype(np.int64)
+        return index
@@ -0,0 +1,105 @@
+import os
+import pickle
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+
+class FeatureCache:
+    MANIFEST_VERSION = 1
+
+    def __init__(self, manifest_path: str, settings_key: str = ''):
+        self.manifest_path = manifest_path
+        # features computed with different preprocessing settings are never reused
+        self.settings_key = settings_key
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.removed = 0
+        self._load()
+
+    @staticmethod
+    def content_hash(path: str, chunk_size: int = 1 << 20) -> str:
+        digest = hashlib.blake2b(digest_size = 20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+
+        try:
+            with open(self.manifest_path, 'rb') as f:
+                manifest = pickle.load(f)
+        except Exception as e:
+            print(f"Error Loading Feature Cache {self.manifest_path} : {e}")
+            return
+
+        if manifest.get('version') != self.MANIFEST_VERSION or manifest.get('settings_key') != self.settings_key:
+            return
+        self.entries = manifest.get('entries', {})
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stat = os.stat(path)
+        if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            self.hits += 1
+            return entry['features']
+
+        # stat changed (e.g. touched or copied); only a content change invalidates the entry
+        if entry['size'] == stat.st_size and entry['hash'] == self.content_hash(path):
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self.hits += 1
+            return entry['features']
+
+        self.misses += 1
+        return None
+
+    def put(self, path: str, features: Dict[str, Any]):
+        stat = os.stat(path)
+        self.entries[os.path.abspath(path)] = {
+            'mtime_ns' : stat.st_mtime_ns,
+            'size' : stat.st_size,
+            'hash' : self.content_hash(path),
+            'features' : features
+        }
+
+    def prune(self, live_paths: Iterable[str]):
+        live = {os.path.abspath(path) for path in live_paths}
+        stale = [key for key in self.entries if key not in live]
+        for key in stale:
+            del self.entries[key]
+        self.removed += len(stale)
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        os.makedirs(directory, exist_ok = True)
+
+        # write-then-rename so an interrupted run never leaves a truncated manifest behind
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version' : self.MANIFEST_VERSION,
+                'settings_key' : self.settings_key,
+                'entries' : self.entries
+            }, f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.manifest_path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'removed' : self.removed,
+            'entries' : len(self.entries)
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.removed = 0
@@ -0,0 +1,170 @@
+import os
+import csv
+import json
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+COLOR_CHANNELS = ('red_mean', 'green_mean', 'blue_mean')
+METADATA_COLUMNS = ('split', 'category', 'image_filename')
+
+
+class FeatureStoreWriter:
+    SCHEMA_VERSION = 1
+    COPY_CHUNK_ROWS = 65536
+
+    def __init__(self, directory: str, num_colors: int = 5):
+        self.directory = directory
+        self.num_colors = num_colors
+        self.count = 0
+        self.categories: Dict[str, int] = {}
+
+        os.makedirs(directory, exist_ok = True)
+        # numeric columns are appended as raw bytes and wrapped into .npy files on close,
+        # so writing never needs the whole dataset in memory
+        self._raw_files = {
+            'channel_means' : open(self._raw_path('channel_means'), 'wb'),
+            'dominant_colors' : open(self._raw_path('dominant_colors'), 'wb'),
+            'dimensions' : open(self._raw_path('dimensions'), 'wb'),
+            'category_ids' : open(self._raw_path('category_ids'), 'wb')
+        }
+        self._metadata_file = open(os.path.join(directory, 'metadata.csv'), 'w', newline = '')
+        self._metadata_writer = csv.writer(self._metadata_file)
+        self._metadata_writer.writerow(METADATA_COLUMNS)
+
+    def _raw_path(self, column: str) -> str:
+        return os.path.join(self.directory, f"{column}.raw")
+
+    def append(self, record: Dict[str, Any]):
+        colors = np.zeros((self.num_colors, 3), dtype = np.float32)
+        palette = np.asarray(record['dominant_colors'], dtype = np.float32).reshape(-1, 3)[:self.num_colors]
+        colors[:len(palette)] = palette
+
+        distribution = record['color_distribution']
+        category = record.get('category', '')
+        category_id = self.categories.setdefault(category, len(self.categories))
+
+        self._raw_files['channel_means'].write(
+            np.array([distribution[name] for name in COLOR_CHANNELS], dtype = np.float32).tobytes()
+        )
+        self._raw_files['dominant_colors'].write(colors.tobytes())
+        self._raw_files['dimensions'].write(np.asarray(record['dimensions'], dtype = np.int32).tobytes())
+        self._raw_files['category_ids'].write(np.int16(category_id).tobytes())
+        self._metadata_writer.writerow([record.get(column, '') for column in METADATA_COLUMNS])
+        self.count += 1
+
+    def append_many(self, records: Iterable[Dict[str, Any]]):
+        for record in records:
+            self.append(record)
+
+    def close(self):
+        for f in self._raw_files.values():
+            f.close()
+        self._metadata_file.close()
+
+        shapes = {
+            'channel_means' : ((self.count, 3), np.float32),
+            'dominant_colors' : ((self.count, self.num_colors, 3), np.float32),
+            'dimensions' : ((self.count, 3), np.int32),
+            'category_ids' : ((self.count,), np.int16)
+        }
+        for column, (shape, dtype) in shapes.items():
+            raw_path = self._raw_path(column)
+            npy_path = os.path.join(self.directory, f"{column}.npy")
+            if self.count == 0:
+                np.save(npy_path, np.empty(shape, dtype = dtype))
+            else:
+                raw = np.memmap(raw_path, dtype = dtype, mode = 'r', shape = shape)
+                out = np.lib.format.open_memmap(npy_path, mode = 'w+', dtype = dtype, shape = shape)
+                for start in range(0, self.count, self.COPY_CHUNK_ROWS):
+                    out[start:start + self.COPY_CHUNK_ROWS] = raw[start:start + self.COPY_CHUNK_ROWS]
+                out.flush()
+                del raw, out
+            os.remove(raw_path)
+
+        with open(os.path.join(self.directory, 'schema.json'), 'w') as f:
+            json.dump({
+                'version' : self.SCHEMA_VERSION,
+                'count' : self.count,
+                'num_colors' : self.num_colors,
+                'color_channels' : list(COLOR_CHANNELS),
+                'categories' : sorted(self.categories, key = self.categories.get)
+            }, f, indent = 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FeatureStore:
+    def __init__(self, directory: str, mmap: bool = True):
+        self.directory = directory
+        with open(os.path.join(directory, 'schema.json')) as f:
+            self.schema = json.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        self.channel_means = self._load('channel_means', mmap_mode)
+        self.dominant_colors = self._load('dominant_colors', mmap_mode)
+        self.dimensions = self._load('dimensions', mmap_mode)
+        self.category_ids = self._load('category_ids', mmap_mode)
+        self.categories: List[str] = self.schema['categories']
+        self._metadata: Optional[pd.DataFrame] = None
+
+    def _load(self, column: str, mmap_mode: Optional[str]) -> np.ndarray:
+        return np.load(os.path.join(self.directory, f"{column}.npy"), mmap_mode = mmap_mode)
+
+    def __len__(self) -> int:
+        return self.schema['count']
+
+    @property
+    def metadata(self) -> pd.DataFrame:
+        # the string table is only parsed when something actually asks for it
+        if self._metadata is None:
+            self._metadata = pd.read_csv(
+                os.path.join(self.directory, 'metadata.csv'),
+                dtype = str,
+                keep_default_na = False
+            )
+        return self._metadata
+
+    def feature_matrix(self) -> np.ndarray:
+        return np.concatenate([
+            self.channel_means,
+            self.dominant_colors.reshape(len(self), -1)
+        ], axis = 1)
+
+    def labels(self) -> np.ndarray:
+        return np.asarray(self.categories)[self.category_ids]
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        metadata = self.metadata
+        for i in range(len(self)):
+            yield {
+                **{column: metadata.iat[i, j] for j, column in enumerate(METADATA_COLUMNS)},
+                'dimensions' : tuple(int(d) for d in self.dimensions[i]),
+                'color_distribution' : dict(zip(COLOR_CHANNELS, self.channel_means[i].tolist())),
+                'dominant_colors' : [tuple(color) for color in self.dominant_colors[i].tolist()]
+            }
+
+
+def record_to_vector(record: Dict[str, Any], num_colors: int = 5) -> np.ndarray:
+    # same layout as FeatureStore.feature_matrix(): channel means followed by the flattened palette
+    vector = np.zeros(3 + num_colors * 3, dtype = np.float32)
+    distribution = record['color_distribution']
+    vector[:3] = [distribution[name] for name in COLOR_CHANNELS]
+    palette = np.asarray(record['dominant_colors'], dtype = np.float32).reshape(-1)[:num_colors * 3]
+    vector[3:3 + len(palette)] = palette
+    return vector
+
+
+def save_feature_store(records: Iterable[Dict[str, Any]], directory: str, num_colors: int = 5) -> int:
+    with FeatureStoreWriter(directory, num_colors = num_colors) as writer:
+        writer.append_many(records)
+    return writer.count
+
+
+def load_feature_store(directory: str, mmap: bool = True) -> FeatureStore:
+    return FeatureStore(directory, mmap = mmap)
@@ -0,0 +1,105 @@
+import struct
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+# JPEG start-of-frame markers that carry the image size (SOF0-SOF15 minus DHT/JPG/DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+
+def read_jpeg_size(image_path: str) -> Optional[Tuple[int, int]]:
+    # walks the marker segments only, so the size is known without decoding any pixels
+    try:
+        with open(image_path, 'rb') as f:
+            if f.read(2) != b'\xff\xd8':
+                return None
+
+            while True:
+                byte = f.read(1)
+                while byte and byte != b'\xff':
+                    byte = f.read(1)
+                while byte == b'\xff':
+                    byte = f.read(1)
+                if not byte:
+                    return None
+
+                marker = byte[0]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    continue
+
+                length_bytes = f.read(2)
+                if len(length_bytes) != 2:
+                    return None
+                length = struct.unpack('>H', length_bytes)[0]
+
+                if marker in _SOF_MARKERS:
+                    header = f.read(5)
+                    if len(header) != 5:
+                        return None
+                    height, width = struct.unpack('>HH', header[1:5])
+                    return width, height
+
+                f.seek(length - 2, 1)
+    except OSError:
+        return None
+
+
+def reduced_decode_flag(image_path: str, target_size: Tuple[int, int]) -> int:
+    if not image_path.lower().endswith(('jpg', 'jpeg')):
+        return cv2.IMREAD_COLOR
+
+    size = read_jpeg_size(image_path)
+    if size is None:
+        return cv2.IMREAD_COLOR
+
+    # libjpeg can scale by 1/2, 1/4 or 1/8 during the IDCT; pick the largest factor that still
+    # leaves at least the target resolution so the final resize only ever downsamples
+    width, height = size
+    for factor, flag in _REDUCED_FLAGS:
+        if width // factor >= target_size[0] and height // factor >= target_size[1]:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_source(image_path: str, min_size: Tuple[int, int] = (224, 224), reduced: bool = True) -> np.ndarray:
+    # BGR uint8 at the smallest libjpeg scale that still covers min_size, without resizing
+    flag = reduced_decode_flag(image_path, min_size) if reduced else cv2.IMREAD_COLOR
+    image = cv2.imread(image_path, flag)
+    if image is None:
+        raise FileNotFoundError(f"Image Not Found At Path : {image_path}")
+    return image
+
+
+def resize_image(image: np.ndarray, target_size: Tuple[int, int]) -> np.ndarray:
+    if image.shape[1::-1] == tuple(target_size):
+        return image
+    return cv2.resize(image, target_size)
+
+
+def to_unit_float(image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if out is None:
+        out = np.empty(image.shape, dtype = np.float32)
+    np.multiply(image, 1.0 / 255.0, out = out, casting = 'unsafe')
+    return out
+
+
+def decode_image(image_path: str, target_size: Tuple[int, int] = (224, 224), reduced: bool = True,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+    image = decode_source(image_path, target_size, reduced)
+
+    if out is None:
+        return resize_image(image, target_size)
+
+    if out.dtype == np.uint8:
+        cv2.resize(image, target_size, dst = out)
+        return out
+
+    # float buffers get the [0, 1] scaling applied in place, without an intermediate float copy
+    return to_unit_float(cv2.resize(image, target_size), out = out)
@@ -0,0 +1,413 @@
+import os
+import gc
+import json
+import time
+import errno
+import signal
+import socket
+import logging
+import tempfile
+import threading
+import numpy as np
+from contextlib import contextmanager
+from multiprocessing import RawArray
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from utils.metrics import metrics
+from utils.stage_scheduler import applied_thread_limits, apply_thread_limits, default_thread_limits
+
+
+def to_jsonable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'to_dict'):
+        return to_jsonable(value.to_dict())
+    return value
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # idle keep-alive connections are dropped after this many seconds
+    timeout = 15
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.server.draining:
+            # a draining worker answers what it already accepted and closes keep-alive connections
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Any):
+        self._send(status, json.dumps(to_jsonable(payload)).encode('utf-8'))
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status' : 'ok', 'pid' : os.getpid(), 'slot' : self.server.slot})
+        elif self.path == '/settings' and hasattr(self.server.app, 'effective_settings'):
+            self._send_json(200, self.server.app.effective_settings())
+        elif self.path == '/workers':
+            self._send_json(200, self.server.supervisor.workers())
+        elif self.path == '/metrics':
+            # each worker keeps its own registry, so this reports the worker that took the request
+            self._send(200, metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error' : f"Unknown Path : {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/recommend':
+            self._send_json(404, {'error' : f"Unknown Path : {self.path}"})
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        temp_path = None
+        try:
+            if self.headers.get('Content-Type', '').startswith('image/'):
+                # raw image uploads go through a temp file, since every stage is path based
+                with tempfile.NamedTemporaryFile(suffix = '.jpg', delete = False) as f:
+                    f.write(body)
+                    temp_path = f.name
+                image_path, use_cache = temp_path, True
+            else:
+                request = json.loads(body or b'{}')
+                image_path, use_cache = request['image_path'], request.get('use_cache', True)
+
+            with self.server.track_request():
+                result = self.server.app.recommend_designs(image_path, use_cache = use_cache)
+            self.server.supervisor.count_request(self.server.slot)
+            self._send_json(200, result)
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {'error' : f"Bad Request : {e}"})
+        except Exception as e:
+            logging.error(f"Error Serving {self.path} : {e}")
+            self._send_json(500, {'error' : str(e)})
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+class _WorkerHTTPServer(ThreadingHTTPServer):
+    # in-flight requests are joined on server_close, which is what makes shutdown graceful
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, listen_socket: socket.socket, app: Any, supervisor: 'PreforkServer', slot: int):
+        super().__init__(listen_socket.getsockname(), _RequestHandler, bind_and_activate = False)
+        self.socket.close()
+        self.socket = listen_socket
+        self.app = app
+        self.supervisor = supervisor
+        self.slot = slot
+        self.draining = False
+        self._request_starts: Dict[int, float] = {}
+        self._request_lock = threading.Lock()
+
+    def drain(self):
+        self.draining = True
+        threading.Thread(target = self.shutdown).start()
+
+    def get_request(self):
+        # the listening socket is non-blocking and shared, so a sibling may win the accept;
+        # socketserver treats the resulting BlockingIOError as "no request this time"
+        connection, address = self.socket.accept()
+        connection.setblocking(True)
+        return connection, address
+
+    def service_actions(self):
+        # runs once per poll of the accept loop, so a stale heartbeat means a stuck worker
+        self.supervisor.heartbeat(self.slot)
+
+    @contextmanager
+    def track_request(self):
+        # the accept loop keeps beating while handler threads hang, so the supervisor is also told
+        # when this worker's oldest in-flight request started
+        token = threading.get_ident()
+        with self._request_lock:
+            self._request_starts[token] = time.time()
+            self.supervisor.request_started(self.slot, min(self._request_starts.values()))
+        try:
+            yield
+        finally:
+            with self._request_lock:
+                del self._request_starts[token]
+                self.supervisor.request_started(self.slot, min(self._request_starts.values(), default = 0.0))
+
+
+class PreforkServer:
+    def __init__(self, app_factory: Callable[[], Any], host: str = '127.0.0.1', port: int = 8080,
+                 workers: Optional[int] = None, preload: bool = True, worker_timeout: float = 30.0,
+                 request_timeout: float = 120.0, profile: Optional[Any] = None, poll_interval: float = 0.5):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.num_workers = workers or os.cpu_count() or 1
+        self.preload = preload
+        self.worker_timeout = worker_timeout
+        self.request_timeout = request_timeout
+        # thread counts set by the performance profile are taken as they are; the ones it leaves to
+        # None are split from this worker's share of the cores
+        worker_split = default_thread_limits(max(1, (os.cpu_count() or 1) // self.num_workers))
+        self.worker_threads = {
+            framework : (profile.threads(framework) if profile is not None else None) or worker_split[framework]
+            for framework in ('torch', 'opencv')
+        }
+        self.poll_interval = poll_interval
+
+        # two slots per worker, so a reload can start a full new generation before the old one drains;
+        # the arrays live in anonymous shared memory and are inherited by every fork
+        num_slots = 2 * self.num_workers
+        self._pids = RawArray('i', num_slots)
+        self._heartbeats = RawArray('d', num_slots)
+        self._requests = RawArray('i', num_slots)
+        # start time of each worker's oldest in-flight request, 0 while it is idle
+        self._oldest_request = RawArray('d', num_slots)
+        # 1 for the slots of the current generation, 0 for workers still draining after a reload
+        self._active = RawArray('b', num_slots)
+        self._generation_slots: List[int] = []
+
+        self.app = None
+        self.socket: Optional[socket.socket] = None
+        self._reload_requested = False
+        self._stop_requested = False
+
+    def heartbeat(self, slot: int):
+        self._heartbeats[slot] = time.time()
+
+    def count_request(self, slot: int):
+        self._requests[slot] += 1
+
+    def request_started(self, slot: int, started: float):
+        self._oldest_request[slot] = started
+
+    def workers(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [
+            {
+                'slot' : slot,
+                'pid' : self._pids[slot],
+                'heartbeat_age_s' : now - self._heartbeats[slot],
+                'requests' : self._requests[slot],
+                'oldest_request_age_s' : now - self._oldest_request[slot] if self._oldest_request[slot] > 0 else 0.0,
+                'active' : bool(self._active[slot])
+            }
+            for slot in range(len(self._pids)) if self._pids[slot] > 0
+        ]
+
+    def _load_app(self):
+        start = time.perf_counter()
+        app = self.app_factory()
+        logging.info(f"Loaded Application In {time.perf_counter() - start:.2f}s")
+        return app
+
+    @staticmethod
+    def _freeze():
+        # moves everything loaded so far out of the collector's reach, so the cyclic GC in the
+        # workers does not write to (and un-share) the pages holding the model objects
+        gc.collect()
+        gc.freeze()
+
+    def _bind(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(128)
+        self.socket.setblocking(False)
+        self.port = self.socket.getsockname()[1]
+
+    def _free_slot(self) -> int:
+        for slot in range(len(self._pids)):
+            if self._pids[slot] == 0:
+                return slot
+
+        # every slot is held by the serving generation or by workers still draining from an earlier
+        # reload (e.g. on a second SIGHUP in quick succession); a draining worker gives up its slot
+        for slot in range(len(self._pids)):
+            pid = self._pids[slot]
+            if pid > 0 and not self._active[slot]:
+                logging.warning(f"Killing Draining Worker {pid} To Free Its Slot")
+                self._signal(pid, signal.SIGKILL)
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+                self._pids[slot] = 0
+                return slot
+        raise RuntimeError("No Free Worker Slot")
+
+    def _spawn(self, slot: int) -> int:
+        self._heartbeats[slot] = time.time()
+        self._requests[slot] = 0
+        self._oldest_request[slot] = 0.0
+        self._active[slot] = 1
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._worker_main(slot)
+            except BaseException as e:
+                logging.error(f"Worker {os.getpid()} Failed : {e}")
+                code = 1
+            finally:
+                os._exit(code)
+
+        self._pids[slot] = pid
+        return pid
+
+    def _worker_main(self, slot: int):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        app = self.app if self.preload else self.app_factory()
+        if hasattr(app, 'after_fork'):
+            app.after_fork()
+        for framework, threads in self.worker_threads.items():
+            if apply_thread_limits(framework, threads):
+                applied_thread_limits[framework] = threads
+
+        server = _WorkerHTTPServer(self.socket, app, self, slot)
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.drain())
+        self.heartbeat(slot)
+        try:
+            server.serve_forever(poll_interval = self.poll_interval)
+        finally:
+            server.server_close()
+
+    def start(self):
+        self._bind()
+        if self.preload:
+            self.app = self._load_app()
+            self._freeze()
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        self._generation_slots = list(range(self.num_workers))
+        logging.info(f"Serving On http://{self.host}:{self.port} With {self.num_workers} Workers")
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            for slot in range(len(self._pids)):
+                if self._pids[slot] != pid:
+                    continue
+                self._pids[slot] = 0
+                self._active[slot] = 0
+                if slot in self._generation_slots and not self._stop_requested:
+                    logging.warning(f"Worker {pid} Exited With Status {status}, Restarting")
+                    self._spawn(slot)
+
+    def _check_health(self):
+        now = time.time()
+        for slot in range(len(self._pids)):
+            pid = self._pids[slot]
+            if pid <= 0:
+                continue
+            # draining workers no longer run their accept loop, so only the serving ones must beat
+            if slot in self._generation_slots and now - self._heartbeats[slot] > self.worker_timeout:
+                logging.warning(f"Worker {pid} Missed Heartbeats For {self.worker_timeout}s, Killing It")
+                self._signal(pid, signal.SIGKILL)
+            elif self._oldest_request[slot] > 0 and now - self._oldest_request[slot] > self.request_timeout:
+                logging.warning(f"Worker {pid} Has A Request Running For Over {self.request_timeout}s, Killing It")
+                self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+    def reload(self):
+        # a new generation is forked from freshly loaded models and must be serving before
+        # the old one is asked to drain, so there is no window without workers
+        old_slots = list(self._generation_slots)
+        old_app = self.app
+        new_slots = []
+        try:
+            if self.preload:
+                # the previous generation was frozen; unfreezing lets it be collected once replaced
+                gc.unfreeze()
+                self.app = self._load_app()
+
+            started = time.time()
+            for _ in range(self.num_workers):
+                slot = self._free_slot()
+                self._spawn(slot)
+                new_slots.append(slot)
+
+            deadline = started + self.worker_timeout
+            while not all(self._pids[slot] > 0 and self._heartbeats[slot] > started for slot in new_slots):
+                if time.time() >= deadline:
+                    raise RuntimeError(f"New Workers Not Serving After {self.worker_timeout}s")
+                time.sleep(0.05)
+        except Exception as e:
+            # the current generation never stopped serving, so a failed reload just leaves it in place
+            logging.error(f"Reload Failed, Keeping The Current Workers : {e}")
+            for slot in new_slots:
+                self._active[slot] = 0
+                if self._pids[slot] > 0:
+                    self._signal(self._pids[slot], signal.SIGKILL)
+            self.app = old_app
+            if self.preload:
+                self._freeze()
+            return False
+
+        self._generation_slots = new_slots
+        for slot in old_slots:
+            self._active[slot] = 0
+            if self._pids[slot] > 0:
+                self._signal(self._pids[slot], signal.SIGTERM)
+        del old_app
+        if self.preload:
+            self._freeze()
+        logging.info(f"Reloaded Workers : {[self._pids[slot] for slot in new_slots]}")
+        return True
+
+    def stop(self, grace_period: float = 30.0):
+        self._stop_requested = True
+        for slot in range(len(self._pids)):
+            if self._pids[slot] > 0:
+                self._signal(self._pids[slot], signal.SIGTERM)
+
+        deadline = time.time() + grace_period
+        while any(pid > 0 for pid in self._pids) and time.time() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for slot in range(len(self._pids)):
+            if self._pids[slot] > 0:
+                self._signal(self._pids[slot], signal.SIGKILL)
+        self._reap()
+        if self.socket is not None:
+            self.socket.close()
+
+    def serve_forever(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, '_reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, '_stop_requested', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, '_stop_requested', True))
+        self.start()
+        try:
+            while not self._stop_requested:
+                time.sleep(self.poll_interval)
+                self._reap()
+                self._check_health()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+        finally:
+            self.stop()
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import inspect
+import logging
+import threading
+import functools
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # one slot per upper bound plus the +Inf overflow slot
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for upper, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return upper
+        return float('inf')
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('registry', 'stage', 'items', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', stage: str, items: int):
+        self.registry = registry
+        self.stage = stage
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.record_stage(self.stage, time.perf_counter() - self.start, self.items, exc is not None)
+        return False
+
+
+class JsonLogSink:
+    # one JSON line per observation, for log pipelines that aggregate on their own
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger('interior_design.metrics')
+        self.level = level
+
+    def emit(self, kind: str, name: str, value: float, labels: Dict[str, str]):
+        self.logger.log(self.level, json.dumps({
+            'ts' : time.time(), 'kind' : kind, 'metric' : name, 'value' : value, **labels
+        }))
+
+
+class PrometheusTextfileSink:
+    # rewrites a .prom file (node_exporter textfile collector format) at most every interval
+    def __init__(self, registry: 'MetricsRegistry', path: str, interval_seconds: float = 10.0):
+        self.registry = registry
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self._last_write = 0.0
+        self._write_lock = threading.Lock()
+
+    def emit(self, kind: str, name: str, value: float, labels: Dict[str, str]):
+        now = time.monotonic()
+        if now - self._last_write < self.interval_seconds or not self._write_lock.acquire(blocking = False):
+            return
+        try:
+            self._last_write = now
+            self.flush()
+        finally:
+            self._write_lock.release()
+
+    def flush(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.registry.to_prometheus())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error Writing Metrics To {self.path} : {e}")
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False, prefix: str = 'interior_design',
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.sinks: List[Any] = []
+
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, sinks: Optional[Sequence[Any]] = None):
+        if sinks is not None:
+            self.sinks = list(sinks)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _emit(self, kind: str, name: str, value: float, labels: Dict[str, str]):
+        for sink in self.sinks:
+            try:
+                sink.emit(kind, name, value, labels)
+            except Exception as e:
+                print(f"Error Emitting Metric {name} : {e}")
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self.sinks:
+            self._emit('counter', name, value, labels)
+
+    def observe(self, name: str, value: float, **labels: str):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+        if self.sinks:
+            self._emit('histogram', name, value, labels)
+
+    def record_stage(self, stage: str, seconds: float, items: int = 1, failed: bool = False):
+        self.observe('stage_seconds', seconds, stage = stage)
+        self.increment('stage_calls_total', 1, stage = stage)
+        if failed:
+            self.increment('stage_errors_total', 1, stage = stage)
+        else:
+            self.increment('images_processed_total', items, stage = stage)
+
+    def timer(self, stage: str, items: int = 1):
+        # disabled metrics hand back a shared no-op context manager: no clock reads, no locking
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, items)
+
+    def timed(self, stage: str, items_arg: Optional[str] = None) -> Callable:
+        def decorator(fn):
+            # the argument position is resolved once here, not on every call
+            position = None
+            if items_arg is not None:
+                position = list(inspect.signature(fn).parameters).index(items_arg)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+
+                items = 1
+                if position is not None:
+                    value = args[position] if position < len(args) else kwargs.get(items_arg)
+                    items = _count_items(value)
+
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    self.record_stage(stage, time.perf_counter() - start, items, failed = True)
+                    raise
+                self.record_stage(stage, time.perf_counter() - start, items)
+                return result
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                _series_name(name, labels) : value for (name, labels), value in self._counters.items()
+            }
+            histograms = {
+                _series_name(name, labels) : {
+                    'count' : h.count,
+                    'sum' : h.sum,
+                    'mean' : h.sum / h.count if h.count else 0.0,
+                    'p50' : h.quantile(0.5),
+                    'p99' : h.quantile(0.99)
+                }
+                for (name, labels), h in self._histograms.items()
+            }
+        return {'counters' : counters, 'histograms' : histograms}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), sort_keys = True)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key = lambda item: item[0])
+
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for upper, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if upper == float('inf') else repr(upper)
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _count_items(value: Any) -> int:
+    # a list of paths, a 4-D image batch or a multi-image Detections counts each image
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    if hasattr(value, 'num_images'):
+        return value.num_images
+    if getattr(value, 'ndim', 0) == 4:
+        return len(value)
+    return 1
+
+
+def _series_name(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    return name + _format_labels(labels)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+# process-wide registry used by the models; disabled until configure/enable is called
+metrics = MetricsRegistry()
+
+
+def configure(config: Dict[str, Any]) -> MetricsRegistry:
+    if not config.get('enabled', False):
+        metrics.disable()
+        return metrics
+
+    sinks = []
+    if config.get('json_log', False):
+        sinks.append(JsonLogSink())
+    if config.get('prometheus_textfile'):
+        sinks.append(PrometheusTextfileSink(
+            metrics, config['prometheus_textfile'], config.get('prometheus_interval_seconds', 10.0)
+        ))
+    metrics.enable(sinks)
+    return metrics
+
+
+timer = metrics.timer
+timed = metrics.timed
@@ -0,0 +1,286 @@
+import asyncio
+import threading
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, executor: Optional[Executor] = None, name: str = 'batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # the batch handed to batch_fn, until its futures are resolved
+        self._in_flight: List[tuple] = []
+
+        self.batch_size_histogram: Counter = Counter()
+        self.queue_depth_histogram: Counter = Counter()
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_started(self):
+        if self._worker is not None and not self._worker.done():
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        # requests still queued for a worker that died are carried over to the new one, or failed
+        # when they were made on another event loop, instead of being dropped with the old queue
+        while self._queue is not None and not self._queue.empty():
+            item, future = self._queue.get_nowait()
+            if future.done():
+                continue
+            if future.get_loop() is loop:
+                queue.put_nowait((item, future))
+                continue
+            self.errors += 1
+            try:
+                future.set_exception(RuntimeError(f"{self.name} Worker Stopped Before Serving The Request"))
+            except RuntimeError:
+                # the loop that owned the request is closed, so nobody is waiting on it any more
+                pass
+        self._queue = queue
+        self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self._queue.put((item, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        # visible to stop() while the batch is still filling up
+        self._in_flight = batch
+        self.queue_depth_histogram[self._queue.qsize() + 1] += 1
+
+        # wait at most max_wait after the first request for the batch to fill up
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            # callers that already gave up are dropped before the model sees their input
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            self.batch_size_histogram[len(batch)] += 1
+            self._in_flight = batch
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name} Returned {len(results)} Results For A Batch Of {len(items)}"
+                    )
+            except Exception as e:
+                self.errors += len(batch)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._in_flight = []
+                continue
+
+            # a batch_fn may return an exception in place of one item's result to fail only that caller
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    self.errors += 1
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            self._in_flight = []
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # nothing will serve the batch that was running or the requests still queued, so their
+        # callers are failed rather than left waiting forever
+        pending = list(self._in_flight)
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._in_flight = []
+        for _, future in pending:
+            if not future.done():
+                self.errors += 1
+                future.set_exception(RuntimeError(f"{self.name} Stopped Before Serving The Request"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests' : self.requests,
+            'errors' : self.errors,
+            'queue_depth' : self.queue_depth,
+            'max_queue_depth' : self.max_queue_depth,
+            'batch_size_histogram' : dict(sorted(self.batch_size_histogram.items())),
+            'queue_depth_histogram' : dict(sorted(self.queue_depth_histogram.items()))
+        }
+
+
+class InferenceService:
+    def __init__(self, interior_design_ai: Any, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 max_workers: int = 4, top_k: int = 5):
+        self.ai = interior_design_ai
+        self.top_k = top_k
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        # one thread per model stage is enough: each batcher runs its batches one at a time
+        self.executor = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = 'inference')
+
+        def batcher(name, fn):
+            return MicroBatcher(fn, max_batch_size, max_wait_ms, executor = self.executor, name = name)
+
+        self.batchers = {
+            'features' : batcher('features', self._extract_features),
+            'classification' : batcher('classification', self._classify),
+            'detection' : batcher('detection', self._detect),
+            'styles' : batcher('styles', self._recommend_styles),
+            'embeddings' : batcher('embeddings', self._encode_images)
+        }
+
+    @staticmethod
+    def _isolated(batch_fn, image_paths):
+        # the whole batch is tried first; if it fails, every image is retried on its own so only the
+        # caller with the bad input gets the error
+        try:
+            return list(batch_fn(image_paths))
+        except Exception as e:
+            if len(image_paths) == 1:
+                return [e]
+
+        results = []
+        for image_path in image_paths:
+            try:
+                results.append(list(batch_fn([image_path]))[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _extract_features(self, image_paths):
+        results = []
+        for image_path in image_paths:
+            try:
+                results.append(self.ai.data_preprocessor.extract_features(image_path))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _classify(self, image_paths):
+        return self._isolated(
+            lambda paths: self.ai.classification_model.predict_batch(paths, batch_size = len(paths)), image_paths
+        )
+
+    def _detect(self, image_paths):
+        return self._isolated(
+            lambda paths: self.ai.feature_extraction_model.detect_objects_batch(paths, batch_size = len(paths)),
+            image_paths
+        )
+
+    def _recommend_styles(self, image_paths):
+        return self._isolated(
+            lambda paths: self.ai.style_recommendation_model.recommend_styles(list(paths), top_k = self.top_k),
+            image_paths
+        )
+
+    def _encode_images(self, image_paths):
+        return self._isolated(lambda paths: self.ai.style_recommendation_model.encode_images(list(paths)), image_paths)
+
+    def _styles_and_rooms(self, embedding):
+        query = embedding[None]
+        return (
+            self.ai.style_recommendation_model.recommend_styles_from_embeddings(query, top_k = self.top_k)[0],
+            self.ai._search_catalog(query, top_k = self.top_k)
+        )
+
+    async def classify(self, image_path):
+        return await self.batchers['classification'].submit(image_path)
+
+    async def detect_objects(self, image_path):
+        return await self.batchers['detection'].submit(image_path)
+
+    async def recommend_styles(self, image_path):
+        return await self.batchers['styles'].submit(image_path)
+
+    async def recommend_designs(self, image_path):
+        # each model stage is queued on its own batcher, so concurrent callers share forward passes;
+        # the result has the same keys as InteriorDesignAI.recommend_designs
+        features, classification, embedding = await asyncio.gather(
+            self.batchers['features'].submit(image_path),
+            self.batchers['classification'].submit(image_path),
+            self.batchers['embeddings'].submit(image_path)
+        )
+        styles, similar_rooms = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._styles_and_rooms, embedding
+        )
+        return {
+            'image_features' : features,
+            'style_classification' : classification,
+            'recommended_styles' : styles,
+            'similar_rooms' : similar_rooms
+        }
+
+    def start_background_loop(self):
+        # for callers on plain threads (e.g. the HTTP server's handlers): the batchers run on an
+        # event loop of their own and submit_threadsafe blocks the calling thread only
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target = self._loop.run_forever, name = 'micro-batching', daemon = True)
+            self._loop_thread.start()
+        return self._loop
+
+    def recommend_designs_threadsafe(self, image_path):
+        loop = self.start_background_loop()
+        return asyncio.run_coroutine_threadsafe(self.recommend_designs(image_path), loop).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+    async def close(self):
+        for batcher in self.batchers.values():
+            await batcher.stop()
+        self.executor.shutdown(wait = True)
+
+    def close_threadsafe(self):
+        if self._loop is None:
+            self.executor.shutdown(wait = True)
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+        self._loop, self._loop_thread = None, None
@@ -1,15 +1,61 @@
+import os 
+import time 
+import hashlib 
+import threading 
 import numpy as np 
-import tensorflow as tf 
-from typing import Any, Dict, List 
+from itertools import islice 
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple 
+from utils.metrics import timer 
+from utils.quantized_runtime import load_quantized 
 
 class ModelUtilities:
+    # fingerprints of every weights file loaded through load_model, keyed by path
+    _loaded_weights: Dict[str, str] = {} 
+    _weights_lock = threading.Lock() 
+
     @staticmethod 
     def load_model(model_path: str) -> Any:
         try:
-            return tf.keras.models.load_model(model_path) 
+            # tensorflow is imported on demand so importing this module stays cheap
+            import tensorflow as tf 
+            model = tf.keras.models.load_model(model_path) 
+            ModelUtilities.record_weights(model_path) 
+            return model 
         except Exception as e:
             print(f"Error Loading Model : {e}")
             return None 
+
+    @staticmethod 
+    def file_fingerprint(path: str) -> str:
+        # SavedModel directories are fingerprinted over all their files
+        paths = [path] 
+        if os.path.isdir(path):
+            paths = sorted(
+                os.path.join(root, name) for root, _, files in os.walk(path) for name in files
+            )
+
+        digest = hashlib.sha1() 
+        for file_path in paths:
+            stat = os.stat(file_path) 
+            digest.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8')) 
+        return digest.hexdigest() 
+
+    @staticmethod 
+    def record_weights(model_path: str): 
+        # local weights are fingerprinted by their files; anything else (a hub model id or a
+        # framework preset such as 'imagenet') is recorded by name
+        if os.path.exists(model_path):
+            key, fingerprint = os.path.abspath(model_path), ModelUtilities.file_fingerprint(model_path) 
+        else:
+            key, fingerprint = model_path, 'name' 
+        with ModelUtilities._weights_lock:
+            ModelUtilities._loaded_weights[key] = fingerprint 
+
+    @staticmethod 
+    def weights_fingerprint() -> str:
+        with ModelUtilities._weights_lock:
+            items = sorted(ModelUtilities._loaded_weights.items()) 
+        return hashlib.sha1(repr(items).encode('utf-8')).hexdigest() 
     
 
     @staticmethod
@@ -23,25 +69,289 @@ class ModelUtilities:
             return False 
         
 
+    @staticmethod
+    def iter_chunks(data: Any, labels: Any = None, chunk_size: int = 256) -> Iterator[Tuple[np.ndarray, Any]]:
+        # arrays and memmaps are sliced, so only one float32 chunk is ever materialized;
+        # any other iterable is taken to yield ready-made batches or (batch, labels) pairs
+        if hasattr(data, '__len__') and hasattr(data, 'shape'):
+            for start in range(0, len(data), chunk_size):
+                chunk_labels = None if labels is None else np.asarray(labels[start:start + chunk_size]) 
+                yield np.asarray(data[start:start + chunk_size], dtype = np.float32), chunk_labels 
+            return
+
+        offset = 0 
+        for item in data:
+            if isinstance(item, tuple):
+                batch, chunk_labels = item 
+            else:
+                batch = item 
+                chunk_labels = None if labels is None else np.asarray(labels[offset:offset + len(item)]) 
+            batch = np.asarray(batch, dtype = np.float32) 
+            offset += len(batch) 
+            yield batch, chunk_labels 
+
+    @staticmethod
+    def _predict_chunk(model: Any, batch: np.ndarray, chunk_index: int,
+                       on_chunk: Optional[Callable[[Dict[str, float]], None]]) -> np.ndarray:
+        start = time.perf_counter() 
+        with timer('model_utils.predict_chunk', len(batch)):
+            output = np.asarray(model.predict_on_batch(batch)) 
+        seconds = time.perf_counter() - start 
+        if on_chunk is not None:
+            on_chunk({
+                'chunk' : chunk_index,
+                'samples' : len(batch),
+                'seconds' : seconds,
+                'throughput_per_s' : len(batch) / max(seconds, 1e-9)
+            })
+        return output 
+
     @staticmethod 
-    def evaluate_model(model: Any, test_data: np.ndarray, test_labels: np.ndarray) -> Dict[str, float]:
+    def evaluate_model(model: Any, test_data: Any, test_labels: Any = None, chunk_size: int = 256,
+                       on_chunk: Optional[Callable[[Dict[str, float]], None]] = None) -> Dict[str, Any]:
+        # streaming accuracy and cross-entropy: memory stays at one chunk however large the test set
         try:
-            loss, accuracy = model.evaluate(test_data, test_labels) 
+            samples, correct, loss_sum, elapsed = 0, 0, 0.0, 0.0 
+            chunk_throughput = [] 
+
+            def record_chunk(stats):
+                chunk_throughput.append(stats['throughput_per_s']) 
+                if on_chunk is not None:
+                    on_chunk(stats) 
+
+            chunks = ModelUtilities.iter_chunks(test_data, test_labels, chunk_size) 
+            for chunk_index, (batch, labels) in enumerate(chunks):
+                if labels is None:
+                    raise ValueError(f"No Labels For Evaluation Chunk {chunk_index}")
+
+                chunk_start = time.perf_counter() 
+                probabilities = ModelUtilities._predict_chunk(model, batch, chunk_index, record_chunk) 
+                elapsed += time.perf_counter() - chunk_start 
+                clipped = np.clip(probabilities, 1e-7, 1.0) 
+
+                if labels.ndim > 1:
+                    # one-hot (or soft) targets, as the models here are compiled with categorical_crossentropy
+                    loss_sum += float(-(labels * np.log(clipped)).sum()) 
+                    targets = labels.argmax(axis = 1) 
+                else:
+                    targets = labels.astype(np.int64) 
+                    loss_sum += float(-np.log(clipped[np.arange(len(targets)), targets]).sum()) 
+
+                correct += int((probabilities.argmax(axis = 1) == targets).sum()) 
+                samples += len(batch) 
+
+            if samples == 0:
+                raise ValueError("Evaluation Data Is Empty")
+
             return {
-                'loss' : loss,
-                'accuracy' : accuracy
+                'loss' : loss_sum / samples,
+                'accuracy' : correct / samples,
+                'samples' : samples,
+                'throughput_per_s' : samples / max(elapsed, 1e-9),
+                'chunk_throughput_per_s' : chunk_throughput
             }
-        
+
         except Exception as e:
             print(f"Error Evaluating Model :{e}")
-            return {} 
+            raise 
     
 
     @staticmethod
-    def predict(model: Any, input_data: np.ndarray) -> List[Any]:
+    def predict(model: Any, input_data: Any, chunk_size: int = 256, output: Optional[np.ndarray] = None,
+                output_path: Optional[str] = None, num_samples: Optional[int] = None,
+                on_chunk: Optional[Callable[[Dict[str, float]], None]] = None) -> np.ndarray:
+        # predictions are written chunk by chunk into `output`, a new .npy memmap at output_path,
+        # or (without either) an array allocated once the first chunk shows the output width.
+        # Only an array's length is its sample count; a list or iterator of batches needs num_samples
+        # for that, and without it (and without output) its predictions are collected and concatenated,
+        # so memory then grows with the number of predictions
         try:
-            return model.predict(input_data) 
+            if num_samples is None and hasattr(input_data, '__len__') and hasattr(input_data, 'shape'):
+                num_samples = len(input_data) 
+            if output_path is not None and num_samples is None:
+                raise ValueError("num_samples Is Required To Memory-Map Predictions From An Iterator")
+
+            written = 0 
+            pieces = [] 
+            for chunk_index, (batch, _) in enumerate(ModelUtilities.iter_chunks(input_data, chunk_size = chunk_size)):
+                predictions = ModelUtilities._predict_chunk(model, batch, chunk_index, on_chunk) 
+
+                if output is None and output_path is not None:
+                    output = np.lib.format.open_memmap(
+                        output_path,
+                        mode = 'w+',
+                        dtype = np.float32,
+                        shape = (num_samples,) + predictions.shape[1:]
+                    )
+                elif output is None and num_samples is not None:
+                    output = np.empty((num_samples,) + predictions.shape[1:], dtype = np.float32) 
+
+                if output is None:
+                    pieces.append(predictions.astype(np.float32, copy = False)) 
+                else:
+                    if written + len(predictions) > len(output):
+                        raise ValueError(f"Output Holds {len(output)} Predictions, Got More")
+                    output[written:written + len(predictions)] = predictions 
+                written += len(predictions) 
+
+            if output is None:
+                if not pieces:
+                    raise ValueError("Prediction Input Is Empty")
+                return np.concatenate(pieces, axis = 0) 
+
+            if isinstance(output, np.memmap):
+                output.flush() 
+            return output[:written] 
+
         except Exception as e:
             print(f"Error Making Predictions : {e}")
-            return [] 
-    
\ No newline at end of file
+            raise 
+
+    @staticmethod
+    def _calibration_samples(calibration_data: Iterable[np.ndarray], num_samples: int):
+        # calibration_data yields preprocessed batches; converters want them one sample at a time
+        def samples():
+            for batch in calibration_data:
+                for sample in np.asarray(batch, dtype = np.float32):
+                    yield sample[np.newaxis]
+        return islice(samples(), num_samples)
+
+    @staticmethod
+    def _export_tflite(model: Any, output_path: str, mode: str, calibration_data, num_calibration_samples: int):
+        import tensorflow as tf 
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(model) 
+        converter.optimizations = [tf.lite.Optimize.DEFAULT] 
+        if mode == 'float16':
+            converter.target_spec.supported_types = [tf.float16] 
+        elif mode == 'int8':
+            # full-integer kernels inside, float32 in and out so it stays a drop-in for the Keras model
+            converter.representative_dataset = lambda: (
+                [sample] for sample in ModelUtilities._calibration_samples(calibration_data, num_calibration_samples)
+            )
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8] 
+
+        with open(output_path, 'wb') as f:
+            f.write(converter.convert()) 
+
+    @staticmethod
+    def _export_onnx(model: Any, output_path: str, mode: str, calibration_data, num_calibration_samples: int):
+        import tf2onnx 
+
+        float_path = output_path if mode == 'float32' else f"{output_path}.float32.onnx" 
+        tf2onnx.convert.from_keras(model, output_path = float_path) 
+        if mode == 'float32':
+            return 
+
+        if mode == 'float16':
+            import onnx 
+            from onnxconverter_common import float16 
+
+            onnx.save(float16.convert_float_to_float16(onnx.load(float_path), keep_io_types = True), output_path) 
+        elif mode == 'dynamic':
+            from onnxruntime.quantization import QuantType, quantize_dynamic 
+
+            quantize_dynamic(float_path, output_path, weight_type = QuantType.QInt8) 
+        else:
+            import onnxruntime 
+            from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static 
+
+            input_name = onnxruntime.InferenceSession(
+                float_path, providers = ['CPUExecutionProvider']
+            ).get_inputs()[0].name 
+            samples = ModelUtilities._calibration_samples(calibration_data, num_calibration_samples) 
+
+            class _Reader(CalibrationDataReader):
+                def get_next(self):
+                    sample = next(samples, None) 
+                    return None if sample is None else {input_name : sample} 
+
+            quantize_static(
+                float_path,
+                output_path,
+                _Reader(),
+                quant_format = QuantFormat.QDQ,
+                activation_type = QuantType.QInt8,
+                weight_type = QuantType.QInt8
+            )
+        os.remove(float_path) 
+
+    @staticmethod
+    def export_quantized(model: Any, export_path: str, mode: str = 'int8', export_format: str = 'tflite',
+                         calibration_data: Optional[Iterable[np.ndarray]] = None,
+                         num_calibration_samples: int = 200) -> Optional[str]:
+        try:
+            if mode not in ('int8', 'float16', 'dynamic', 'float32'):
+                raise ValueError(f"Unknown Quantization Mode : {mode}")
+            if mode == 'int8' and calibration_data is None:
+                raise ValueError("int8 Quantization Needs Calibration Data")
+
+            output_path = export_path if export_path.endswith(f".{export_format}") else f"{export_path}.{export_format}" 
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok = True) 
+            if export_format == 'tflite':
+                ModelUtilities._export_tflite(model, output_path, mode, calibration_data, num_calibration_samples) 
+            elif export_format == 'onnx':
+                ModelUtilities._export_onnx(model, output_path, mode, calibration_data, num_calibration_samples) 
+            else:
+                raise ValueError(f"Unknown Export Format : {export_format}")
+            return output_path 
+
+        except Exception as e:
+            print(f"Error Exporting Quantized Model : {e}")
+            return None 
+
+    @staticmethod
+    def load_quantized_model(model_path: str, num_threads: Optional[int] = None) -> Any:
+        try:
+            model = load_quantized(model_path, num_threads = num_threads) 
+            ModelUtilities.record_weights(model.path) 
+            return model 
+        except Exception as e:
+            print(f"Error Loading Quantized Model : {e}")
+            return None 
+
+    @staticmethod
+    def _timed_predictions(model: Any, test_data: np.ndarray, batch_size: int):
+        model.predict_on_batch(np.asarray(test_data[:batch_size], dtype = np.float32)) 
+
+        outputs, latencies = [], [] 
+        for start in range(0, len(test_data), batch_size):
+            batch = np.asarray(test_data[start:start + batch_size], dtype = np.float32) 
+            batch_start = time.perf_counter() 
+            outputs.append(np.asarray(model.predict_on_batch(batch))) 
+            latencies.append((time.perf_counter() - batch_start) / len(batch)) 
+        return np.concatenate(outputs, axis = 0), np.asarray(latencies) * 1000.0 
+
+    @staticmethod
+    def compare_models(reference: Any, candidate: Any, test_data: np.ndarray, test_labels: np.ndarray,
+                       batch_size: int = 32) -> Dict[str, float]:
+        # evaluate_model for a reference/quantized pair: accuracy and per-image latency, side by side
+        try:
+            labels = np.asarray(test_labels) 
+            if labels.ndim > 1:
+                labels = labels.argmax(axis = 1) 
+
+            reference_out, reference_ms = ModelUtilities._timed_predictions(reference, test_data, batch_size) 
+            candidate_out, candidate_ms = ModelUtilities._timed_predictions(candidate, test_data, batch_size) 
+            reference_pred = reference_out.argmax(axis = 1) 
+            candidate_pred = candidate_out.argmax(axis = 1) 
+
+            reference_accuracy = float((reference_pred == labels).mean()) 
+            candidate_accuracy = float((candidate_pred == labels).mean()) 
+            reference_latency = float(np.median(reference_ms)) 
+            candidate_latency = float(np.median(candidate_ms)) 
+            return {
+                'reference_accuracy' : reference_accuracy,
+                'candidate_accuracy' : candidate_accuracy,
+                'accuracy_delta' : candidate_accuracy - reference_accuracy,
+                'prediction_agreement' : float((reference_pred == candidate_pred).mean()),
+                'max_probability_delta' : float(np.abs(reference_out - candidate_out).max()),
+                'reference_latency_ms' : reference_latency,
+                'candidate_latency_ms' : candidate_latency,
+                'latency_delta_ms' : candidate_latency - reference_latency,
+                'speedup' : reference_latency / max(candidate_latency, 1e-9)
+            }
+
+        except Exception as e:
+            print(f"Error Comparing Models : {e}")
+            return {} 
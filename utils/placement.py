@@ -0,0 +1,178 @@
+import numpy as np
+from typing import Dict, Sequence, Tuple
+from utils.detections import Detections
+from utils.spatial_analysis import MAX_PADDED_CELLS, image_buckets, normalized_boxes, occupancy_grid, pad_by_image
+
+
+# dominant object class -> the functional zone it anchors
+ZONE_FUNCTIONS = {
+    'sofa' : 'seating', 'chair' : 'seating', 'couch' : 'seating', 'armchair' : 'seating',
+    'table' : 'dining', 'dining table' : 'dining', 'dining' : 'dining',
+    'bed' : 'sleeping', 'bedroom' : 'sleeping',
+    'tv' : 'media', 'laptop' : 'media',
+    'bookshelf' : 'storage', 'cabinet' : 'storage', 'book' : 'storage',
+    'lamp' : 'lighting', 'window' : 'lighting',
+    'door' : 'circulation',
+    'kitchen' : 'cooking', 'oven' : 'cooking', 'refrigerator' : 'cooking', 'sink' : 'cooking',
+    'bathroom' : 'bathing', 'toilet' : 'bathing',
+    'plant' : 'decor', 'potted plant' : 'decor', 'vase' : 'decor'
+}
+
+
+def _kmeans(points: np.ndarray, weights: np.ndarray, mask: np.ndarray, n_zones: int,
+            iterations: int) -> Tuple[np.ndarray, np.ndarray]:
+    # area-weighted k-means over the padded (M, K) boxes of similarly busy images, all at once
+    # images with fewer boxes than zones only get as many zones as they have boxes
+    box_counts = mask.sum(axis = 1)
+    zone_valid = np.arange(n_zones)[np.newaxis, :] < box_counts[:, np.newaxis]
+
+    # deterministic seeds: boxes at evenly spaced ranks along the x axis of each image
+    x_order = np.argsort(np.where(mask, points[:, :, 0], np.inf), axis = 1, kind = 'stable')
+    ranks = ((np.arange(n_zones)[np.newaxis, :] + 0.5) * box_counts[:, np.newaxis] / n_zones).astype(np.int64)
+    ranks = np.minimum(ranks, np.maximum(box_counts[:, np.newaxis] - 1, 0))
+    seeds = np.take_along_axis(x_order, ranks, axis = 1)
+    zone_centers = np.take_along_axis(points, seeds[:, :, np.newaxis], axis = 1)
+
+    assignment = np.zeros(mask.shape, dtype = np.int64)
+    for i in range(iterations):
+        distances = ((points[:, :, np.newaxis, :] - zone_centers[:, np.newaxis, :, :]) ** 2).sum(axis = -1)
+        distances = np.where(zone_valid[:, np.newaxis, :], distances, np.inf)
+        new_assignment = distances.argmin(axis = -1)
+        if i > 0 and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+
+        one_hot = (assignment[:, :, np.newaxis] == np.arange(n_zones)) * weights[:, :, np.newaxis]
+        weight_sums = one_hot.sum(axis = 1)
+        sums = np.einsum('mkz,mkd->mzd', one_hot, points)
+        # a zone that lost all its boxes keeps its previous center
+        zone_centers = np.where(
+            weight_sums[:, :, np.newaxis] > 0,
+            sums / np.maximum(weight_sums[:, :, np.newaxis], 1e-12),
+            zone_centers
+        )
+    return zone_centers, assignment
+
+
+def cluster_zones(detections: Detections, n_zones: int = 3, iterations: int = 10) -> Dict[str, np.ndarray]:
+    # k-means runs per bucket of similarly busy images (see image_buckets), so one crowded image does
+    # not pad the whole batch; everything after it works on the flat per-box arrays
+    num_images = detections.num_images
+    num_classes = len(detections.class_names)
+    image_ids = detections.image_ids.astype(np.int64)
+    boxes = normalized_boxes(detections)
+    centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, (boxes[:, 1] + boxes[:, 3]) / 2.0], axis = 1)
+    areas = np.maximum((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]), 1e-6)
+    box_index = np.arange(len(boxes))
+
+    zone_centers = np.zeros((num_images, n_zones, 2), dtype = np.float32)
+    box_zone = np.zeros(len(boxes), dtype = np.int64)
+    for images, width in image_buckets(image_ids, num_images, max_cells = MAX_PADDED_CELLS // max(1, n_zones)):
+        if width == 0:
+            continue
+        points, mask = pad_by_image(centers, image_ids, num_images, images, width)
+        weights = pad_by_image(areas, image_ids, num_images, images, width)[0] * mask
+        index = pad_by_image(box_index, image_ids, num_images, images, width)[0]
+        bucket_centers, assignment = _kmeans(points, weights, mask, n_zones, iterations)
+        zone_centers[images] = bucket_centers
+        box_zone[index[mask]] = assignment[mask]
+
+    box_slot = image_ids * n_zones + box_zone
+    zone_counts = np.bincount(box_slot, minlength = num_images * n_zones).reshape(num_images, n_zones)
+    zone_valid = zone_counts > 0
+
+    # bounding extent of each zone's member boxes: (M, Z, 4)
+    low = np.full((num_images * n_zones, 2), np.inf)
+    high = np.full((num_images * n_zones, 2), -np.inf)
+    np.minimum.at(low, box_slot, boxes[:, :2])
+    np.maximum.at(high, box_slot, boxes[:, 2:])
+    zone_boxes = np.concatenate([low, high], axis = -1).reshape(num_images, n_zones, 4)
+    zone_boxes = np.where(zone_valid[:, :, np.newaxis], zone_boxes, 0.0)
+
+    if num_classes == 0:
+        # no class vocabulary (e.g. rooms given only as counts): no zone has a dominant class
+        dominant = np.full((num_images, n_zones), -1)
+    else:
+        zone_class_counts = np.bincount(
+            box_slot * num_classes + detections.class_ids, minlength = num_images * n_zones * num_classes
+        ).reshape(num_images, n_zones, num_classes)
+        dominant = np.where(zone_valid, zone_class_counts.argmax(axis = -1), -1)
+
+    return {
+        'zone_centers' : zone_centers,
+        'zone_boxes' : zone_boxes.astype(np.float32),
+        'zone_valid' : zone_valid,
+        'zone_counts' : zone_counts.astype(np.int32),
+        'zone_dominant_class' : dominant.astype(np.int32),
+        'box_zone' : box_zone
+    }
+
+
+def clearance(occupied: np.ndarray) -> np.ndarray:
+    # chebyshev distance, in cells, from each cell to the nearest occupied one, by repeated 3x3 dilation
+    num_images, rows, cols = occupied.shape
+    distance = np.full(occupied.shape, max(rows, cols), dtype = np.int32)
+    distance[occupied] = 0
+    reached = occupied.copy()
+
+    for step in range(1, max(rows, cols)):
+        padded = np.pad(reached, ((0, 0), (1, 1), (1, 1)))
+        dilated = np.zeros_like(reached)
+        for dy in range(3):
+            for dx in range(3):
+                dilated |= padded[:, dy:dy + rows, dx:dx + cols]
+
+        newly = dilated & ~reached
+        if not newly.any():
+            break
+        distance[newly] = step
+        reached = dilated
+    return distance
+
+
+def placement_slots(grid: np.ndarray, zone_centers: np.ndarray, zone_valid: np.ndarray, n_slots: int = 5,
+                    occupied_threshold: float = 0.25, proximity_weight: float = 0.25) -> Dict[str, np.ndarray]:
+    # free cells ranked by open space around them, nudged towards the room's functional zones
+    num_images, grid_size, _ = grid.shape
+    occupied = grid >= occupied_threshold
+    free_clearance = clearance(occupied).reshape(num_images, -1).astype(np.float32)
+
+    cell_centers = (np.stack(np.meshgrid(np.arange(grid_size), np.arange(grid_size)), axis = -1)
+                    .reshape(-1, 2).astype(np.float32) + 0.5) / grid_size
+    zone_distance = np.sqrt(
+        ((cell_centers[np.newaxis, :, np.newaxis, :] - zone_centers[:, np.newaxis, :, :]) ** 2).sum(axis = -1)
+    )
+    zone_distance = np.where(zone_valid[:, np.newaxis, :], zone_distance, np.inf).min(axis = -1)
+    zone_distance = np.where(np.isfinite(zone_distance), zone_distance * grid_size, 0.0)
+
+    scores = free_clearance - proximity_weight * zone_distance
+    scores = np.where(occupied.reshape(num_images, -1), -np.inf, scores)
+
+    n_slots = min(n_slots, grid_size * grid_size)
+    top = np.argpartition(-scores, n_slots - 1, axis = 1)[:, :n_slots]
+    order = np.argsort(-np.take_along_axis(scores, top, axis = 1), axis = 1, kind = 'stable')
+    top = np.take_along_axis(top, order, axis = 1)
+    top_scores = np.take_along_axis(scores, top, axis = 1)
+
+    return {
+        'slot_positions' : cell_centers[top],
+        'slot_clearance' : np.take_along_axis(free_clearance, top, axis = 1).astype(np.int32),
+        'slot_scores' : np.where(np.isfinite(top_scores), top_scores, 0.0).astype(np.float32),
+        'slot_valid' : np.isfinite(top_scores)
+    }
+
+
+def plan(detections: Detections, n_zones: int = 3, n_slots: int = 5, grid_size: int = 8,
+         iterations: int = 10) -> Dict[str, np.ndarray]:
+    zones = cluster_zones(detections, n_zones = n_zones, iterations = iterations)
+    grid = occupancy_grid(normalized_boxes(detections), detections.image_ids, detections.num_images, grid_size)
+    slots = placement_slots(grid, zones['zone_centers'], zones['zone_valid'], n_slots = n_slots)
+    return {**zones, **slots, 'occupancy_grid' : grid}
+
+
+def zone_function(class_name: str) -> str:
+    return ZONE_FUNCTIONS.get(class_name, 'general')
+
+
+def zone_functions(class_names: Sequence[str]) -> np.ndarray:
+    return np.asarray([zone_function(name) for name in class_names] + ['general'], dtype = object)
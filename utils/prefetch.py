@@ -0,0 +1,52 @@
+import queue
+import threading
+from typing import Any, Iterable, Iterator
+
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(iterable: Iterable[Any], depth: int = 2) -> Iterator[Any]:
+    # produces items on a background thread so decode work overlaps with the consumer;
+    # the bounded queue keeps at most `depth` items buffered ahead of it
+    buffer: queue.Queue = queue.Queue(maxsize = max(1, depth))
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout = 0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except BaseException as e:
+            _put(_Failure(e))
+            return
+        _put(_END)
+
+    worker = threading.Thread(target = _produce, name = "prefetch", daemon = True)
+    worker.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        worker.join(timeout = 1.0)
@@ -0,0 +1,117 @@
+import os
+import importlib
+import importlib.util
+import threading
+import numpy as np
+from typing import Any, Optional, Tuple
+
+
+# lighter interpreters first; all of them run the same XNNPACK CPU kernels
+TFLITE_INTERPRETERS = ('tflite_runtime.interpreter', 'ai_edge_litert.interpreter', 'tensorflow.lite')
+
+
+def _tflite_interpreter_class() -> Tuple[Any, str]:
+    for module_name in TFLITE_INTERPRETERS:
+        try:
+            return importlib.import_module(module_name).Interpreter, module_name
+        except ImportError:
+            continue
+    raise ImportError("No TFLite Interpreter Available (install tflite-runtime or tensorflow)")
+
+
+def _quantize(batch: np.ndarray, detail: dict) -> np.ndarray:
+    dtype = detail['dtype']
+    if not np.issubdtype(dtype, np.integer):
+        return batch.astype(dtype, copy = False)
+
+    scale, zero_point = detail['quantization']
+    limits = np.iinfo(dtype)
+    return np.clip(np.round(batch / scale + zero_point), limits.min, limits.max).astype(dtype)
+
+
+def _dequantize(output: np.ndarray, detail: dict) -> np.ndarray:
+    if not np.issubdtype(output.dtype, np.integer):
+        return output.astype(np.float32, copy = False)
+
+    scale, zero_point = detail['quantization']
+    return (output.astype(np.float32) - zero_point) * scale
+
+
+class TFLiteModel:
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        interpreter_class, self.runtime = _tflite_interpreter_class()
+        self.path = path
+        self.interpreter = interpreter_class(model_path = path, num_threads = num_threads)
+        self.interpreter.allocate_tensors()
+        # an interpreter owns its tensor buffers, so concurrent callers take turns
+        self._lock = threading.Lock()
+        self._refresh_details()
+
+    def _refresh_details(self):
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.asarray(batch, dtype = np.float32)
+        with self._lock:
+            if tuple(self.input_detail['shape']) != batch.shape:
+                self.interpreter.resize_tensor_input(self.input_detail['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._refresh_details()
+
+            self.interpreter.set_tensor(self.input_detail['index'], _quantize(batch, self.input_detail))
+            self.interpreter.invoke()
+            return _dequantize(self.interpreter.get_tensor(self.output_detail['index']), self.output_detail)
+
+    def predict(self, inputs: np.ndarray, batch_size: int = 32, **kwargs) -> np.ndarray:
+        return np.concatenate([
+            self.predict_on_batch(inputs[start:start + batch_size])
+            for start in range(0, len(inputs), batch_size)
+        ], axis = 0)
+
+
+class ONNXModel:
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.runtime = 'onnxruntime'
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers = ['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        # InferenceSession.run is thread-safe, so no lock is needed here
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype = np.float32)})[0]
+
+    def predict(self, inputs: np.ndarray, batch_size: int = 32, **kwargs) -> np.ndarray:
+        return np.concatenate([
+            self.predict_on_batch(inputs[start:start + batch_size])
+            for start in range(0, len(inputs), batch_size)
+        ], axis = 0)
+
+
+def resolve_quantized_path(path: str) -> str:
+    # an extension-less export prefix resolves to the artifact the fastest installed runtime can run
+    if os.path.splitext(path)[1] in ('.onnx', '.tflite'):
+        return path
+
+    candidates = []
+    if importlib.util.find_spec('onnxruntime') is not None:
+        candidates.append(f"{path}.onnx")
+    candidates.append(f"{path}.tflite")
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"No Quantized Model Found For {path}")
+
+
+def load_quantized(path: str, num_threads: Optional[int] = None):
+    path = resolve_quantized_path(path)
+    if path.endswith('.onnx'):
+        return ONNXModel(path, num_threads = num_threads)
+    return TFLiteModel(path, num_threads = num_threads)
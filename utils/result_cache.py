@@ -0,0 +1,213 @@
+import os
+import copy
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600.0,
+                 disk_dir: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        # counted on the first write and kept approximately afterwards; other processes sharing
+        # disk_dir are caught up with whenever the directory is pruned
+        self._disk_entries: Optional[int] = None
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key_for_file(path: str, model_versions: str = '', chunk_size: int = 1 << 20) -> str:
+        # content-addressed: the same photo under another name or path maps to the same key
+        digest = hashlib.blake2b(digest_size = 20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        digest.update(b'\0' + model_versions.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def _get_memory(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        stored_at, value = entry
+        if self._expired(stored_at):
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _put_memory(self, key: str, value: Any, stored_at: Optional[float] = None):
+        self._entries[key] = (stored_at or time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last = False)
+
+    def _get_disk(self, key: str):
+        if self.disk_dir is None:
+            return False, None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+
+        if self._expired(stored_at):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False, None
+        try:
+            # disk entries are evicted least recently used first, by modification time
+            os.utime(path)
+        except OSError:
+            pass
+        return True, (stored_at, value)
+
+    def _prune_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+
+        # expired entries go first, then the oldest until a tenth of the budget is free again,
+        # so a full cache is not rescanned on every write
+        entries.sort()
+        keep = int(self.max_disk_entries * 0.9)
+        removed = 0
+        for index, (modified_at, path) in enumerate(entries):
+            if not self._expired(modified_at) and len(entries) - index <= keep:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return len(entries) - removed
+
+    def _put_disk(self, key: str, value: Any):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((time.time(), value), f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error Writing Result Cache Entry {key} : {e}")
+            return
+
+        with self._lock:
+            if self._disk_entries is not None and self._disk_entries < self.max_disk_entries:
+                self._disk_entries += 1
+                return
+        try:
+            remaining = self._prune_disk()
+        except OSError as e:
+            print(f"Error Pruning Result Cache : {e}")
+            return
+        with self._lock:
+            self._disk_entries = remaining
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            found, value = self._get_memory(key)
+        # callers get their own copy, so mutating a result never changes what later callers see
+        return copy.deepcopy(value) if found else None
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            found, value = self._get_memory(key)
+            if found:
+                self.hits += 1
+                return copy.deepcopy(value)
+
+            # single-flight: concurrent callers for the same key wait on the first caller's result
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = Future()
+                self._in_flight[key] = pending
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            return copy.deepcopy(pending.result())
+
+        try:
+            found, stored = self._get_disk(key)
+            if found:
+                stored_at, value = stored
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, value, stored_at)
+            else:
+                value = compute()
+                with self._lock:
+                    self.misses += 1
+                    self._put_memory(key, value)
+                self._put_disk(key, value)
+            pending.set_result(value)
+            return copy.deepcopy(value)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def after_fork(self):
+        # a forked child inherits the lock in whatever state another parent thread left it
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+        if disk and self.disk_dir is not None and os.path.isdir(self.disk_dir):
+            for root, _, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith('.pkl'):
+                        os.remove(os.path.join(root, name))
+            with self._lock:
+                self._disk_entries = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries' : len(self._entries),
+                'hits' : self.hits,
+                'disk_hits' : self.disk_hits,
+                'misses' : self.misses,
+                'coalesced' : self.coalesced
+            }
@@ -0,0 +1,172 @@
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.detections import Detections
+
+
+DEFAULT_IMAGE_SIZE = (640, 640)
+# upper bound on padded per-chunk work, e.g. images x boxes x boxes cells of an IoU tensor
+MAX_PADDED_CELLS = 1 << 22
+
+
+def _segment_sum(values: np.ndarray, image_ids: np.ndarray, num_images: int) -> np.ndarray:
+    # sums rows of `values` per image in one pass; images without boxes get zeros
+    out = np.zeros((num_images,) + values.shape[1:], dtype = np.float64)
+    if len(values) == 0:
+        return out
+
+    order = np.argsort(image_ids, kind = 'stable')
+    counts = np.bincount(image_ids, minlength = num_images)
+    present = np.flatnonzero(counts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+    out[present] = np.add.reduceat(values[order], starts, axis = 0)
+    return out
+
+
+def normalized_boxes(detections: Detections) -> np.ndarray:
+    sizes = detections.image_sizes.astype(np.float32)
+    # images whose size was not recorded fall back to YOLO's default inference size
+    sizes[(sizes <= 0).any(axis = 1)] = DEFAULT_IMAGE_SIZE
+    per_box = sizes[detections.image_ids]
+    boxes = detections.boxes / np.concatenate([per_box, per_box], axis = 1)
+    return np.clip(boxes, 0.0, 1.0)
+
+
+def occupancy_grid(boxes: np.ndarray, image_ids: np.ndarray, num_images: int, grid_size: int = 8) -> np.ndarray:
+    edges = np.linspace(0.0, 1.0, grid_size + 1, dtype = np.float32)
+    # per-box overlap with every grid column and row, as fractions of a cell side: (N, G)
+    x_overlap = np.clip(
+        np.minimum(boxes[:, 2:3], edges[1:]) - np.maximum(boxes[:, 0:1], edges[:-1]), 0.0, None
+    ) * grid_size
+    y_overlap = np.clip(
+        np.minimum(boxes[:, 3:4], edges[1:]) - np.maximum(boxes[:, 1:2], edges[:-1]), 0.0, None
+    ) * grid_size
+    cell_coverage = y_overlap[:, :, np.newaxis] * x_overlap[:, np.newaxis, :]
+
+    # summed coverage is clipped at 1, i.e. a cell counts as fully occupied once boxes fill it
+    return np.minimum(_segment_sum(cell_coverage, image_ids, num_images), 1.0).astype(np.float32)
+
+
+def image_buckets(image_ids: np.ndarray, num_images: int, pairwise: bool = False,
+                  max_cells: int = MAX_PADDED_CELLS) -> Iterator[Tuple[np.ndarray, int]]:
+    # images grouped by box count rounded up to a power of two, so one busy image only pads its own
+    # group; groups are split so that images x width (x width again for pairwise work) stays under
+    # max_cells
+    counts = np.bincount(image_ids, minlength = num_images)
+    widths = np.where(counts > 0, 1 << np.ceil(np.log2(np.maximum(counts, 1))).astype(np.int64), 0)
+    for width in np.unique(widths):
+        images = np.flatnonzero(widths == width)
+        per_chunk = max(1, max_cells // max(1, int(width) ** (2 if pairwise else 1)))
+        for start in range(0, len(images), per_chunk):
+            yield images[start:start + per_chunk], int(width)
+
+
+def pad_by_image(values: np.ndarray, image_ids: np.ndarray, num_images: int,
+                 images: Optional[np.ndarray] = None, width: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # pads the boxes of `images` (default: all) into (len(images), width, ...) rows
+    if images is not None:
+        local = np.full(num_images, -1, dtype = np.int64)
+        local[images] = np.arange(len(images))
+        selected = local[image_ids] >= 0
+        values, image_ids, num_images = values[selected], local[image_ids[selected]], len(images)
+
+    counts = np.bincount(image_ids, minlength = num_images)
+    max_boxes = int(counts.max()) if len(counts) else 0
+    max_boxes = max(max_boxes, width or 0)
+    order = np.argsort(image_ids, kind = 'stable')
+    sorted_ids = image_ids[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    slots = np.arange(len(order)) - starts[sorted_ids]
+
+    padded = np.zeros((num_images, max_boxes) + values.shape[1:], dtype = values.dtype)
+    mask = np.zeros((num_images, max_boxes), dtype = bool)
+    padded[sorted_ids, slots] = values[order]
+    mask[sorted_ids, slots] = True
+    return padded, mask
+
+
+def pairwise_iou(padded_boxes: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # (M, K, 4) -> (M, K, K); padding slots and the diagonal are zeroed
+    x1 = np.maximum(padded_boxes[:, :, np.newaxis, 0], padded_boxes[:, np.newaxis, :, 0])
+    y1 = np.maximum(padded_boxes[:, :, np.newaxis, 1], padded_boxes[:, np.newaxis, :, 1])
+    x2 = np.minimum(padded_boxes[:, :, np.newaxis, 2], padded_boxes[:, np.newaxis, :, 2])
+    y2 = np.minimum(padded_boxes[:, :, np.newaxis, 3], padded_boxes[:, np.newaxis, :, 3])
+    intersection = np.clip(x2 - x1, 0.0, None) * np.clip(y2 - y1, 0.0, None)
+
+    areas = (padded_boxes[:, :, 2] - padded_boxes[:, :, 0]) * (padded_boxes[:, :, 3] - padded_boxes[:, :, 1])
+    union = areas[:, :, np.newaxis] + areas[:, np.newaxis, :] - intersection
+    iou = np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+    valid = mask[:, :, np.newaxis] & mask[:, np.newaxis, :]
+    valid &= ~np.eye(padded_boxes.shape[1], dtype = bool)
+    return np.where(valid, iou, 0.0).astype(np.float32)
+
+
+def _overlaps(boxes: np.ndarray, image_ids: np.ndarray, num_images: int) -> Tuple[List[np.ndarray], np.ndarray, np.ndarray]:
+    # IoU per image, computed over buckets of similarly busy images; the matrices are returned ragged,
+    # (n_i, n_i) each, instead of padded to the busiest image of the whole batch
+    counts = np.bincount(image_ids, minlength = num_images)
+    matrices = [None] * num_images
+    max_iou = np.zeros(num_images, dtype = np.float32)
+    overlapping_pairs = np.zeros(num_images, dtype = np.int32)
+
+    boxes = boxes.astype(np.float32, copy = False)
+    for images, width in image_buckets(image_ids, num_images, pairwise = True):
+        if width == 0:
+            continue
+        padded_boxes, mask = pad_by_image(boxes, image_ids, num_images, images, width)
+        iou = pairwise_iou(padded_boxes, mask)
+        max_iou[images] = iou.reshape(len(images), -1).max(axis = 1)
+        overlapping_pairs[images] = (iou > 0).sum(axis = (1, 2)) // 2
+        for row, image in enumerate(images):
+            n = counts[image]
+            matrices[image] = iou[row, :n, :n].copy()
+
+    empty = np.zeros((0, 0), dtype = np.float32)
+    return [empty if matrix is None else matrix for matrix in matrices], max_iou, overlapping_pairs
+
+
+def analyze(detections: Detections, grid_size: int = 8) -> Dict[str, np.ndarray]:
+    num_images = detections.num_images
+    num_classes = len(detections.class_names)
+    image_ids = detections.image_ids
+    boxes = normalized_boxes(detections)
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    centroids = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, (boxes[:, 1] + boxes[:, 3]) / 2.0], axis = 1)
+
+    box_counts = np.bincount(image_ids, minlength = num_images).astype(np.float64)
+    image_class = image_ids.astype(np.int64) * num_classes + detections.class_ids
+    class_counts = np.bincount(image_class, minlength = num_images * num_classes).reshape(num_images, num_classes)
+    class_area = np.bincount(
+        image_class,
+        weights = areas,
+        minlength = num_images * num_classes
+    ).reshape(num_images, num_classes)
+
+    # centroid spread: per-image standard deviation of box centers, summed about the per-image mean
+    # rather than from raw second moments, which cancel badly in float32 for tightly packed boxes
+    safe_counts = np.maximum(box_counts, 1.0)[:, np.newaxis]
+    mean_centroid = _segment_sum(centroids, image_ids, num_images) / safe_counts
+    deviations = centroids - mean_centroid[image_ids]
+    spread = np.sqrt(_segment_sum(deviations ** 2, image_ids, num_images) / safe_counts)
+
+    iou, max_iou, overlapping_pairs = _overlaps(boxes, image_ids, num_images)
+
+    grid = occupancy_grid(boxes, image_ids, num_images, grid_size)
+
+    pixel_area = detections.image_sizes.astype(np.float64).prod(axis = 1)
+    pixel_area[pixel_area <= 0] = float(np.prod(DEFAULT_IMAGE_SIZE))
+
+    return {
+        'object_count' : box_counts.astype(np.int32),
+        'object_density' : (box_counts / pixel_area).astype(np.float32),
+        'unique_object_types' : (class_counts > 0).sum(axis = 1).astype(np.int32),
+        'occupancy_grid' : grid,
+        'occupied_fraction' : grid.mean(axis = (1, 2)),
+        'class_area_coverage' : np.minimum(class_area, 1.0).astype(np.float32),
+        'mean_centroid' : mean_centroid.astype(np.float32),
+        'centroid_spread' : spread.astype(np.float32),
+        'iou_matrix' : iou,
+        'max_iou' : max_iou,
+        'overlapping_pairs' : overlapping_pairs
+    }
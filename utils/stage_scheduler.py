@@ -0,0 +1,165 @@
+import os
+import logging
+import threading
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional, Sequence
+from utils.metrics import timer
+
+
+class StageError(RuntimeError):
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage {stage} Failed : {error}")
+        self.stage = stage
+        self.error = error
+
+
+class _Stage:
+    __slots__ = ('name', 'fn', 'deps', 'resource')
+
+    def __init__(self, name: str, fn: Callable[..., Any], deps: Sequence[str], resource: Optional[str]):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.resource = resource
+
+
+class StageGraph:
+    def __init__(self, resource_limits: Optional[Dict[str, int]] = None):
+        # at most resource_limits[r] stages tagged with resource r run at once across all runs of
+        # the graph, e.g. one TF forward pass, so concurrent requests cannot oversubscribe a framework
+        self.resource_limits = dict(resource_limits or {})
+        self._slots = {resource: threading.BoundedSemaphore(limit) for resource, limit in self.resource_limits.items()}
+        self.inputs = set()
+        self.stages: Dict[str, _Stage] = {}
+
+    def add_input(self, name: str) -> 'StageGraph':
+        self.inputs.add(name)
+        return self
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Sequence[str] = (),
+            resource: Optional[str] = None) -> 'StageGraph':
+        if name in self.stages or name in self.inputs:
+            raise ValueError(f"Stage {name} Is Already Defined")
+        missing = [dep for dep in deps if dep not in self.stages and dep not in self.inputs]
+        if missing:
+            # dependencies must be declared first, which keeps the graph acyclic by construction
+            raise ValueError(f"Stage {name} Depends On Undefined Stages : {', '.join(missing)}")
+        self.stages[name] = _Stage(name, fn, deps, resource)
+        return self
+
+    def _run_stage(self, stage: _Stage, kwargs: Dict[str, Any]) -> Any:
+        slot = self._slots.get(stage.resource)
+        if slot is None:
+            with timer(f"pipeline.{stage.name}"):
+                return stage.fn(**kwargs)
+
+        with slot:
+            with timer(f"pipeline.{stage.name}"):
+                return stage.fn(**kwargs)
+
+    def run(self, executor: Executor, outputs: Optional[Sequence[str]] = None, **inputs: Any) -> Dict[str, Any]:
+        unknown = set(inputs) - self.inputs
+        if unknown:
+            raise ValueError(f"Unknown Pipeline Inputs : {', '.join(sorted(unknown))}")
+
+        results = dict(inputs)
+        # only the stages the requested outputs depend on are run
+        needed = set(self.stages) if outputs is None else self._needed(outputs)
+        pending = [stage for stage in self.stages.values() if stage.name in needed]
+        running = {}
+
+        try:
+            while pending or running:
+                # start every stage whose inputs are ready; framework slots are taken in the worker
+                for stage in list(pending):
+                    if all(dep in results for dep in stage.deps):
+                        pending.remove(stage)
+                        kwargs = {dep: results[dep] for dep in stage.deps}
+                        running[executor.submit(self._run_stage, stage, kwargs)] = stage
+
+                if not running:
+                    raise RuntimeError(f"Stages Cannot Be Scheduled : {', '.join(s.name for s in pending)}")
+
+                done, _ = wait(running, return_when = FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception as e:
+                        raise StageError(stage.name, e) from e
+        finally:
+            # on failure, stages not yet started are dropped and running ones are left to finish
+            for future in running:
+                future.cancel()
+
+        return results if outputs is None else {name: results[name] for name in outputs}
+
+    def _needed(self, outputs: Sequence[str]) -> set:
+        needed, stack = set(), list(outputs)
+        while stack:
+            name = stack.pop()
+            if name in needed or name in self.inputs:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"Unknown Stage : {name}")
+            needed.add(name)
+            stack.extend(self.stages[name].deps)
+        return needed
+
+
+def default_thread_limits(cpu_count: Optional[int] = None) -> Dict[str, int]:
+    # TF and torch stages run side by side, so each gets half the cores instead of all of them
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return {
+        'tensorflow' : max(1, cpu_count // 2),
+        'torch' : max(1, cpu_count // 2),
+        'opencv' : max(1, cpu_count // 4)
+    }
+
+
+def apply_thread_limits(framework: str, threads: Optional[int], inter_op_threads: int = 1) -> bool:
+    # frameworks that are not installed are skipped
+    if not threads:
+        return False
+    try:
+        if framework == 'tensorflow':
+            import tensorflow as tf
+
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        elif framework == 'torch':
+            import torch
+
+            torch.set_num_threads(threads)
+        elif framework == 'opencv':
+            import cv2
+
+            cv2.setNumThreads(threads)
+        else:
+            raise ValueError(f"Unknown Framework : {framework}")
+        return True
+    except ImportError:
+        return False
+    except RuntimeError as e:
+        # TF refuses new thread settings once its runtime has started
+        logging.warning(f"Could Not Limit {framework} Threads To {threads} : {e}")
+        return False
+
+
+# framework -> thread count actually in effect in this process, for effective_settings reports
+applied_thread_limits: Dict[str, int] = {}
+
+
+def apply_profile_threads(profile: Any, framework: str) -> Optional[int]:
+    # a profile's None thread count keeps a limit already in effect (e.g. a server worker's share of
+    # the cores) and otherwise falls back to the even split of default_thread_limits
+    threads = profile.threads(framework) or applied_thread_limits.get(framework) or default_thread_limits()[framework]
+    inter_op_threads = profile.tensorflow_inter_op_threads or 1
+    if applied_thread_limits.get(framework) == threads:
+        return threads
+
+    if apply_thread_limits(framework, threads, inter_op_threads = inter_op_threads):
+        applied_thread_limits[framework] = threads
+        logging.info(f"Limited {framework} To {threads} Threads ({profile.name} Profile)")
+        return threads
+    return None
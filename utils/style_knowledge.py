@@ -0,0 +1,318 @@
+import json
+import threading
+import numpy as np
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+
+# default style knowledge; DESIGN_GENERATION_CONFIG["style_knowledge_path"] may point at a JSON file
+# with the same layout to replace it
+STYLE_KNOWLEDGE: Dict[str, Dict[str, Any]] = {
+    "Modern Minimalist": {
+        "color_palette": ["white", "gray", "black"],
+        "furniture_guidelines": {
+            "sofa": ["low-profile", "clean-lines"],
+            "table": ["geometric", "minimal-decor"]
+        },
+        "recommendations": [
+            "Consider adding a sleek, low-profile sofa to match the minimal decor.",
+            "Use geometric table designs to enhance the modern feel."
+        ],
+        "explanation": {
+            "furniture": ["clean-lined sofa", "geometric coffee table"],
+            "colors": ["neutral tones", "white", "gray"]
+        }
+    },
+    "Scandinavian": {
+        "color_palette": ["white", "light-wood", "soft-blue"],
+        "furniture_guidelines": {
+            "sofa": ["simple", "light-fabric"],
+            "table": ["natural-wood", "functional"]
+        },
+        "recommendations": [
+            "Opt for functional and simple furniture with light-wood finishes.",
+            "Add soft, cozy blankets and light fabric sofa covers."
+        ],
+        "explanation": {
+            "furniture": ["light wood dining table", "modern armchair"],
+            "colors": ["white", "soft pastels", "natural wood"]
+        }
+    },
+    "Industrial Loft": {
+        "color_palette": ["charcoal", "exposed-brick", "steel-gray"],
+        "furniture_guidelines": {
+            "sofa": ["leather", "industrial"],
+            "table": ["metal", "reclaimed-wood"]
+        },
+        "recommendations": [
+            "Incorporate metal elements and exposed brick features.",
+            "Use leather sofas and industrial-style light fixtures."
+        ],
+        "explanation": {
+            "furniture": ["metal coffee table", "exposed shelving"],
+            "colors": ["gray", "black", "warm brown"]
+        }
+    },
+    "Bohemian": {
+        "color_palette": ["terracotta", "mustard", "sage-green"],
+        "furniture_guidelines": {
+            "sofa": ["textured", "plush"],
+            "table": ["wooden", "organic-shapes"]
+        },
+        "recommendations": [
+            "Layer textured fabrics and colorful throw pillows for a bohemian touch.",
+            "Include rustic, wooden tables and chairs for an organic look."
+        ],
+        "explanation": {
+            "furniture": ["textured armchair", "wooden side tables"],
+            "colors": ["warm earth tones", "rich patterns"]
+        }
+    },
+    "Mid-Century Modern": {
+        "color_palette": ["teal", "orange", "wood-brown"],
+        "furniture_guidelines": {
+            "sofa": ["angular", "retro-fabric"],
+            "table": ["round", "teak-wood"]
+        },
+        "recommendations": [
+            "Choose angular sofas with retro patterns.",
+            "Add teak wood tables for a mid-century vibe."
+        ],
+        "explanation": {
+            "furniture": ["teak dining chairs", "low-profile sofa"],
+            "colors": ["teal", "mustard yellow", "walnut brown"]
+        }
+    },
+    "Japandi": {
+        "color_palette": ["neutral-tones", "black", "wood"],
+        "furniture_guidelines": {
+            "sofa": ["low-profile", "minimal"],
+            "table": ["simple", "light-wood"]
+        },
+        "recommendations": [
+            "Select minimalistic furniture with light wood and neutral tones.",
+            "Keep decoration simple, using natural materials like bamboo or linen."
+        ],
+        "explanation": {
+            "furniture": ["simple wooden table", "low bed frame"],
+            "colors": ["white", "soft beige", "light wood"]
+        }
+    },
+    "Coastal": {
+        "color_palette": ["white", "blue", "sand"],
+        "furniture_guidelines": {
+            "sofa": ["light-fabric", "casual"],
+            "table": ["weathered-wood", "nautical"]
+        },
+        "recommendations": [
+            "Use light, airy fabrics and incorporate nautical elements.",
+            "Add weathered-wood furniture and whitewashed decor."
+        ],
+        "explanation": {
+            "furniture": ["white wicker chairs", "light wood table"],
+            "colors": ["blue", "white", "sand tones"]
+        }
+    },
+    "Art Deco": {
+        "color_palette": ["gold", "black", "rich-emerald"],
+        "furniture_guidelines": {
+            "sofa": ["luxurious", "velvet"],
+            "table": ["glossy", "metal"]
+        },
+        "recommendations": [
+            "Incorporate bold geometric shapes and luxury materials.",
+            "Use gold accents and mirrored surfaces to add elegance."
+        ],
+        "explanation": {
+            "furniture": ["glossy side table", "geometric chair"],
+            "colors": ["gold", "black", "emerald green"]
+        }
+    },
+    "Rustic": {
+        "color_palette": ["earthy-brown", "green", "beige"],
+        "furniture_guidelines": {
+            "sofa": ["plush", "wooden-frame"],
+            "table": ["rough-wood", "handcrafted"]
+        },
+        "recommendations": [
+            "Add earthy tones and handcrafted wooden furniture.",
+            "Use textured fabric cushions and woven items for added warmth."
+        ],
+        "explanation": {
+            "furniture": ["wooden bench", "cozy armchair"],
+            "colors": ["earthy brown", "cream", "deep green"]
+        }
+    },
+    "Contemporary": {
+        "color_palette": ["neutral-tones", "black", "blue"],
+        "furniture_guidelines": {
+            "sofa": ["bold-lines", "multi-color"],
+            "table": ["glass-top", "sleek"]
+        },
+        "recommendations": [
+            "Include bold, clean lines and unique shapes.",
+            "Use a mix of materials like glass, metal, and wood for contrast."
+        ],
+        "explanation": {
+            "furniture": ["sleek sofa", "modern dining set"],
+            "colors": ["neutral shades", "black", "white"]
+        }
+    },
+    "Traditional": {
+        "color_palette": ["cream", "dark-wood", "burgundy"],
+        "furniture_guidelines": {
+            "sofa": ["classic", "structured"],
+            "table": ["mahogany", "detailed-carvings"]
+        },
+        "recommendations": [
+            "Use rich, deep colors and classic furniture.",
+            "Incorporate detailed woodwork and ornate patterns."
+        ],
+        "explanation": {
+            "furniture": ["carved wooden cabinet", "classic armchair"],
+            "colors": ["deep red", "navy blue", "gold"]
+        }
+    },
+    "Transitional": {
+        "color_palette": ["beige", "gray", "white"],
+        "furniture_guidelines": {
+            "sofa": ["neutral", "blended-styles"],
+            "table": ["simple", "multi-material"]
+        },
+        "recommendations": [
+            "Blend traditional and contemporary pieces for a balanced look.",
+            "Use neutral tones and simple designs for a versatile decor."
+        ],
+        "explanation": {
+            "furniture": ["mix of modern and traditional pieces"],
+            "colors": ["gray", "beige", "muted blues"]
+        }
+    },
+    "Eclectic": {
+        "color_palette": ["varied-bright", "earth-tones"],
+        "furniture_guidelines": {
+            "sofa": ["mix-and-match", "colorful"],
+            "table": ["vintage", "quirky"]
+        },
+        "recommendations": [
+            "Mix vintage and modern furniture for an unexpected look.",
+            "Add unique, one-of-a-kind decorative pieces."
+        ],
+        "explanation": {
+            "furniture": ["mismatched chairs", "bold-patterned sofa"],
+            "colors": ["vibrant colors", "contrasting patterns"]
+        }
+    },
+    "Mediterranean": {
+        "color_palette": ["blue", "white", "terracotta"],
+        "furniture_guidelines": {
+            "sofa": ["woven", "comfortable"],
+            "table": ["stone", "rustic"]
+        },
+        "recommendations": [
+            "Incorporate terra-cotta tiles and stone surfaces.",
+            "Use woven materials and rustic wooden furniture."
+        ],
+        "explanation": {
+            "furniture": ["terracotta planter", "woven basket chair"],
+            "colors": ["white", "blue", "sunset orange"]
+        }
+    },
+    "Farmhouse": {
+        "color_palette": ["white", "gray", "light-wood"],
+        "furniture_guidelines": {
+            "sofa": ["simple", "comfortable"],
+            "table": ["wooden", "distressed"]
+        },
+        "recommendations": [
+            "Add cozy, simple furniture with a weathered finish.",
+            "Use whitewashed wood and soft, natural fabrics."
+        ],
+        "explanation": {
+            "furniture": ["wooden dining table", "simple armchair"],
+            "colors": ["white", "gray", "light wood"]
+        }
+    }
+}
+
+
+class StyleKnowledge:
+    # every per-style field is a tuple indexed by style position, built once and never mutated
+    __slots__ = (
+        'styles', 'style_index', 'color_palettes', 'furniture_guidelines',
+        'recommendations', 'explanations', 'rules'
+    )
+
+    def __init__(self, table: Mapping[str, Mapping[str, Any]]):
+        styles = tuple(table)
+        set_field = lambda name, value: object.__setattr__(self, name, value)
+
+        set_field('styles', styles)
+        set_field('style_index', MappingProxyType({style: i for i, style in enumerate(styles)}))
+        set_field('color_palettes', tuple(tuple(table[style].get('color_palette', ())) for style in styles))
+        set_field('furniture_guidelines', tuple(
+            MappingProxyType({
+                obj: tuple(guidelines)
+                for obj, guidelines in table[style].get('furniture_guidelines', {}).items()
+            })
+            for style in styles
+        ))
+        set_field('recommendations', tuple(tuple(table[style].get('recommendations', ())) for style in styles))
+        set_field('explanations', tuple(
+            self._compile_explanation(style, table[style].get('explanation', {})) for style in styles
+        ))
+        # the legacy design_rule layout, as a read-only view over the same tuples
+        set_field('rules', MappingProxyType({
+            style: MappingProxyType({
+                'color_palette' : self.color_palettes[i],
+                'furniture_guidelines' : self.furniture_guidelines[i]
+            })
+            for i, style in enumerate(styles)
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StyleKnowledge Is Immutable")
+
+    @staticmethod
+    def _compile_explanation(style: str, explanation: Mapping[str, Sequence[str]]) -> str:
+        text = f"Based ON the {style} style , we recommend:"
+        furniture, colors = explanation.get('furniture', ()), explanation.get('colors', ())
+        if furniture and colors:
+            text += f" {furniture[0]} with {colors[0]} palette."
+        return text
+
+    def __len__(self) -> int:
+        return len(self.styles)
+
+    def __contains__(self, style: str) -> bool:
+        return style in self.style_index
+
+    def index_of(self, style: str) -> int:
+        return self.style_index.get(style, -1)
+
+    def indices_of(self, styles: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.style_index.get(style, -1) for style in styles), dtype = np.int32, count = len(styles))
+
+    def explanation(self, style: str) -> str:
+        index = self.style_index.get(style, -1)
+        return self.explanations[index] if index >= 0 else self._compile_explanation(style, {})
+
+
+_loaded: Dict[Optional[str], StyleKnowledge] = {}
+_load_lock = threading.Lock()
+
+
+def load_style_knowledge(path: Optional[str] = None) -> StyleKnowledge:
+    # one shared table per source for the whole process; path=None is the built-in table
+    knowledge = _loaded.get(path)
+    if knowledge is not None:
+        return knowledge
+
+    with _load_lock:
+        if path not in _loaded:
+            table = STYLE_KNOWLEDGE
+            if path is not None:
+                with open(path) as f:
+                    table = json.load(f)
+            _loaded[path] = StyleKnowledge(table)
+        return _loaded[path]